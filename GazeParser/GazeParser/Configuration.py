@@ -5,6 +5,8 @@
 """
 
 import os
+import threading
+import weakref
 from configparser import ConfigParser
 import GazeParser
 
@@ -66,8 +68,6 @@ class Config(object):
             application directory.
             Default value is None.
         """
-        cfgp = ConfigParser()
-        cfgp.optionxform = str
         if ConfigFile is None:
             ConfigFile = os.path.join(GazeParser.configDir, 'GazeParser.cfg')
             if not os.path.isfile(ConfigFile):
@@ -79,28 +79,16 @@ class Config(object):
         if not os.path.isfile(ConfigFile):
             raise ValueError('%s does not exit.' % ConfigFile)
 
-        cfgp.read(ConfigFile)
-        optionDict = {}
-        for option in GazeParserDefaults:
-            try:
-                value = cfgp.get('GazeParser', option)
-                if isinstance(GazeParserDefaults[option], int):
-                    if value == 'True':
-                        value = True
-                    elif value == 'False':
-                        value = True
-                    setattr(self, option, int(value))
-                    optionDict[option] = int(value)
-                elif isinstance(GazeParserDefaults[option], float):
-                    setattr(self, option, float(value))
-                    optionDict[option] = float(value)
-                else:
-                    setattr(self, option, value)
-                    optionDict[option] = value
-            except:
-                print('Warning: %s is not properly defined in GazeParser configuration file(%s). Default value is used.' % (option, self.ConfigFile))
-                setattr(self, option, GazeParserDefaults[option])
-                optionDict[option] = GazeParserDefaults[option]
+        for option, value in _readConfigFile(ConfigFile).items():
+            setattr(self, option, value)
+
+    def freeze(self):
+        """
+        Get an immutable snapshot of this configuration.  Snapshots with
+        the same parameters are the same object.
+        See :class:`FrozenConfig`.
+        """
+        return _internConfig(self.getParametersAsDict(missing=False))
 
     def save(self, ConfigFile=None):
         """
@@ -136,13 +124,18 @@ class Config(object):
         if len(missing)>0:
             print('Warining: missing parameters: {}'.format(', '.join(missing)))
 
-    def getParametersAsDict(self):
+    def getParametersAsDict(self, missing=True):
         """
         Get parameters as a dict object.
+
+        :param bool missing: If True, AttributeError is raised when
+            a parameter is missing.  If False, missing parameters are not
+            included.  Default value is True.
         """
         optionDict = {}
         for key in GazeParserOptions:
-            optionDict[key] = getattr(self, key)
+            if missing or hasattr(self, key):
+                optionDict[key] = getattr(self, key)
         return optionDict
     
     def __repr__(self):
@@ -184,3 +177,122 @@ class Config(object):
         msg += '>'
         
         return msg
+
+
+class FrozenConfig(Config):
+    """
+    Immutable and hashable snapshot of GazeParser.Configuration.Config.
+    Use :func:`Config.freeze` to get a snapshot.  Snapshots are interned,
+    i.e. snapshots with the same parameters are the same object, so that
+    GazeData objects built with the same parameters share a snapshot.
+    Use :func:`thaw` to get a mutable copy.
+    """
+    def __init__(self, params):
+        """
+        Create a snapshot.  Usually, this constructor is not called
+        directly.  Use :func:`Config.freeze` instead.
+
+        :param dict params: parameters.
+        """
+        for key, value in params.items():
+            object.__setattr__(self, key, value)
+        object.__setattr__(self, 'ConfigFile', None)
+        object.__setattr__(self, '_key', _getConfigKey(params))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('FrozenConfig is immutable. Use thaw() to get a mutable copy.')
+
+    def __delattr__(self, name):
+        raise AttributeError('FrozenConfig is immutable. Use thaw() to get a mutable copy.')
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenConfig):
+            return NotImplemented
+        return self._key == other._key
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __reduce__(self):
+        return (_internConfig, (dict(self._key),))
+
+    def freeze(self):
+        return self
+
+    def thaw(self):
+        """
+        Get a mutable copy of this snapshot.
+        """
+        config = Config.__new__(Config)
+        config.ConfigFile = None
+        for key, value in self._key:
+            setattr(config, key, value)
+        return config
+
+
+_internedConfigs = weakref.WeakValueDictionary()
+_internLock = threading.Lock()
+
+
+def _getConfigKey(params):
+    return tuple([(key, params[key]) for key in GazeParserOptions if key in params])
+
+
+def _internConfig(params):
+    """
+    Return FrozenConfig object which has given parameters.  If such an
+    object already exists, the existing object is returned.
+    """
+    key = _getConfigKey(params)
+    with _internLock:
+        config = _internedConfigs.get(key)
+        if config is None:
+            config = FrozenConfig(params)
+            _internedConfigs[key] = config
+    return config
+
+
+# Parsed configuration files: {path: (mtime, size, options)}
+_parsedConfigFiles = {}
+
+
+def _readConfigFile(ConfigFile):
+    """
+    Read parameters from a configuration file.  Parsed parameters are
+    cached while modification time and size of the file are unchanged.
+    """
+    path = os.path.abspath(ConfigFile)
+    st = os.stat(path)
+    cached = _parsedConfigFiles.get(path)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+
+    cfgp = ConfigParser()
+    cfgp.optionxform = str
+    cfgp.read(ConfigFile)
+    optionDict = {}
+    for option in GazeParserDefaults:
+        try:
+            value = cfgp.get('GazeParser', option)
+            if isinstance(GazeParserDefaults[option], int):
+                if value == 'True':
+                    value = True
+                elif value == 'False':
+                    value = True
+                optionDict[option] = int(value)
+            elif isinstance(GazeParserDefaults[option], float):
+                optionDict[option] = float(value)
+            else:
+                optionDict[option] = value
+        except:
+            print('Warning: %s is not properly defined in GazeParser configuration file(%s). Default value is used.' % (option, ConfigFile))
+            optionDict[option] = GazeParserDefaults[option]
+
+    _parsedConfigFiles[path] = (st.st_mtime_ns, st.st_size, optionDict)
+    return optionDict
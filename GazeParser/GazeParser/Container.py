@@ -0,0 +1,807 @@
+"""
+.. Part of GazeParser package.
+.. Copyright (C) 2012-2025 Hiroyuki Sogo.
+.. Distributed under the terms of the GNU General Public License (GPL).
+
+Chunked GazeParser data file.
+
+A data file consists of a preamble, compressed chunks and an index.
+The preamble holds the offset and length of the index, and the index
+(JSON) holds the offset and length of each chunk, so that any chunk can
+be read without reading the other chunks.  Events and metadata of each
+trial are stored separately from sample arrays, so that sample arrays
+can be loaded on demand.  The index also holds a summary of the file
+(number of samples and events, recorded eye, recording date and
+configuration of each trial, keys of additional data and names of
+embedded images), which can be read by :func:`readSummary` without
+decompressing any chunk.
+
+========================== ================================================
+chunk                      contents
+========================== ================================================
+trial/N/events             GazeData object without sample arrays
+trial/N/samples/NAME       sample array NAME (_T, _L, _R, _Pupil, etc.)
+additional                 additional data without embedded images
+images                     EMBEDDED_IMAGES without image data
+images/N                   N-th embedded image
+========================== ================================================
+
+Each chunk is a zlib stream of a pickle (protocol 5) preceded by its
+out-of-band buffers, so that NumPy arrays (sample arrays and images) are
+stored as raw buffers and are restored without extra copies.
+
+====================== ====================================================
+field                  contents
+====================== ====================================================
+number of buffers      uint32
+length of buffers      uint64 for each buffer
+buffers                raw data of each buffer
+pickle                 pickled object
+====================== ====================================================
+
+Usually, this module is not used directly.  Use :func:`GazeParser.save`
+and :func:`GazeParser.load` instead.
+"""
+import os
+import re
+import io
+import json
+import struct
+import pickle
+import zlib
+import hashlib
+import numpy as np
+import collections
+import concurrent.futures
+import GazeParser
+import GazeParser.Core
+import GazeParser.Configuration
+
+MAGIC = b'GZPRDATA'
+# 1: raw sample buffers with dtype and shape in the index.
+# 2: pickles with out-of-band buffers, configurations shared in the index.
+FORMAT_VERSION = 2
+
+# magic, format version, offset and length of the index
+_preamble = struct.Struct('<8sHQQ')
+_bufferCount = struct.Struct('<I')
+_bufferLength = struct.Struct('<Q')
+
+# size of blocks passed to zlib at once.
+_blockSize = 1 << 20
+
+# GazeData attributes stored in trial/N/samples/NAME chunks.
+sampleAttributes = ('_T', '_L', '_R', '_Pupil', '_CameraSpecificData', '_USBIOData')
+
+
+def isContainer(filename):
+    """
+    Return True if the file is a chunked GazeParser data file.
+
+    :param str filename:
+        Filename.
+    """
+    with open(filename, 'rb') as fp:
+        return fp.read(len(MAGIC)) == MAGIC
+
+
+def _getConfigKey(params):
+    """
+    Return a key of configuration parameters.  Key is a hash of
+    parameters, so that configurations with the same parameters have the
+    same key.
+    """
+    s = json.dumps(params, sort_keys=True, default=_toJSON).encode('utf-8')
+    return hashlib.sha1(s).hexdigest()[:16]
+
+
+class _TrialPickler(pickle.Pickler):
+    """
+    Pickle GazeData object.  Sample arrays are replaced with their
+    names, so that they can be stored in another chunk.  Configurations
+    are replaced with their keys and their parameters are stored in
+    configs, so that a configuration shared by trials is stored only once.
+    """
+    def __init__(self, file, samples, configs, buffer_callback=None):
+        super(_TrialPickler, self).__init__(file, protocol=5, buffer_callback=buffer_callback)
+        self._sampleNames = dict([(id(value), name) for name, value in samples.items()])
+        self._configs = configs
+
+    def persistent_id(self, obj):
+        if isinstance(obj, GazeParser.Configuration.Config):
+            params = obj.getParametersAsDict(missing=False)
+            key = _getConfigKey(params)
+            self._configs[key] = params
+            return ('config', key)
+        return self._sampleNames.get(id(obj))
+
+
+class _TrialUnpickler(pickle.Unpickler):
+    """
+    Unpickle GazeData object pickled by _TrialPickler.  If samples is
+    None, sample arrays are replaced with placeholders which load them
+    on first access.
+    """
+    def __init__(self, file, samples=None, loader=None, buffers=None, configs=None):
+        super(_TrialUnpickler, self).__init__(file, buffers=buffers)
+        self._samples = samples
+        self._loader = loader
+        self._configs = configs
+
+    def persistent_load(self, pid):
+        if isinstance(pid, tuple) and pid[0] == 'config':
+            return GazeParser.Configuration._internConfig(self._configs[pid[1]])
+        if self._samples is None:
+            return GazeParser.Core._DeferredSamples(self._loader, pid)
+        return self._samples[pid]
+
+
+def _dumpChunk(value, samples=None, configs=None):
+    """
+    Pickle value and return a list of buffers which make up a chunk.
+    If samples is not None, value is pickled by _TrialPickler and
+    configurations are stored in configs.
+    """
+    buffers = []
+    buf = io.BytesIO()
+    if samples is None:
+        pickle.Pickler(buf, protocol=5, buffer_callback=buffers.append).dump(value)
+    else:
+        _TrialPickler(buf, samples, configs, buffer_callback=buffers.append).dump(value)
+    buffers = [b.raw() for b in buffers]
+    header = _bufferCount.pack(len(buffers)) + b''.join([_bufferLength.pack(b.nbytes) for b in buffers])
+    return [header] + buffers + [buf.getbuffer()]
+
+
+def _compressChunk(pieces, level):
+    """
+    Compress buffers returned by _dumpChunk.  Compressed data is yielded
+    block by block.
+    """
+    compressor = zlib.compressobj(level)
+    for piece in pieces:
+        piece = memoryview(piece).cast('B')
+        for i in range(0, piece.nbytes, _blockSize):
+            s = compressor.compress(piece[i:i+_blockSize])
+            if s:
+                yield s
+    yield compressor.flush()
+
+
+class _DecompressStream(io.RawIOBase):
+    """
+    Read-only stream that decompresses a chunk.
+    """
+    def __init__(self, fp, offset, length):
+        fp.seek(offset)
+        self._fp = fp
+        self._remaining = length
+        self._decompressor = zlib.decompressobj()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        b = memoryview(b).cast('B')
+        while True:
+            if self._decompressor.unconsumed_tail:
+                data = self._decompressor.unconsumed_tail
+            elif self._remaining > 0:
+                data = self._fp.read(min(self._remaining, _blockSize))
+                if not data:
+                    raise EOFError('Unexpected end of data file.')
+                self._remaining -= len(data)
+            else:
+                data = b''
+            s = self._decompressor.decompress(data, b.nbytes)
+            if s:
+                b[:len(s)] = s
+                return len(s)
+            if not data:
+                return 0
+
+
+class _Reader(object):
+    """
+    Read chunks from a chunked data file.
+    """
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        st = os.stat(self.filename)
+        self._signature = (st.st_mtime_ns, st.st_size)
+        with open(self.filename, 'rb') as fp:
+            magic, formatVersion, indexOffset, indexLength = _preamble.unpack(fp.read(_preamble.size))
+            if magic != MAGIC:
+                raise ValueError('%s is not a GazeParser data file.' % filename)
+            if formatVersion > FORMAT_VERSION:
+                raise ValueError('%s is made by newer version of GazeParser (format version %d).' % (filename, formatVersion))
+            if formatVersion != FORMAT_VERSION:
+                raise ValueError('%s has unsupported format version %d.' % (filename, formatVersion))
+            fp.seek(indexOffset)
+            self.index = json.loads(fp.read(indexLength).decode('utf-8'))
+
+    def checkUnchanged(self):
+        st = os.stat(self.filename)
+        if (st.st_mtime_ns, st.st_size) != self._signature:
+            raise RuntimeError('%s has been modified after loading.' % self.filename)
+
+    def getTrialSummary(self, trial):
+        """
+        Return summary and configuration of a trial.  None is returned
+        if the file has no summary.
+        """
+        summary = self.index.get('summary')
+        if summary is None:
+            return None, None
+        trialSummary = dict(summary['trials'][trial])
+        config = trialSummary.pop('config')
+        if config is not None:
+            config = self.index['configs'][config]
+        return trialSummary, config
+
+    def hasChunk(self, name):
+        return name in self.index['chunks']
+
+    def readChunk(self, name, fp=None, samples=None, loader=None):
+        """
+        Read a chunk.  If samples or loader is not None, the chunk is
+        unpickled by _TrialUnpickler.
+        """
+        if fp is None:
+            with open(self.filename, 'rb') as fp:
+                return self.readChunk(name, fp, samples, loader)
+        offset, length = self.index['chunks'][name]
+        stream = io.BufferedReader(_DecompressStream(fp, offset, length), _blockSize)
+        nBuffers = _bufferCount.unpack(stream.read(_bufferCount.size))[0]
+        lengths = [_bufferLength.unpack(stream.read(_bufferLength.size))[0] for i in range(nBuffers)]
+        buffers = []
+        for n in lengths:
+            buf = bytearray(n)
+            if stream.readinto(buf) != n:
+                raise EOFError('Unexpected end of chunk (%s).' % name)
+            buffers.append(buf)
+        if samples is None and loader is None:
+            return pickle.Unpickler(stream, buffers=buffers).load()
+        return _TrialUnpickler(stream, samples, loader, buffers, self.index.get('configs')).load()
+
+    def readSamples(self, trial, fp=None):
+        if fp is None:
+            with open(self.filename, 'rb') as fp:
+                return self.readSamples(trial, fp)
+        samples = {}
+        for name in sampleAttributes:
+            chunk = 'trial/%d/samples/%s' % (trial, name)
+            if self.hasChunk(chunk):
+                samples[name] = self.readChunk(chunk, fp)
+        return samples
+
+    def readAdditionalData(self, fp=None, images=True):
+        if fp is None:
+            with open(self.filename, 'rb') as fp:
+                return self.readAdditionalData(fp, images)
+        A = self.readChunk('additional', fp)
+        if images and self.hasChunk('images'):
+            A['EMBEDDED_IMAGES'] = self.readImages(fp)
+        return A
+
+    def readImages(self, fp=None):
+        if fp is None:
+            with open(self.filename, 'rb') as fp:
+                return self.readImages(fp)
+        if not self.hasChunk('images'):
+            return None
+        images = self.readChunk('images', fp)
+        images['IMAGES'] = []
+        while self.hasChunk('images/%d' % len(images['IMAGES'])):
+            images['IMAGES'].append(self.readChunk('images/%d' % len(images['IMAGES']), fp))
+        return images
+
+
+class _TrialSampleLoader(object):
+    """
+    Callable that loads sample arrays of a trial.
+    """
+    def __init__(self, reader, trial):
+        self._reader = reader
+        self._trial = trial
+
+    def __call__(self):
+        self._reader.checkUnchanged()
+        return self._reader.readSamples(self._trial)
+
+
+def _splitImages(additionalData):
+    """
+    Split embedded images from additional data.  Return value is a tuple
+    of additional data without embedded images, EMBEDDED_IMAGES without
+    image data, and a list of images.  If additional data has no embedded
+    images, the second and third elements are None.
+    """
+    if not (isinstance(additionalData, dict) and
+            isinstance(additionalData.get('EMBEDDED_IMAGES'), dict) and
+            'IMAGES' in additionalData['EMBEDDED_IMAGES']):
+        return additionalData, None, None
+    A = dict(additionalData)
+    images = dict(A.pop('EMBEDDED_IMAGES'))
+    imageList = list(images.pop('IMAGES'))
+    return A, images, imageList
+
+
+def _iterTrialChunks(data, firstTrial=0):
+    """
+    Yield name, value and samples (or None) of chunks of trials.
+    Trials are numbered from firstTrial.
+    """
+    for trial, gazeData in enumerate(data, firstTrial):
+        # samples of lazily loaded data must be loaded before
+        # the source file is replaced.
+        gazeData._loadDeferredSamples()
+        samples = dict([(name, getattr(gazeData, name)) for name in sampleAttributes
+                        if getattr(gazeData, name, None) is not None])
+        yield 'trial/%d/events' % trial, gazeData, samples
+        for name, value in samples.items():
+            yield 'trial/%d/samples/%s' % (trial, name), value, None
+
+
+def _isAdditionalChunk(name):
+    return name == 'additional' or name == 'images' or name.startswith('images/')
+
+
+def _iterAdditionalChunks(additionalData):
+    """
+    Yield name, value and None of chunks of additional data and embedded
+    images.
+    """
+    A, images, imageList = _splitImages(additionalData)
+    yield 'additional', A, None
+    if images is not None:
+        yield 'images', images, None
+        for i, image in enumerate(imageList):
+            yield 'images/%d' % i, image, None
+
+
+def _compressChunkToList(value, samples, configs, level):
+    return list(_compressChunk(_dumpChunk(value, samples, configs), level))
+
+
+def _getThreads(threads):
+    """
+    Return number of threads.  If threads is None, number of CPUs is
+    returned.
+    """
+    if threads is None:
+        return os.cpu_count() or 1
+    if threads < 1:
+        raise ValueError('Number of threads must be 1 or greater.')
+    return int(threads)
+
+
+def _writeChunks(fp, chunkIter, chunks, compressionLevel, threads, configs=None):
+    """
+    Compress chunks and write them at the current position of fp.
+    Offset and length of each chunk are stored in chunks.  Parameters of
+    configurations referred by trials are stored in configs.
+    """
+    def writeChunk(name, compressed):
+        offset = fp.tell()
+        for s in compressed:
+            fp.write(s)
+        chunks[name] = (offset, fp.tell() - offset)
+
+    if threads == 1:
+        for name, value, samples in chunkIter:
+            writeChunk(name, _compressChunk(_dumpChunk(value, samples, configs), compressionLevel))
+    else:
+        # Number of chunks waiting to be written is limited
+        # so that compressed data do not accumulate in memory.
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            for name, value, samples in chunkIter:
+                pending.append((name, executor.submit(_compressChunkToList, value, samples, configs, compressionLevel)))
+                if len(pending) >= 2 * threads:
+                    name, future = pending.popleft()
+                    writeChunk(name, future.result())
+            while pending:
+                name, future = pending.popleft()
+                writeChunk(name, future.result())
+
+
+def _summarizeTrial(gazeData):
+    """
+    Return summary of a trial and its configuration as dict objects.
+    Sample arrays of gazeData must have been loaded.
+    """
+    T = gazeData._getSamples('_T')
+    if len(T) > 1:
+        samplingRate = 1000.0 * (len(T) - 1) / (T[-1] - T[0])
+    else:
+        samplingRate = None
+    summary = {'samples': len(T),
+               'saccades': gazeData.nSac,
+               'fixations': gazeData.nFix,
+               'messages': gazeData.nMsg,
+               'blinks': gazeData.nBlink,
+               'recordedEye': gazeData.recordedEye,
+               'recordingDate': getattr(gazeData, '_recordingDate', None),
+               'samplingRate': samplingRate,
+               'version': getattr(gazeData, '__version__', None)}
+    config = getattr(gazeData, '_config', None)
+    if config is not None:
+        config = config.getParametersAsDict(missing=False)
+    return summary, config
+
+
+def _summarizeAdditionalData(additionalData):
+    """
+    Return keys of additional data and names of embedded images.
+    """
+    A, images, imageList = _splitImages(additionalData)
+    summary = {'additionalDataType': type(additionalData).__name__,
+               'additionalDataKeys': None,
+               'embeddedImages': None}
+    if isinstance(A, dict):
+        summary['additionalDataKeys'] = [str(key) for key in A]
+    if images is not None:
+        summary['embeddedImages'] = [str(name) for name in images.get('NAMES', [])]
+    return summary
+
+
+def _writeIndex(fp, nTrials, chunks, summary, configs):
+    """
+    Write index at the current position of fp and update preamble.
+    """
+    index = {'version': GazeParser.__version__,
+             'trials': nTrials,
+             'chunks': chunks,
+             'configs': configs,
+             'summary': summary}
+    s = json.dumps(index, default=_toJSON).encode('utf-8')
+    indexOffset = fp.tell()
+    fp.write(s)
+    fp.flush()
+    os.fsync(fp.fileno())
+    fp.seek(0)
+    fp.write(_preamble.pack(MAGIC, FORMAT_VERSION, indexOffset, len(s)))
+
+
+def _toJSON(obj):
+    """
+    Convert objects in summary which are not supported by json module.
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (tuple, np.ndarray)):
+        return list(obj)
+    return str(obj)
+
+
+class Writer(object):
+    """
+    Write a chunked data file trial by trial.  Data is written to a
+    temporary file which replaces the target file when :func:`close` is
+    called.  Trials are not kept in memory after they are written.
+    """
+    def __init__(self, filename, compressionLevel=6, threads=1):
+        """
+        :param str filename:
+            Filename.
+        :param int compressionLevel:
+            Compression level of zlib (0-9).  Default value is 6.
+        :param int threads:
+            Number of threads used to compress chunks.  If None, number
+            of CPUs is used.  Default value is 1.
+        """
+        self.filename = os.path.abspath(filename)
+        self.compressionLevel = compressionLevel
+        self.threads = _getThreads(threads)
+        self.nTrials = 0
+        self._tmpFilename = self.filename + '.tmp'
+        self._chunks = {}
+        self._trialSummaries = []
+        self._configs = {}
+        self._fp = open(self._tmpFilename, 'wb')
+        self._fp.write(_preamble.pack(MAGIC, FORMAT_VERSION, 0, 0))
+
+    def appendTrials(self, data):
+        """
+        Append trials.
+
+        :param data:
+            List of GazeParser.GazeData objects.
+        """
+        _writeChunks(self._fp, _iterTrialChunks(data, self.nTrials), self._chunks,
+                     self.compressionLevel, self.threads, self._configs)
+        for gazeData in data:
+            self._addTrialSummary(*_summarizeTrial(gazeData))
+        self.nTrials += len(data)
+
+    def _addTrialSummary(self, summary, config):
+        # Configuration is usually shared by all trials.  It is stored
+        # only once and referred by its key.
+        if summary is not None:
+            summary = dict(summary)
+            if config is None:
+                summary['config'] = None
+            else:
+                key = _getConfigKey(config)
+                self._configs[key] = config
+                summary['config'] = key
+        self._trialSummaries.append(summary)
+
+    def copyTrials(self, filename):
+        """
+        Append all trials in a chunked data file.  Compressed chunks are
+        copied without decompression.
+
+        :param str filename:
+            Name of a chunked data file.
+        :return:
+            Number of copied trials.
+        """
+        reader = _Reader(filename)
+        trialChunks = []
+        for name, (offset, length) in reader.index['chunks'].items():
+            m = re.match(r'trial/(\d+)/(.+)$', name)
+            if m is not None:
+                newName = 'trial/%d/%s' % (self.nTrials + int(m.group(1)), m.group(2))
+                trialChunks.append((offset, length, newName))
+        trialChunks.sort()
+
+        with open(reader.filename, 'rb') as fp:
+            for offset, length, name in trialChunks:
+                fp.seek(offset)
+                self._chunks[name] = (self._fp.tell(), length)
+                while length > 0:
+                    s = fp.read(min(length, _blockSize))
+                    if not s:
+                        raise EOFError('Unexpected end of data file (%s).' % filename)
+                    self._fp.write(s)
+                    length -= len(s)
+
+        # Keys are hashes of parameters and never conflict.
+        self._configs.update(reader.index.get('configs', {}))
+        for trial in range(reader.index['trials']):
+            self._addTrialSummary(*reader.getTrialSummary(trial))
+        self.nTrials += reader.index['trials']
+        return reader.index['trials']
+
+    def close(self, additionalData=None):
+        """
+        Write additional data and index, and then replace the target file.
+
+        :param additionalData:
+            Additional data (if necessary).
+        """
+        try:
+            _writeChunks(self._fp, _iterAdditionalChunks(additionalData), self._chunks,
+                         self.compressionLevel, self.threads)
+            summary = _summarizeAdditionalData(additionalData)
+            summary['trials'] = self._trialSummaries
+            _writeIndex(self._fp, self.nTrials, self._chunks, summary, self._configs)
+            self._fp.close()
+            os.replace(self._tmpFilename, self.filename)
+        finally:
+            self.abort()
+
+    def abort(self):
+        """
+        Discard the temporary file.  The target file is not changed.
+        """
+        if not self._fp.closed:
+            self._fp.close()
+        if os.path.exists(self._tmpFilename):
+            os.remove(self._tmpFilename)
+
+
+def write(filename, data, additionalData=None, compressionLevel=6, threads=1):
+    """
+    Write GazeParser objects to a chunked data file.  Data is written
+    to a temporary file which replaces the target file when completed.
+
+    :param str filename:
+        Filename.
+    :param data:
+        List of GazeParser.GazeData objects.
+    :param additionalData:
+        Additional data (if necessary).
+    :param int compressionLevel:
+        Compression level of zlib (0-9).  Default value is 6.
+    :param int threads:
+        Number of threads used to compress chunks.  Chunks are written
+        in the same order regardless of this parameter.  If None, number
+        of CPUs is used.  Default value is 1.
+    """
+    writer = Writer(filename, compressionLevel, threads)
+    try:
+        writer.appendTrials(data)
+    except:
+        writer.abort()
+        raise
+    writer.close(additionalData)
+
+
+def updateAdditionalData(filename, additionalData, compressionLevel=6, keepImages=False):
+    """
+    Replace additional data and embedded images of a chunked data file.
+    Trials are not rewritten.  New chunks and index are appended to the
+    file and the preamble is updated at last, so that the file remains
+    readable if writing is interrupted.  Space occupied by the old chunks
+    is reclaimed when the file is saved by :func:`write`.
+
+    :param str filename:
+        Filename.
+    :param additionalData:
+        New additional data.  If EMBEDDED_IMAGES is not included and
+        keepImages is False, embedded images are removed from the file.
+    :param int compressionLevel:
+        Compression level of zlib (0-9).  Default value is 6.
+    :param bool keepImages:
+        If True, embedded images in the file are kept without rewriting
+        them.  In this case, additionalData must not include
+        EMBEDDED_IMAGES.  Default value is False.
+    """
+    reader = _Reader(filename)
+    summary = dict(reader.index.get('summary', {}))
+    if keepImages:
+        if _splitImages(additionalData)[1] is not None:
+            raise ValueError('Additional data must not include EMBEDDED_IMAGES if keepImages is True.')
+        if reader.hasChunk('images') and not isinstance(additionalData, dict):
+            raise ValueError('Additional data must be a dict object to keep embedded images.')
+        chunks = dict([(name, value) for name, value in reader.index['chunks'].items()
+                       if name != 'additional'])
+        embeddedImages = summary.get('embeddedImages')
+    else:
+        chunks = dict([(name, value) for name, value in reader.index['chunks'].items()
+                       if not _isAdditionalChunk(name)])
+    with open(reader.filename, 'r+b') as fp:
+        fp.seek(0, os.SEEK_END)
+        _writeChunks(fp, _iterAdditionalChunks(additionalData), chunks, compressionLevel, 1)
+        summary.update(_summarizeAdditionalData(additionalData))
+        if keepImages:
+            summary['embeddedImages'] = embeddedImages
+        _writeIndex(fp, reader.index['trials'], chunks, summary, reader.index.get('configs', {}))
+
+
+def summarize(data, additionalData=None):
+    """
+    Make a summary of GazeParser objects.  Return value has the same
+    structure as that of :func:`readSummary`.
+
+    :param data:
+        List of GazeParser.GazeData objects.
+    :param additionalData:
+        Additional data.
+    """
+    summary = _summarizeAdditionalData(additionalData)
+    summary['version'] = None
+    summary['trials'] = []
+    for gazeData in data:
+        gazeData._loadDeferredSamples()
+        trialSummary, config = _summarizeTrial(gazeData)
+        trialSummary['config'] = config
+        summary['trials'].append(trialSummary)
+    return summary
+
+
+def readSummary(filename):
+    """
+    Read summary of a chunked data file.  Only the preamble and the index
+    are read.  Return value is a dict object which has following keys.
+
+    ==================== ===================================================
+    key                  value
+    ==================== ===================================================
+    version              GazeParser version used to write the file.
+    trials               List of summary of trials.  Each summary is a dict
+                         object which has samples, saccades, fixations,
+                         messages, blinks, recordedEye, recordingDate,
+                         samplingRate, version and config.
+    additionalDataType   Type name of additional data.
+    additionalDataKeys   Keys of additional data if it is a dict object.
+    embeddedImages       Names of embedded images.
+    ==================== ===================================================
+
+    :param str filename:
+        Filename.
+    """
+    reader = _Reader(filename)
+    summary = dict(reader.index.get('summary', {}))
+    summary['version'] = reader.index['version']
+    summary.pop('configs', None)
+    summary['trials'] = []
+    for trial in range(reader.index['trials']):
+        trialSummary, config = reader.getTrialSummary(trial)
+        if trialSummary is not None:
+            trialSummary['config'] = config
+        summary['trials'].append(trialSummary)
+    return summary
+
+
+def readAdditionalData(filename, images=True):
+    """
+    Read additional data from a chunked data file without reading trials.
+
+    :param str filename:
+        Filename.
+    :param bool images:
+        If False, EMBEDDED_IMAGES is not included in additional data.
+        Default value is True.
+    """
+    return _Reader(filename).readAdditionalData(images=images)
+
+
+def readImages(filename):
+    """
+    Read embedded images from a chunked data file without reading trials
+    and the other additional data.  None is returned if no image is
+    embedded.
+
+    :param str filename:
+        Filename.
+    """
+    return _Reader(filename).readImages()
+
+
+def _readTrial(reader, trial, lazy, fp=None):
+    """
+    Read a trial.  If fp is None, the file is opened in this function.
+    """
+    if fp is None:
+        with open(reader.filename, 'rb') as fp:
+            return _readTrial(reader, trial, lazy, fp)
+    if lazy:
+        samples = None
+    else:
+        samples = reader.readSamples(trial, fp)
+    return reader.readChunk('trial/%d/events' % trial, fp, samples,
+                            _TrialSampleLoader(reader, trial))
+
+
+def read(filename, lazy=False, trials=None, threads=1, images=True):
+    """
+    Read GazeParser objects from a chunked data file.
+
+    :param str filename:
+        Filename.
+    :param bool lazy:
+        If True, only events and metadata are loaded.  Sample arrays of
+        each trial are loaded when they are accessed for the first time.
+        Default value is False.
+    :param trials:
+        List of indices of trials to be loaded.  If None, all trials are
+        loaded.  Default value is None.
+    :param int threads:
+        Number of threads used to decompress trials.  If None, number of
+        CPUs is used.  Default value is 1.
+    :param bool images:
+        If False, EMBEDDED_IMAGES is not included in additional data.
+        Default value is True.
+    :return:
+        A tuple of a list of GazeParser.GazeData objects and additional data.
+    """
+    threads = _getThreads(threads)
+    reader = _Reader(filename)
+    if trials is None:
+        trials = range(reader.index['trials'])
+    else:
+        trials = _checkTrials(trials, reader.index['trials'])
+    with open(reader.filename, 'rb') as fp:
+        if threads == 1 or len(trials) < 2:
+            D = [_readTrial(reader, trial, lazy, fp) for trial in trials]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+                D = list(executor.map(lambda trial: _readTrial(reader, trial, lazy), trials))
+        A = reader.readAdditionalData(fp, images)
+
+    return D, A
+
+
+def _checkTrials(trials, nTrials):
+    """
+    Check indices of trials and return them as a list.
+    """
+    trials = [int(trial) for trial in trials]
+    for trial in trials:
+        if not 0 <= trial < nTrials:
+            raise ValueError('Trial index %d is out of range (number of trials: %d).' % (trial, nTrials))
+    return trials
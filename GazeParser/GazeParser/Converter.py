@@ -10,19 +10,15 @@ import os
 import re
 import codecs
 import warnings
+import importlib.util
 from datetime import datetime
-from scipy.interpolate import interp1d
 try:
     from numpy import nanmean
 except:
     from scipy.stats import nanmean
-from scipy.signal import butter, lfilter, lfilter_zi, filtfilt
 
-try:
-    import h5py
-    has_h5py = True
-except:
-    has_h5py = False
+# scipy and h5py are imported when they are used.
+has_h5py = importlib.util.find_spec('h5py') is not None
 
 try:
     import pathlib
@@ -370,6 +366,7 @@ def resampleData(T, HV, frequency):
     """
     if frequency <= 0:
         raise ValueError('Frequency must be a positive number.')
+    from scipy.interpolate import interp1d
     interval = 1000.0/frequency
     ti = np.arange(0, T[-1], interval)
     interpolaterH = interp1d(T, HV[:, 0])
@@ -429,6 +426,7 @@ def linearInterpolation(t, w):
     # nanIndex = np.where(np.isnan(w))[0]
     validIndex = np.where(w == w)[0]  # np.where(np.isnan(w) == False)[0]
 
+    from scipy.interpolate import interp1d
     interpolater = interp1d(t[validIndex], w[validIndex])
     return interpolater(t)
 
@@ -462,6 +460,7 @@ def applyFilter(T, HV, config, decimals=2):
 
     # fill NaN with mean value of each edge
     if filter == 'butter' or filter == 'butter_filtfilt':
+        from scipy.signal import butter, lfilter, lfilter_zi, filtfilt
         (B, A) = butter(filterOrder, filterWn, btype='low', output='ba')
         zi = lfilter_zi(B, A)
 
@@ -487,7 +486,7 @@ def applyFilter(T, HV, config, decimals=2):
     return np.vstack((filteredH, filteredV)).transpose()
 
 
-def TrackerToGazeParser(inputfile, overwrite=False, config=None, useFileParameters=True, outputfile=None, verbose=False):
+def TrackerToGazeParser(inputfile, overwrite=False, config=None, useFileParameters=True, outputfile=None, verbose=False, storage=None):
     """
     Convert an SimpleGazeTracker data file to a GazeParser file.
     If GazeTracker data file name is 'foo.csv', the output file name is 'foo.db'
@@ -510,6 +509,11 @@ def TrackerToGazeParser(inputfile, overwrite=False, config=None, useFileParamete
     :param str outputfile:
         Name of output file. If None, extension of input file name
         is replaced with '.db'.
+    :param str storage:
+        Storage mode of gaze data ('float64', 'float32' or 'fixed').
+        See :func:`GazeParser.Core.GazeData.setStorageMode`.
+        If None, gaze data are stored in double precision.
+        Default value is None.
     """
     (workDir, srcFilename) = os.path.split(os.path.abspath(inputfile))
     filenameRoot, ext = os.path.splitext(srcFilename)
@@ -652,6 +656,8 @@ def TrackerToGazeParser(inputfile, overwrite=False, config=None, useFileParamete
 
                 MsgList = buildMsgList(M)
                 G = GazeParser.GazeData(Tlist, Llist, Rlist, SacList, FixList, MsgList, BlinkList, Plist, config.RECORDED_EYE, config=config, recordingDate=startRec)
+                if storage is not None:
+                    G.setStorageMode(storage, decimals=effectiveDigit)
                 if idxC is not None:
                     G.setCameraSpecificData(np.array(C))
                 if idxUSBIO is not None:
@@ -873,7 +879,7 @@ def TrackerToGazeParser(inputfile, overwrite=False, config=None, useFileParamete
     return 'SUCCESS'
 
 
-def PTCToGazeParser(inputfile, overwrite=False, config=None, outputfile=None, unitcnv=None, verbose=False):
+def PTCToGazeParser(inputfile, overwrite=False, config=None, outputfile=None, unitcnv=None, verbose=False, storage=None):
     """
     Convert a PsychoPy-Tobii-Controller TSV file to a GazeParser file.
     If TSV file name is 'foo.tsv', the output file name is 'foo.db'
@@ -895,6 +901,11 @@ def PTCToGazeParser(inputfile, overwrite=False, config=None, outputfile=None, un
     :param str unitcnv:
         Covert unit. Currently, only 'height2pix' is supported.
         Default value is None (no conversion).
+    :param str storage:
+        Storage mode of gaze data ('float64', 'float32' or 'fixed').
+        See :func:`GazeParser.Core.GazeData.setStorageMode`.
+        If None, gaze data are stored in double precision.
+        Default value is None.
     """
     effectiveDigit = 2
 
@@ -1005,6 +1016,8 @@ def PTCToGazeParser(inputfile, overwrite=False, config=None, outputfile=None, un
                     (SacList, FixList, BlinkList) = buildEventListMonocular(Tlist, Blist, config)
 
                 G = GazeParser.GazeData(Tlist, Llist, Rlist, SacList, FixList, MsgList, BlinkList, Plist, 'B', config=config, recordingDate=recdatestr)
+                if storage is not None:
+                    G.setStorageMode(storage, decimals=effectiveDigit)
 
                 Data.append(G)
 
@@ -1070,7 +1083,7 @@ def PTCToGazeParser(inputfile, overwrite=False, config=None, outputfile=None, un
 
 def PPHDF5ToGazeParser(inputfile, overwrite=False, config=None, outputfile=None, 
     startMsg='RecStart .*', stopMsg='RecStop .*', 
-    recdate=None, unitcnv=None, verbose=False):
+    recdate=None, unitcnv=None, verbose=False, storage=None):
     """
     Convert a PsychoPy HDF5 file to a GazeParser file.
 
@@ -1100,6 +1113,11 @@ def PPHDF5ToGazeParser(inputfile, overwrite=False, config=None, outputfile=None,
     :param str unitcnv:
         Covert unit. Currently, only 'height2pix' is supported.
         Default value is None (no conversion).
+    :param str storage:
+        Storage mode of gaze data ('float64', 'float32' or 'fixed').
+        See :func:`GazeParser.Core.GazeData.setStorageMode`.
+        If None, gaze data are stored in double precision.
+        Default value is None.
     """
     if not has_h5py:
         if verbose:
@@ -1168,6 +1186,7 @@ def PPHDF5ToGazeParser(inputfile, overwrite=False, config=None, outputfile=None,
 
     # config.RECORDED_EYE = 'B'
 
+    import h5py
     hdf = h5py.File(inputfileFullpath)
     startMatch = re.compile(startMsg)
     stopMatch = re.compile(stopMsg)
@@ -1242,6 +1261,8 @@ def PPHDF5ToGazeParser(inputfile, overwrite=False, config=None, outputfile=None,
             (SacList, FixList, BlinkList) = buildEventListMonocular(Tlist, Blist, config)
 
         G = GazeParser.GazeData(Tlist, Llist, Rlist, SacList, FixList, MsgList, BlinkList, Plist, 'B', config=config, recordingDate=recdatestr)
+        if storage is not None:
+            G.setStorageMode(storage, decimals=effectiveDigit)
 
         Data.append(G)
 
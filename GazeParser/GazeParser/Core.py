@@ -11,6 +11,12 @@ import re
 #float_tolerance = 0.000000000001
 float_tolerance = 1e-05
 
+# Storage modes of sample arrays (see GazeData.setStorageMode).
+storageModes = ('float64', 'float32', 'fixed')
+
+# NaN is stored as this value in 'fixed' storage mode.
+_fixedNaN = np.iinfo(np.int32).min
+
 class SaccadeData(object):
     """
     Holds various parameters of a single saccade such as start time,
@@ -132,11 +138,11 @@ class SaccadeData(object):
         s = self.startIndex
         e = self.endIndex
         if eye == 'L':
-            return self._parent.L[s:e+1]
+            return self._parent._getSamples('_L', s, e+1)
         elif eye == 'R':
-            return self._parent.R[s:e+1]
+            return self._parent._getSamples('_R', s, e+1)
         elif eye == 'B':
-            return (self._parent.L[s:e+1], self._parent.R[s:e+1])
+            return (self._parent._getSamples('_L', s, e+1), self._parent._getSamples('_R', s, e+1))
         else:
             raise ValueError('Eye must be \'L\', \'R\', \'B\' or None.')
 
@@ -332,11 +338,11 @@ class FixationData(object):
         s = self.startIndex
         e = self.endIndex
         if eye == 'L':
-            return self._parent.L[s:e+1]
+            return self._parent._getSamples('_L', s, e+1)
         elif eye == 'R':
-            return self._parent.R[s:e+1]
+            return self._parent._getSamples('_R', s, e+1)
         elif eye == 'B':
-            return (self._parent.L[s:e+1], self._parent.R[s:e+1])
+            return (self._parent._getSamples('_L', s, e+1), self._parent._getSamples('_R', s, e+1))
 
     def getNextEvent(self, step=1, eventType=None):
         """
@@ -787,11 +793,32 @@ class CalPointData(object):
         return msg
 
 
+class _DeferredSamples(object):
+    """
+    Placeholder of sample arrays which have not been loaded yet.
+    Loader is a callable that returns a dict of all sample arrays of
+    the trial.
+    """
+    def __init__(self, loader, name):
+        self.loader = loader
+        self.name = name
+
+    def __repr__(self):
+        return '<{}.{}, {}>'.format(self.__class__.__module__,
+                                    self.__class__.__name__, self.name)
+
+
 class GazeData(object):
     """
     Holds saccades, fixations, blinks, messages, timestamps and gaze
     trajectory in a single recording.
     """
+
+    # Default values for data built before storage mode was introduced.
+    _storageMode = 'float64'
+    _storageScale = None
+    _decodedSamples = None
+
     def __init__(self, Tlist, Llist, Rlist, SacList, FixList, MsgList, BlinkList, PupilList, recordedEye, config=None, recordingDate=None):
         """
         Constructor GazeData.
@@ -835,10 +862,12 @@ class GazeData(object):
         for b in self._Blink:
             b._setParent(self)
 
+        # GazeData objects built with the same parameters share an
+        # immutable snapshot of the configuration.
         if not isinstance(config, GazeParser.Configuration.Config):
-            self._config = GazeParser.Configuration.Config()
+            self._config = GazeParser.Configuration.Config().freeze()
         else:
-            self._config = config
+            self._config = config.freeze()
 
         cm2deg = 180 / np.pi * np.arctan(1.0 / self._config.VIEWING_DISTANCE)
         self._deg2pix = np.array((self._config.DOTS_PER_CENTIMETER_H / cm2deg,
@@ -857,7 +886,7 @@ class GazeData(object):
             None (recorded eye). Default value is None.
         """
         if eye is None:
-            eye = self._parent._recordedEye
+            eye = self._recordedEye
 
         if not (0 <= index < self.nFix):
             raise ValueError('Index is out of range.')
@@ -865,11 +894,11 @@ class GazeData(object):
         e = self._Fix[index]._endIndex
 
         if eye == 'L':
-            return self._L[s:e+1]
+            return self._getSamples('_L', s, e+1)
         elif eye == 'R':
-            return self._R[s:e+1]
+            return self._getSamples('_R', s, e+1)
         elif eye == 'B':
-            return (self._L[s:e+1], self._R[s:e+1])
+            return (self._getSamples('_L', s, e+1), self._getSamples('_R', s, e+1))
         else:
             raise ValueError('Eye must be \'L\', \'R\', \'B\' or None.')
 
@@ -1041,11 +1070,11 @@ class GazeData(object):
         s = self._Sac[index]._startIndex
         e = self._Sac[index]._endIndex
         if eye == 'L':
-            return self._L[s:e+1]
+            return self._getSamples('_L', s, e+1)
         elif eye == 'R':
-            return self._R[s:e+1]
+            return self._getSamples('_R', s, e+1)
         elif eye == 'B':
-            return (self._L[s:e+1], self._R[s:e+1])
+            return (self._getSamples('_L', s, e+1), self._getSamples('_R', s, e+1))
         else:
             raise ValueError('Eye must be \'L\', \'R\', \'B\' or None.')
 
@@ -1307,6 +1336,100 @@ class GazeData(object):
         else:
             raise ValueError('Eye must be \'L\', \'R\', \'B\' or None.')
 
+    def getSampleMatrix(self, eye=None, pupil=False):
+        """
+        Get gaze position (and pupil size) as a single *N x C* array, where
+        N is the number of samples.  Columns are (X, Y) for monocular data
+        and (LX, LY, RX, RY) for binocular data.  If pupil is True, pupil
+        size of the selected eye(s) is appended to the columns.
+        Unavailable data are filled with numpy.nan.
+
+        :param str eye:
+            'L', 'R' or 'B'.  If none, recorded eye is used.
+        :param bool pupil:
+            If True, pupil size is appended.  Default value is False.
+        """
+        if eye is None:
+            eye = self._recordedEye
+
+        if eye == 'L':
+            eyes = ('L',)
+        elif eye == 'R':
+            eyes = ('R',)
+        elif eye == 'B':
+            eyes = ('L', 'R')
+        else:
+            raise ValueError('Eye must be \'L\', \'R\', \'B\' or None.')
+
+        N = len(self.T)
+        columns = []
+        for e in eyes:
+            HV = getattr(self, e)
+            if HV is None:
+                columns.append(np.full((N, 2), np.nan))
+            else:
+                columns.append(np.asarray(HV, dtype=float).reshape(N, -1))
+
+        if pupil:
+            P = self.Pupil
+            for e in eyes:
+                if P is None:
+                    columns.append(np.full((N, 1), np.nan))
+                    continue
+                P = np.asarray(P, dtype=float)
+                if P.ndim == 1:
+                    # monocular pupil data belong to the recorded eye.
+                    if self._recordedEye == e:
+                        columns.append(P.reshape(N, 1))
+                    else:
+                        columns.append(np.full((N, 1), np.nan))
+                else:
+                    columns.append(P[:, ('L', 'R').index(e)].reshape(N, 1))
+
+        return np.hstack(columns)
+
+    def extractEpochs(self, text, period, eye=None, pupil=False, useRegexp=False, resolution=None, resample=False):
+        """
+        Extract time-locked epochs of gaze data around messages.
+        All epochs share a common time base, so that the result is
+        a dense *n_epochs x n_samples x channels* array.
+        Channels are the same as those of
+        :func:`~GazeParser.Core.GazeData.getSampleMatrix`.
+        Samples out of the recording are filled with numpy.nan.
+
+        :param str text:
+            Epochs are extracted around messages that include this text.
+            See :func:`~GazeParser.Core.GazeData.findMessage`.
+        :param tuple period:
+            (pre, post).  Each epoch starts 'pre' msec before the message
+            and ends 'post' msec after the message.
+        :param str eye:
+            'L', 'R' or 'B'.  If none, recorded eye is used.
+        :param bool pupil:
+            If True, pupil size is included.  Default value is False.
+        :param bool useRegexp:
+            If true, 'text' parapeter is considered as a regular expression.
+            Default value is False.
+        :param float resolution:
+            Sampling interval of the time base in msec.  If None, median
+            sampling interval of this data is used.  Default value is None.
+        :param bool resample:
+            If True, data are linearly interpolated to the time base.
+            Otherwise, the nearest sample is used and time points farther
+            than resolution/2 from any sample are filled with numpy.nan.
+            Default value is False.
+        :return:
+            A tuple of two elements.  The first element is the time base
+            (relative to messages) and the second element is the epochs.
+        """
+        if resolution is None:
+            resolution = np.median(np.diff(self.T))
+        timeBase = _getEpochTimeBase(period, resolution)
+        msgTimes = np.array([m.time for m in self.findMessage(text, useRegexp=useRegexp)], dtype=float)
+        epochs = _sampleAtTimes(self.T, self.getSampleMatrix(eye, pupil),
+                                msgTimes[:, np.newaxis] + timeBase, resolution, resample)
+        return timeBase, epochs
+
     def findNearestIndexFromMessage(self, message):
         """
         Return index of the timestamp of the sample that is nearest to the time
@@ -1645,6 +1768,111 @@ class GazeData(object):
         """
         return degValue * self.deg2pix
 
+    def setStorageMode(self, mode='float64', decimals=None):
+        """
+        Change how timestamps, gaze positions and pupil size are stored.
+        Compact modes reduce memory usage and size of data files.
+        Regardless of storage mode, :attr:`T`, :attr:`L`, :attr:`R` and
+        :attr:`Pupil` return floating point arrays.
+
+        ========= ============================================================
+        mode      description
+        ========= ============================================================
+        'float64' Double precision (default).
+        'float32' Single precision.  Timestamps are kept in double precision
+                  because single precision is not enough for long recordings.
+        'fixed'   Scaled 32bit integers.  Each array is multiplied by
+                  10**decimals and rounded.  If an array can not be stored
+                  without loss at the precision, it is kept in double
+                  precision.
+        ========= ============================================================
+
+        In 'fixed' mode, a whole array is decoded at the first access to
+        :attr:`T`, :attr:`L`, :attr:`R` or :attr:`Pupil` and the decoded
+        array is kept as a read-only array.
+
+        :param str mode:
+            'float64', 'float32' or 'fixed'.  Default value is 'float64'.
+        :param decimals:
+            Number of decimals of gaze positions used in 'fixed' mode.
+            A dict object such as {'T':3, 'L':2, 'R':2, 'Pupil':1} is also
+            accepted.  If None, the number of decimals is estimated from data.
+            Default value is None.
+        """
+        if mode not in storageModes:
+            raise ValueError('mode must be one of {}.'.format(', '.join(storageModes)))
+
+        if not isinstance(decimals, dict):
+            decimals = {'L': decimals, 'R': decimals}
+
+        arrays = {}
+        for name in ('_T', '_L', '_R', '_Pupil'):
+            arrays[name] = self._getSamples(name)
+
+        scale = {}
+        for name, data in arrays.items():
+            if data is None:
+                stored = None
+            elif mode == 'float64' or (mode == 'float32' and name == '_T'):
+                stored = np.asarray(data, dtype=np.float64)
+            elif mode == 'float32':
+                stored = np.asarray(data, dtype=np.float32)
+            else:  # fixed
+                stored, scale[name] = _encodeFixed(np.asarray(data, dtype=np.float64), decimals.get(name[1:]))
+                if scale[name] is None:
+                    del scale[name]
+            setattr(self, name, stored)
+
+        self._storageMode = mode
+        self._storageScale = scale if len(scale) > 0 else None
+        self._decodedSamples = None
+
+    def _getSamples(self, name, start=None, stop=None):
+        """
+        Get sample array (or its part) as floating point values
+        regardless of storage mode.
+        """
+        data = getattr(self, name)
+        if isinstance(data, _DeferredSamples):
+            self._loadDeferredSamples()
+            data = getattr(self, name)
+        if data is None:
+            return None
+        if self._storageScale is not None and name in self._storageScale:
+            if start is not None or stop is not None:
+                return _decodeFixed(data[start:stop], self._storageScale[name])
+            # whole arrays are decoded only once.
+            if self._decodedSamples is None:
+                self._decodedSamples = {}
+            if name not in self._decodedSamples:
+                decoded = _decodeFixed(data, self._storageScale[name])
+                decoded.flags.writeable = False
+                self._decodedSamples[name] = decoded
+            return self._decodedSamples[name]
+        if start is not None or stop is not None:
+            data = data[start:stop]
+        return data
+
+    def _loadDeferredSamples(self):
+        """
+        Load sample arrays if they have not been loaded yet.
+        """
+        for value in list(self.__dict__.values()):
+            if isinstance(value, _DeferredSamples):
+                self.__dict__.update(value.loader())
+                return
+
+    def __getstate__(self):
+        self._loadDeferredSamples()
+        if '_decodedSamples' in self.__dict__:
+            state = self.__dict__.copy()
+            del state['_decodedSamples']
+            return state
+        return self.__dict__
+
+    storageMode = property(lambda self: self._storageMode)
+    """Storage mode of sample arrays. See :func:`setStorageMode`."""
+
     nSac = property(lambda self: self._nSac)
     """Number of saccades detected in this trial."""
 
@@ -1657,13 +1885,13 @@ class GazeData(object):
     nBlink = property(lambda self: self._nBlink)
     """Number of blinks detected in this trial."""
 
-    L = property(lambda self: self._L)
+    L = property(lambda self: self._getSamples('_L'))
     """List of gaze position (x, y) of left eye."""
 
-    R = property(lambda self: self._R)
+    R = property(lambda self: self._getSamples('_R'))
     """List of gaze position (x, y) of right eye."""
 
-    T = property(lambda self: self._T)
+    T = property(lambda self: self._getSamples('_T'))
     """List of timestamps when each gaze position was recorded."""
 
     Sac = property(lambda self: self._Sac)
@@ -1680,13 +1908,13 @@ class GazeData(object):
 
     recordedEye = property(lambda self: self._recordedEye)
 
-    Pupil = property(lambda self: self._Pupil)
+    Pupil = property(lambda self: self._getSamples('_Pupil'))
 
-    CameraSpecificData = property(lambda self: self._CameraSpecificData)
+    CameraSpecificData = property(lambda self: self._getSamples('_CameraSpecificData'))
 
     USBIOChannels = property(lambda self: self._USBIOChannels)
 
-    USBIOData = property(lambda self: self._USBIOData)
+    USBIOData = property(lambda self: self._getSamples('_USBIOData'))
 
     CalPointData = property(lambda self: self._CalPointData)
 
@@ -1717,14 +1945,14 @@ class GazeData(object):
             a float value or a numpy.ndarray object depending on the argument
         """
         if isinstance(sac, GazeParser.Core.SaccadeData):
-            if self._L is not None:
-                dx = np.diff(self._L[sac._startIndex:sac._endIndex, 0])
-                dy = np.diff(self._L[sac._startIndex:sac._endIndex, 1])
+            if self.L is not None:
+                dx = np.diff(self._getSamples('_L', sac._startIndex, sac._endIndex)[:, 0])
+                dy = np.diff(self._getSamples('_L', sac._startIndex, sac._endIndex)[:, 1])
                 l = np.sum(np.sqrt(dx ** 2 + dy ** 2))
 
-            if self._R is not None:
-                dx = np.diff(self._R[sac._startIndex:sac._endIndex, 0])
-                dy = np.diff(self._R[sac._startIndex:sac._endIndex, 1])
+            if self.R is not None:
+                dx = np.diff(self._getSamples('_R', sac._startIndex, sac._endIndex)[:, 0])
+                dy = np.diff(self._getSamples('_R', sac._startIndex, sac._endIndex)[:, 1])
                 r = np.sum(np.sqrt(dx ** 2 + dy ** 2))
 
             if self._recordedEye == 'L':
@@ -1737,15 +1965,15 @@ class GazeData(object):
             if self._recordedEye == 'L' or self._recordedEye == 'B':
                 l = np.zeros((len(sac), 1))
                 for i in range(len(sac)):
-                    dx = np.diff(self._L[sac[i]._startIndex:sac[i]._endIndex, 0])
-                    dy = np.diff(self._L[sac[i]._startIndex:sac[i]._endIndex, 1])
+                    dx = np.diff(self._getSamples('_L', sac[i]._startIndex, sac[i]._endIndex)[:, 0])
+                    dy = np.diff(self._getSamples('_L', sac[i]._startIndex, sac[i]._endIndex)[:, 1])
                     l[i] = np.sum(np.sqrt(dx ** 2 + dy ** 2))
 
             if self._recordedEye == 'R' or self._recordedEye == 'B':
                 r = np.zeros((len(sac), 1))
                 for i in range(len(sac)):
-                    dx = np.diff(self._R[sac[i]._startIndex:sac[i]._endIndex, 0])
-                    dy = np.diff(self._R[sac[i]._startIndex:sac[i]._endIndex, 1])
+                    dx = np.diff(self._getSamples('_R', sac[i]._startIndex, sac[i]._endIndex)[:, 0])
+                    dy = np.diff(self._getSamples('_R', sac[i]._startIndex, sac[i]._endIndex)[:, 1])
                     r[i] = np.sum(np.sqrt(dx ** 2 + dy ** 2))
 
             if self._recordedEye == 'L':
@@ -1934,3 +2162,119 @@ class GazeData(object):
             if (getattr(self, attr) != getattr(other, attr)).any():
                 print('"{}" is different'.format(attr))
                 return
+
+def _findDecimals(data, maxDecimals=6):
+    """
+    Return the smallest number of decimals with which data can be
+    represented without loss.  None is returned if not found.
+    """
+    finite = data[np.isfinite(data)]
+    for d in range(maxDecimals + 1):
+        if (np.round(finite, d) == finite).all():
+            return d
+    return None
+
+
+def _encodeFixed(data, decimals=None):
+    """
+    Encode an array as scaled int32.  Return a tuple of encoded array and
+    scale factor.  If data can not be encoded, data is returned as-is and
+    scale factor is None.
+    """
+    if decimals is None:
+        decimals = _findDecimals(data)
+        if decimals is None:
+            return data, None
+    scale = 10.0 ** decimals
+    nanIndex = np.isnan(data)
+    scaled = np.round(np.where(nanIndex, 0, data) * scale)
+    if len(scaled) > 0 and np.abs(scaled).max() >= np.iinfo(np.int32).max:
+        return data, None
+    # data are not encoded if they are not restored exactly.
+    if not (scaled[~nanIndex] / scale == data[~nanIndex]).all():
+        return data, None
+    encoded = scaled.astype(np.int32)
+    encoded[nanIndex] = _fixedNaN
+    return encoded, scale
+
+
+def _decodeFixed(data, scale):
+    decoded = data / scale
+    decoded[data == _fixedNaN] = np.nan
+    return decoded
+
+
+def _getEpochTimeBase(period, resolution):
+    if resolution <= 0:
+        raise ValueError('resolution must be a positive value.')
+    pre, post = period
+    return np.arange(-int(np.round(pre / resolution)), int(np.round(post / resolution)) + 1) * float(resolution)
+
+
+def _sampleAtTimes(T, data, times, resolution, resample):
+    """
+    Sample data (N x C) recorded at T at arbitrary times (any shape).
+    Returned array has shape times.shape + (C,).
+    """
+    T = np.asarray(T, dtype=float)
+    q = times.ravel()
+    out = np.full((len(q), data.shape[1]), np.nan)
+    if len(T) == 0 or len(q) == 0:
+        return out.reshape(times.shape + (data.shape[1],))
+
+    if len(T) == 1:
+        valid = np.abs(T[0] - q) <= resolution / 2.0
+        out[valid] = data[0]
+    elif resample:
+        # linear interpolation between two neighbors
+        idx = np.clip(np.searchsorted(T, q, side='right') - 1, 0, len(T) - 2)
+        # the left sample is used if two samples have the same timestamp.
+        dT = T[idx + 1] - T[idx]
+        w = np.zeros(len(q))
+        np.divide(q - T[idx], dT, out=w, where=dT > 0)
+        w = w[:, np.newaxis]
+        valid = (T[0] <= q) & (q <= T[-1])
+        out[valid] = (data[idx] * (1 - w) + data[idx + 1] * w)[valid]
+    else:
+        # choose nearer one from two neighbors
+        idx = np.clip(np.searchsorted(T, q), 1, len(T) - 1)
+        idx -= (q - T[idx - 1]) < (T[idx] - q)
+        valid = np.abs(T[idx] - q) <= resolution / 2.0
+        out[valid] = data[idx[valid]]
+
+    return out.reshape(times.shape + (data.shape[1],))
+
+
+def extractEpochs(data, text, period, eye=None, pupil=False, useRegexp=False, resolution=None, resample=False):
+    """
+    Extract time-locked epochs from a list of :class:`~GazeParser.Core.GazeData`
+    objects.  All epochs share a common time base.  See
+    :func:`~GazeParser.Core.GazeData.extractEpochs` for parameters.
+
+    :param data:
+        A :class:`~GazeParser.Core.GazeData` object or a list of them.
+    :param float resolution:
+        Sampling interval of the time base in msec.  If None, median
+        sampling interval of the first trial is used.  Default value is None.
+    :return:
+        A tuple of three elements: the time base, the epochs
+        (*n_epochs x n_samples x channels*) and an array of trial indices
+        from which each epoch was extracted.
+    """
+    if isinstance(data, GazeData):
+        data = [data]
+    if len(data) == 0:
+        raise ValueError('No data.')
+
+    if resolution is None:
+        resolution = np.median(np.diff(data[0].T))
+
+    epochs = []
+    trials = []
+    for i, d in enumerate(data):
+        timeBase, e = d.extractEpochs(text, period, eye=eye, pupil=pupil, useRegexp=useRegexp,
+                                      resolution=resolution, resample=resample)
+        epochs.append(e)
+        trials.append(np.full(e.shape[0], i, dtype=int))
+
+    return timeBase, np.concatenate(epochs), np.concatenate(trials)
@@ -130,7 +130,7 @@ def quickPlot(data, eye=None, period=(None, None), style='XY', xlim=None, ylim=N
         elif style in ('XYT', 'TXY'):
             si = data.startIndex
             ei = data.endIndex+1
-            t = data.parent._T
+            t = data.parent.T
             if eye != 'B':  # monocular
                 pyplot.plot(t[si:ei], traj[:, 0], '.-', label='X')
                 pyplot.plot(t[si:ei], traj[:, 1], '.-', label='Y')
@@ -154,11 +154,11 @@ def quickPlot(data, eye=None, period=(None, None), style='XY', xlim=None, ylim=N
         if period[0] is None:
             si = 0
         else:
-            si = np.where(data._T >= period[0])[0][0]
+            si = np.where(data.T >= period[0])[0][0]
         if period[0] is None:
             ei = -1
         else:
-            ei = np.where(data._T <= period[1])[0][-1]
+            ei = np.where(data.T <= period[1])[0][-1]
 
         if units.lower() == 'pix':
             sf = (1.0, 1.0)
@@ -167,7 +167,7 @@ def quickPlot(data, eye=None, period=(None, None), style='XY', xlim=None, ylim=N
 
         if style == 'XY':
             if eye == 'B':
-                traj = (sf*data._L[si:ei, :], sf*data._R[si:ei, :])
+                traj = (sf*data.L[si:ei, :], sf*data.R[si:ei, :])
                 notNansL = np.where(np.logical_not(np.isnan(traj[0][:,0])))[0]
                 if len(notNansL) > 0:
                     s = notNansL[0]
@@ -185,9 +185,9 @@ def quickPlot(data, eye=None, period=(None, None), style='XY', xlim=None, ylim=N
                 pyplot.legend()
             else:
                 if eye == 'L':
-                    traj = sf*data._L[si:ei, :]
+                    traj = sf*data.L[si:ei, :]
                 else: #R
-                    traj = sf*data._R[si:ei, :]
+                    traj = sf*data.R[si:ei, :]
 
                 notNans = np.where(np.logical_not(np.isnan(traj[:,0])))[0]
                 if len(notNans)>0:
@@ -199,22 +199,22 @@ def quickPlot(data, eye=None, period=(None, None), style='XY', xlim=None, ylim=N
 
         elif style in ('XYT', 'TXY'):
             if eye == 'L':
-                L = sf*data._L
-                pyplot.plot(data._T[si:ei], L[si:ei, 0], '.-', label='X')
-                pyplot.plot(data._T[si:ei], L[si:ei, 1], '.-', label='Y')
+                L = sf*data.L
+                pyplot.plot(data.T[si:ei], L[si:ei, 0], '.-', label='X')
+                pyplot.plot(data.T[si:ei], L[si:ei, 1], '.-', label='Y')
                 pyplot.legend()
             elif eye == 'R':
-                R = sf*data._R
-                pyplot.plot(data._T[si:ei], R[si:ei, 0], '.-', label='X')
-                pyplot.plot(data._T[si:ei], R[si:ei, 1], '.-', label='Y')
+                R = sf*data.R
+                pyplot.plot(data.T[si:ei], R[si:ei, 0], '.-', label='X')
+                pyplot.plot(data.T[si:ei], R[si:ei, 1], '.-', label='Y')
                 pyplot.legend()
             elif eye == 'B':
-                L = sf*data._L
-                R = sf*data._R
-                pyplot.plot(data._T[si:ei], L[si:ei, 0], '.-', label='LX')
-                pyplot.plot(data._T[si:ei], L[si:ei, 1], '.-', label='LY')
-                pyplot.plot(data._T[si:ei], R[si:ei, 0], '.-', label='RX')
-                pyplot.plot(data._T[si:ei], R[si:ei, 1], '.-', label='RY')
+                L = sf*data.L
+                R = sf*data.R
+                pyplot.plot(data.T[si:ei], L[si:ei, 0], '.-', label='LX')
+                pyplot.plot(data.T[si:ei], L[si:ei, 1], '.-', label='LY')
+                pyplot.plot(data.T[si:ei], R[si:ei, 0], '.-', label='RX')
+                pyplot.plot(data.T[si:ei], R[si:ei, 1], '.-', label='RY')
                 pyplot.legend()
             else:
                 raise ValueError('eye must be \'L\', \'R\', or \'B\'.')
@@ -22,6 +22,10 @@ Example
     #get a list of microsaccades as a list of the GazeParser.Core.Saccade objects.
     microsacc = buildMicroSaccadesListMonocular(data[0].L, samplingFreq=250)
 
+    #detect microsaccades in each fixation of all trials in parallel.
+    #the result is a dict of columns (trial, fixation, onset, ...).
+    table = detectMicroSaccades(data, unit='fixation')
+
 
 REFERENCE:
  Engbert, R., & Kliegl, R. (2003). Microsaccades uncover the orientation
@@ -29,8 +33,10 @@ REFERENCE:
 
 """
 
+import os
+import concurrent.futures
 import numpy as np
-from GazeParser.Core import SaccadeData
+from GazeParser.Core import SaccadeData, GazeData
 
 
 class MicroSacc(object):
@@ -74,12 +80,11 @@ class MicroSacc(object):
             v = self._vecvel(data)
             self.ms = self._microsacc(data, v)
         else:
-            # self.ms = self._binsacc(data[:, 0:2], data[:, 2:4])
-            lv = self.vecvel(data[:, 0:2])
-            rv = self.vecvel(data[:, 2:4])
+            lv = self._vecvel(data[:, 0:2])
+            rv = self._vecvel(data[:, 2:4])
             lms = self._microsacc(data[:, 0:2], lv)
             rms = self._microsacc(data[:, 2:4], rv)
-            self.ms = self._binsacc(lms, rms)
+            self.ms = _binsacc(lms, rms)
 
     def _vecvel(self, data):
         N = len(data)
@@ -99,45 +104,37 @@ class MicroSacc(object):
         #idx = np.where(((vdata[:, 0]/radiusX)**2 + (vdata[:, 1]/radiusY)**2) > 1)[0]
         idx = np.where(nan_greater((vdata[:, 0]/radiusX)**2 + (vdata[:, 1]/radiusY)**2, 1))[0]
 
+        # Find runs of consecutive indices.  A run is detected as a
+        # microsaccade if it has minSamples samples or more.
         N = len(idx)
-        sac = []
-        nsac = 0
-        dur = 1
-        a = 1
-        k = 0
-
-        while k < N-1:
-            if idx[k+1]-idx[k] == 1:
-                dur = dur+1
-            else:
-                if dur >= self.minSamples:
-                    b = k
-                    sac.append([idx[a], idx[b]])
-                    nsac += 1
-                a = k+1
-                dur = 1
-            k += 1
-        if dur >= self.minSamples:
-            b = k
-            sac.append([idx[a], idx[b]])
-            nsac += 1
-
-        sac = np.array(sac)
-        sac = np.hstack((sac, np.zeros((nsac, 5))))
+        if N == 0:
+            return np.zeros((0, 7))
+        breaks = np.flatnonzero(np.diff(idx) != 1)
+        first = np.hstack((0, breaks+1))
+        last = np.hstack((breaks, N-1))
+        valid = last - first + 1 >= self.minSamples
+        # As in the original port of the MATLAB script (where a=1 pointed
+        # the first element), the first run starts at its second element.
+        first[0] = 1
+        a = idx[first[valid]]
+        b = idx[last[valid]]
+
+        sac = np.zeros((len(a), 7))
+        if len(a) == 0:
+            return sac
         vabs = np.sqrt(vdata[:, 0]**2+vdata[:, 1]**2)
-        for s in range(len(sac)):
-            a = int(sac[s, 0])
-            b = int(sac[s, 1])
-            vpeak = np.max(vabs[a:b+1])
-            ampl = np.linalg.norm(data[a, :2]-data[b, :2])
-            sac[s, 2] = vpeak
-            sac[s, 3] = ampl
-            delx = data[b, 0] - data[a, 0]
-            dely = data[b, 1] - data[a, 1]
-            phi = 180/np.pi*np.arctan2(dely, delx)
-            sac[s, 4] = phi
-            sac[s, 5] = delx
-            sac[s, 6] = dely
+        # reduceat is applied to [a, b+1) and [b+1, next a) alternately.
+        # A sentinel is appended because b+1 may be equal to len(vabs).
+        bounds = np.column_stack((a, b+1)).ravel()
+        sac[:, 0] = a
+        sac[:, 1] = b
+        sac[:, 2] = np.maximum.reduceat(np.hstack((vabs, -np.inf)), bounds)[::2]
+        delx = data[b, 0] - data[a, 0]
+        dely = data[b, 1] - data[a, 1]
+        sac[:, 3] = np.sqrt(delx*delx + dely*dely)
+        sac[:, 4] = 180/np.pi*np.arctan2(dely, delx)
+        sac[:, 5] = delx
+        sac[:, 6] = dely
 
         return sac
 
@@ -146,59 +143,51 @@ class MicroSacc(object):
 
 def _binsacc(L, R):
     """
+    Each left eye's microsaccade is paired with the first right eye's
+    microsaccade which overlaps with it.  Then, binocular microsaccades
+    separated by less than 3 samples are merged.
+
     :param numpy.ndarray L: left eye's microsaccades, detected by MicroSacc.
     :param numpy.ndarray R: right eye's microsaccades, detected by MicroSacc.
     """
-    NL = L.shape[0]
-    # NR = R.shape[0]
-
-    sac = []
-    nsac = 0
-    for i in range(NL):
-        l1 = L[i, 0]
-        l2 = L[i, 1]
-        overlap = np.where((R[:, 1] >= l1) & (R[:, 0] <= l2))[0]
-        if len(overlap) > 0:
-            r1 = R[overlap[0], 0]
-            r2 = R[overlap[0], 1]
-            vl = L[i, 2]
-            vr = R[overlap[0], 2]
-            ampl = L[i, 3]
-            ampr = R[overlap[0], 3]
-            dxl = L[i, 5]
-            dyl = L[i, 6]
-            dxr = R[overlap[0], 5]
-            dyr = R[overlap[0], 6]
-            dx = dxl+dxr
-            dy = dyl+dyr
-            phi = 180/np.pi*np.arctan2(dy, dx)
-            sac.append([min([l1, r1]), max([l2, r2]), (vl+vr)/2.0, (ampl+ampr)/2.0,
-                        phi, (dxl+dxr)/2.0, (dyr+dyl)/2.0])
-            nsac += 1
-
-    k = 0
-    while k < nsac:
-        if sac[k][1]+3 <= sac[k+1][0]:
-            k += 1
-        else:
-            sac[k][1] = sac[k+1][1]
-            sac[k][2] = max([sac[k, 2], sac[k+1][2]])
-            dx1 = sac[k][5]
-            dy1 = sac[k][6]
-            dx2 = sac[k+1][5]
-            dy2 = sac[k+1][6]
-            dx = dx1+dx2
-            dy = dy1+dy2
-            amp = np.sqrt(dx**2+dy**2)
-            phi = 180/np.pi*np.arctan2(dy, dx)
-            sac[k][3] = amp
-            sac[k][4] = phi
-            sac[k][5] = dx
-            sac[k][6] = dy
-            del sac[k+1]
-            nsac -= 1
-
-    return np.array(sac)
+    if len(L) == 0 or len(R) == 0:
+        return np.zeros((0, 7))
+
+    # Microsaccades of each eye are sorted and do not overlap each other.
+    # Therefore, the first right eye's microsaccade which terminates after
+    # the onset of a left eye's microsaccade is found by a single sweep
+    # over the sorted arrays.
+    j = np.searchsorted(R[:, 1], L[:, 0], side='left')
+    paired = j < len(R)
+    paired[paired] = R[j[paired], 0] <= L[paired, 1]
+    L = L[paired]
+    R = R[j[paired]]
+    if len(L) == 0:
+        return np.zeros((0, 7))
+
+    dx = L[:, 5]+R[:, 5]
+    dy = L[:, 6]+R[:, 6]
+    sac = np.column_stack((np.minimum(L[:, 0], R[:, 0]), np.maximum(L[:, 1], R[:, 1]),
+                           (L[:, 2]+R[:, 2])/2.0, (L[:, 3]+R[:, 3])/2.0,
+                           180/np.pi*np.arctan2(dy, dx), dx/2.0, dy/2.0))
+
+    # A microsaccade is merged into the previous one if it starts less
+    # than 3 samples after the termination of the previous one.
+    first = np.flatnonzero(np.hstack((True, sac[:-1, 1]+3 <= sac[1:, 0])))
+    last = np.hstack((first[1:], len(sac))) - 1
+    merged = last > first
+
+    ms = sac[first]
+    ms[:, 1] = sac[last, 1]
+    ms[:, 2] = np.maximum.reduceat(sac[:, 2], first)
+    dx = np.add.reduceat(sac[:, 5], first)[merged]
+    dy = np.add.reduceat(sac[:, 6], first)[merged]
+    ms[merged, 3] = np.sqrt(dx**2+dy**2)
+    ms[merged, 4] = 180/np.pi*np.arctan2(dy, dx)
+    ms[merged, 5] = dx
+    ms[merged, 6] = dy
+
+    return ms
 
 
 def buildMicroSaccadesListMonocular(gazeData, eye, samplingFreq=None, velocityType='slow', vfac=6, minSamples=3):
@@ -288,9 +277,307 @@ def nan_greater(v1, v2):
         return v1 > v2
     
     # nan was found.
-    val = np.zeros(v1.shape, dtype=np.bool)
+    val = np.zeros(v1.shape, dtype=bool)
     val[idx] = False
     idx = np.where(v1==v1)[0]
     val[idx] = (v1[idx] > v2)
     
     return val
+
+
+# Columns of the table returned by detectMicroSaccades.
+tableColumns = ('trial', 'fixation', 'message', 'onset', 'offset', 'peakVelocity',
+                'amplitude', 'direction', 'dx', 'dy')
+
+
+def _getSegments(gazeData, unit, message, period, useRegexp):
+    """
+    Return a list of (fixation, message, start, stop) where start and stop
+    are indices of samples.  fixation and message are -1 if unit is not
+    'fixation' or 'message'.
+    """
+    if unit == 'trial':
+        return [(-1, -1, 0, len(gazeData.T))]
+    elif unit == 'fixation':
+        return [(i, -1, f.startIndex, f.endIndex+1) for i, f in enumerate(gazeData.Fix)]
+    elif unit == 'message':
+        T = gazeData.T
+        segments = []
+        for i in gazeData.findMessage(message, byIndices=True, useRegexp=useRegexp):
+            t = gazeData.Msg[i].time
+            segments.append((-1, i, np.searchsorted(T, t-period[0], side='left'),
+                             np.searchsorted(T, t+period[1], side='right')))
+        return segments
+    raise ValueError('unit must be \'trial\', \'fixation\' or \'message\'.')
+
+
+def _detectInTrial(trial, T, HV, segments, samplingFreq, velocityType, vfac, minSamples):
+    # This function must be defined at module level to be called in
+    # worker processes.
+    rows = [np.zeros((0, len(tableColumns)))]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for fixation, message, start, stop in segments:
+            ms = MicroSacc(HV[start:stop], samplingFreq, velocityType, vfac, minSamples).ms
+            if len(ms) == 0:
+                continue
+            n = len(ms)
+            rows.append(np.column_stack((np.full(n, trial), np.full(n, fixation), np.full(n, message),
+                                         T[ms[:, 0].astype(int)+start], T[ms[:, 1].astype(int)+start],
+                                         ms[:, 2:7])))
+    return np.vstack(rows)
+
+
+def detectMicroSaccades(data, eye=None, unit='trial', message=None, period=None, useRegexp=False,
+                        samplingFreq=None, velocityType='slow', vfac=6, minSamples=3, workers=None):
+    """
+    Detect microsaccades in many trials by :class:`MicroSacc`.  Trials are
+    processed in parallel by a process pool.  Microsaccades are detected in
+    the whole trial, in each fixation or in a period around messages.
+
+    Return value is a dict object whose values are numpy.ndarray objects of
+    the same length (one element for each microsaccade).  Keys are listed
+    in :data:`tableColumns`.
+
+    ============ ===========================================================
+    key          value
+    ============ ===========================================================
+    trial        Index of the trial.
+    fixation     Index of the fixation (-1 if unit is not 'fixation').
+    message      Index of the message (-1 if unit is not 'message').
+    onset        Onset time of the microsaccade (msec).
+    offset       Offset time of the microsaccade (msec).
+    peakVelocity Peak velocity.
+    amplitude    Amplitude.
+    direction    Direction (deg).
+    dx           Horizontal amplitude.
+    dy           Vertical amplitude.
+    ============ ===========================================================
+
+    :param data:
+        A :class:`~GazeParser.Core.GazeData` object, a list of them or
+        name of a GazeParser data file.
+    :param str eye:
+        'L', 'R' or 'B'.  If 'B', binocular microsaccades are detected.
+        If None, recorded eye is used.  Default value is None.
+    :param str unit:
+        'trial', 'fixation' or 'message'.  Default value is 'trial'.
+    :param str message:
+        If unit is 'message', microsaccades are detected around messages
+        that include this text.  See
+        :func:`~GazeParser.Core.GazeData.findMessage`.
+    :param tuple period:
+        (pre, post).  If unit is 'message', microsaccades are detected from
+        'pre' msec before the message to 'post' msec after the message.
+    :param bool useRegexp:
+        If True, message is considered as a regular expression.
+        Default value is False.
+    :param float samplingFreq:
+        Sampling frequency of the data.  If None, sampling frequency is
+        calculated from each trial.  Default value is None.
+    :param int workers:
+        Number of processes.  If None, number of CPUs is used.  If 1,
+        trials are processed in the current process.  Default value is None.
+
+    Other parameters are the same as :class:`MicroSacc`.
+    """
+    if isinstance(data, GazeData):
+        data = [data]
+    elif isinstance(data, (str, os.PathLike)):
+        import GazeParser.Utility
+        data = GazeParser.Utility.load(data)[0]
+    if unit == 'message' and (message is None or period is None):
+        raise ValueError('message and period must be specified if unit is \'message\'.')
+    if velocityType not in ['slow', 'fast']:
+        raise ValueError('Invalid velocityType.')
+
+    tasks = []
+    for trial, gazeData in enumerate(data):
+        T = gazeData.T
+        if samplingFreq is None:
+            freq = 1000.0/np.mean(np.diff(T))
+        else:
+            freq = samplingFreq
+        tasks.append((trial, T, gazeData.getSampleMatrix(eye),
+                      _getSegments(gazeData, unit, message, period, useRegexp),
+                      freq, velocityType, vfac, minSamples))
+
+    if workers == 1:
+        results = [_detectInTrial(*task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(_detectInTrial, *zip(*tasks))) if len(tasks) > 0 else []
+
+    table = np.vstack([np.zeros((0, len(tableColumns)))] + results)
+    columns = {}
+    for i, name in enumerate(tableColumns):
+        if name in ('trial', 'fixation', 'message'):
+            columns[name] = table[:, i].astype(int)
+        else:
+            columns[name] = table[:, i]
+    return columns
+
+
+class OnlineMicroSacc(object):
+    """
+    Detect microsaccades from a live gaze stream.  Velocity is calculated
+    in the same way as :class:`MicroSacc`, but the median-based threshold
+    is calculated from velocities in a sliding window of the latest samples
+    instead of the whole recording.  Memory usage and processing time of
+    each chunk are bounded by the size of the window and the chunk.
+
+    Example::
+
+        detector = OnlineMicroSacc(samplingFreq=1000)
+        while recording:
+            for ms in detector.update(tracker.getEyePositionList(-50)):
+                onset, offset, peakVelocity, amplitude, direction, dx, dy = ms
+    """
+    def __init__(self, samplingFreq, velocityType='slow', vfac=6, minSamples=3, eye='L', window=1000, warmup=200):
+        """
+        :param float samplingFreq: sampling frequency.
+        :param str velocityType: 'slow' or 'fast'. See Engbert & Kliegl (2003) for detail.
+            Default value is 'slow'.
+        :param int vfac: Modifying threshold for microsaccade detection. See Engbert & Kliegl (2003) for detail.
+            Default value is 6.
+        :param int minSamples: Microsaccades must have samples equal or larger than this value.
+            Default value is 3.
+        :param str eye: 'L' or 'R'.  Eye used when binocular data are given.
+            Default value is 'L'.
+        :param int window: Number of the latest samples used to calculate threshold.
+            Default value is 1000.
+        :param int warmup: Microsaccades are not detected until velocities of this number
+            of samples are obtained.  Default value is 200.
+        """
+        if velocityType not in ['slow', 'fast']:
+            raise ValueError('Invalid velocityType.')
+        if eye not in ['L', 'R']:
+            raise ValueError('eye must be \'L\' or \'R\'.')
+        if warmup > window:
+            raise ValueError('warmup must not be larger than window.')
+
+        self.samplingFreq = samplingFreq
+        self.velocityType = velocityType
+        self.vfac = vfac
+        self.minSamples = minSamples
+        self.eye = eye
+        self.window = window
+        self.warmup = warmup
+        # Number of samples before and after the sample whose velocity
+        # is calculated.
+        self._halfWidth = 2 if velocityType == 'slow' else 1
+        self.reset()
+
+    def reset(self):
+        """
+        Discard all samples.  Call this method when a new recording starts.
+        """
+        self._tail = np.zeros((0, 3))
+        self._velocities = np.full((self.window, 2), np.nan)
+        self._nVelocities = 0
+        self._lastTime = -np.inf
+        self._run = None
+        self.radius = (np.nan, np.nan)
+
+    def _getSamples(self, chunk):
+        """
+        Return new samples in a chunk as an N x 3 array (t, x, y) sorted by
+        time.
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.ndim != 2 or chunk.shape[1] not in (3, 4, 5, 7):
+            raise ValueError('Chunk must be an array returned by getEyePositionList.')
+        if chunk.shape[1] in (3, 4) or self.eye == 'L':
+            samples = chunk[:, 0:3]
+        else:
+            samples = chunk[:, (0, 3, 4)]
+        # getEyePositionList returns the latest sample first.
+        samples = samples[np.argsort(samples[:, 0], kind='stable')]
+        # samples may overlap with the previous chunk if n > 0.
+        return samples[samples[:, 0] > self._lastTime]
+
+    def _vecvel(self, data):
+        if self.velocityType == 'fast':
+            return self.samplingFreq/2.0 * (data[2:]-data[:-2])
+        else:
+            return self.samplingFreq/6.0 * (data[4:]+data[3:-1]-data[1:-3]-data[:-4])
+
+    def _updateThreshold(self, v):
+        # Velocities are stored in a ring buffer.
+        for i in range(0, len(v), self.window):
+            block = v[i:i+self.window]
+            pos = self._nVelocities % self.window
+            n = min(len(block), self.window-pos)
+            self._velocities[pos:pos+n] = block[:n]
+            self._velocities[:len(block)-n] = block[n:]
+            self._nVelocities += len(block)
+        w = self._velocities
+        msdx = np.sqrt(np.nanmedian(w[:, 0]**2) - np.nanmedian(w[:, 0])**2)
+        msdy = np.sqrt(np.nanmedian(w[:, 1]**2) - np.nanmedian(w[:, 1])**2)
+        self.radius = (self.vfac * msdx, self.vfac * msdy)
+
+    def update(self, chunk):
+        """
+        Add samples and return microsaccades which terminated in these
+        samples.  Microsaccades are detected with a delay of a few samples
+        because velocity of a sample is calculated from the following
+        samples.
+
+        :param chunk: An array returned by
+            :func:`~GazeParser.TrackingTools.BaseController.getEyePositionList`.
+            None is accepted and ignored.
+        :return: An nx7 array.  Columns are the same as :class:`MicroSacc`
+            except that column 0 and 1 are onset and offset time of the
+            microsaccade.
+        """
+        events = np.zeros((0, 7))
+        if chunk is None or len(chunk) == 0:
+            return events
+        samples = self._getSamples(chunk)
+        if len(samples) == 0:
+            return events
+        self._lastTime = samples[-1, 0]
+
+        h = self._halfWidth
+        buf = np.vstack((self._tail, samples))
+        self._tail = buf[-2*h:]
+        if len(buf) <= 2*h:
+            return events
+        v = self._vecvel(buf[:, 1:3])
+        center = buf[h:-h]
+
+        self._updateThreshold(v)
+        if self._nVelocities < self.warmup:
+            return events
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            supra = nan_greater((v[:, 0]/self.radius[0])**2 + (v[:, 1]/self.radius[1])**2, 1)
+        vabs = np.sqrt(v[:, 0]**2+v[:, 1]**2)
+
+        # Runs of supra-threshold samples.  A run which continues from
+        # the previous chunk is extended, and a run which reaches the end
+        # of this chunk is kept for the next chunk.
+        d = np.diff(np.hstack((False, supra, False)).astype(int))
+        runs = [(center[f], l-f+1, vabs[f:l+1].max(), center[l])
+                for f, l in zip(np.flatnonzero(d == 1), np.flatnonzero(d == -1)-1)]
+        closed = []
+        if self._run is not None:
+            start, length, peak, end = self._run
+            if supra[0]:
+                runs[0] = (start, length+runs[0][1], max(peak, runs[0][2]), runs[0][3])
+            else:
+                closed.append(self._run)
+            self._run = None
+        if supra[-1]:
+            self._run = runs.pop()
+        closed.extend(runs)
+
+        rows = []
+        for start, length, peak, end in closed:
+            if length < self.minSamples:
+                continue
+            dx = end[1]-start[1]
+            dy = end[2]-start[2]
+            rows.append((start[0], end[0], peak, np.sqrt(dx*dx+dy*dy), 180/np.pi*np.arctan2(dy, dx), dx, dy))
+        if len(rows) > 0:
+            events = np.array(rows)
+        return events
@@ -126,7 +126,18 @@ class RectRegion(object):
         return msg
 
 class ImageRegion(object):
-    def __init__(self, image, origin='center'):
+    def __init__(self, image, origin='center', value=None):
+        """
+        Create a region from an image.
+
+        :param image:
+            2D array.  Pixels are indexed by integer coordinates as
+            image[y, x].
+        :param value:
+            If None, pixels with positive values are included in the
+            region.  Otherwise, the image is treated as a label map and
+            pixels equal to value are included.  Default value is None.
+        """
         if not isinstance(image, np.ndarray):
             try:
                 image = np.asarray(image)
@@ -137,6 +148,13 @@ class ImageRegion(object):
             raise ValueError('Image must be 2D (monochrome) array')
 
         self.imageArray = image
+        self.value = value
+
+    def _test(self, values):
+        if self.value is None:
+            return values > 0
+        else:
+            return values == self.value
 
     def contains(self, data, mode='all'):
         if not mode.lower() in ('all', 'any'):
@@ -148,13 +166,15 @@ class ImageRegion(object):
         if hasattr(data[0], '__iter__'):  # assume list of points
             # y, x
             values = self.imageArray[data[:,1],data[:,0]]
+            if self.value is not None:
+                values = values == self.value
             if mode.lower() == 'all':
                 return values.all()
             else:  # any
                 return values.any()
 
         else:  # point
-            if self.imageArray[data[1],data[0]] > 0:
+            if self._test(self.imageArray[data[1],data[0]]):
                 return True
             else:
                 return False
@@ -163,8 +183,11 @@ class ImageRegion(object):
         msg = '<{}.{}, '.format(self.__class__.__module__,
                                 self.__class__.__name__)
         
-        msg += 'shape={}>'.format(
+        msg += 'shape={}'.format(
             self.imageArray.shape)
+        if self.value is not None:
+            msg += ', value={}'.format(self.value)
+        msg += '>'
         
         return msg
 
@@ -251,3 +274,538 @@ def getFixationsInRegion(data, region, period=[None, None], useCenter=True, cont
         return fixlist
     else:
         return data.Fix[fixlist]
+
+
+class RegionSet(object):
+    def __init__(self, regions=(), labels=None):
+        """
+        Create a set of regions (areas of interest).  Points, fixations
+        and samples are labelled with indices of regions at once.
+        If regions overlap, the region added first has priority.
+
+        :param regions:
+            A list of :class:`~GazeParser.Region.CircleRegion`,
+            :class:`~GazeParser.Region.RectRegion` and
+            :class:`~GazeParser.Region.ImageRegion` objects.
+        :param labels:
+            A list of labels of regions.  If None, indices of regions are
+            used as labels.  Default value is None.
+        """
+        if labels is None:
+            labels = [None] * len(regions)
+        elif len(labels) != len(regions):
+            raise ValueError('Length of labels must be the same as that of regions.')
+
+        self.regions = []
+        self.labels = []
+        self._index = None
+        for region, label in zip(regions, labels):
+            self.add(region, label)
+
+    def add(self, region, label=None):
+        """
+        Add a region to the set.
+
+        :param region:
+            An instance of :class:`~GazeParser.Region.CircleRegion`,
+            :class:`~GazeParser.Region.RectRegion` or
+            :class:`~GazeParser.Region.ImageRegion`.
+        :param label:
+            Label of the region.  If None, index of the region is used.
+            Default value is None.
+        """
+        if not isinstance(region, (CircleRegion, RectRegion, ImageRegion)):
+            raise ValueError('region must be CircleRegion, RectRegion or ImageRegion.')
+        if label is None:
+            label = len(self.regions)
+        self.regions.append(region)
+        self.labels.append(label)
+        self._index = None
+
+    def __len__(self):
+        return len(self.regions)
+
+    def addLabelMap(self, image, values=None, labels=None):
+        """
+        Add regions from a label map, i.e. an image of which pixel values
+        are IDs of regions (e.g. a mask generated by
+        :func:`GazeParser.ScanMatch.generateMaskFromArray`).  An
+        :class:`~GazeParser.Region.ImageRegion` is added for each value,
+        and the image is shared by these regions.  Regions are looked up
+        by pixel values directly.
+
+        :param image:
+            2D array of IDs.
+        :param values:
+            A list of IDs to be added.  If None, all values in the image
+            except 0 are added in ascending order.  Default value is None.
+        :param labels:
+            A list of labels of regions.  If None, indices of regions are
+            used as labels.  Default value is None.
+        """
+        image = np.asarray(image)
+        if values is None:
+            values = np.unique(image)
+            values = values[values != 0]
+        if labels is None:
+            labels = [None] * len(values)
+        elif len(labels) != len(values):
+            raise ValueError('Length of labels must be the same as that of values.')
+        for value, label in zip(values, labels):
+            self.add(ImageRegion(image, value=value), label)
+
+    def buildIndex(self, cellSize=None):
+        """
+        Build spatial index of regions.  The index is built automatically
+        at the first query after regions are added.  Call this method to
+        rebuild the index if attributes of regions are modified.
+
+        CircleRegion and RectRegion are registered to cells of a grid
+        which overlap their bounding boxes, so that each point is tested
+        only against regions in its cell.  ImageRegions which share the
+        same label map are looked up by pixel values.
+
+        :param float cellSize:
+            Size of cells of the grid.  If None, the median of width and
+            height of regions is used.  Default value is None.
+        """
+        index = {}
+
+        # CircleRegion: (x, y, r, nan), RectRegion: (x1, x2, y1, y2)
+        shapes = [i for i, r in enumerate(self.regions) if not isinstance(r, ImageRegion)]
+        isCircle = np.zeros(len(self.regions), dtype=bool)
+        params = np.full((len(self.regions), 4), np.nan)
+        bbox = np.zeros((len(shapes), 4))
+        for k, i in enumerate(shapes):
+            r = self.regions[i]
+            if isinstance(r, CircleRegion):
+                isCircle[i] = True
+                params[i, :3] = (r.x, r.y, r.r)
+                bbox[k] = (r.x-r.r, r.x+r.r, r.y-r.r, r.y+r.r)
+            else:
+                params[i] = (r.x1, r.x2, r.y1, r.y2)
+                bbox[k] = params[i]
+        index['isCircle'] = isCircle
+        index['params'] = params
+
+        if len(shapes) > 0:
+            if cellSize is None:
+                cellSize = np.median(np.hstack((bbox[:, 1]-bbox[:, 0], bbox[:, 3]-bbox[:, 2])))
+            origin = bbox[:, [0, 2]].min(axis=0)
+            extent = bbox[:, [1, 3]].max(axis=0) - origin
+            # limit number of cells to 4096 x 4096
+            cellSize = max(cellSize, extent.max()/4096.0, np.finfo(float).tiny)
+            shape = (np.floor(extent/cellSize) + 1).astype(int)  # nx, ny
+
+            c0 = np.floor((bbox[:, [0, 2]] - origin) / cellSize).astype(int)
+            c1 = np.minimum(np.floor((bbox[:, [1, 3]] - origin) / cellSize).astype(int), shape-1)
+            cells = []
+            owners = []
+            for k, i in enumerate(shapes):
+                iy, ix = np.mgrid[c0[k, 1]:c1[k, 1]+1, c0[k, 0]:c1[k, 0]+1]
+                cells.append((iy*shape[0] + ix).ravel())
+                owners.append(np.full(cells[-1].size, i))
+            cells = np.hstack(cells)
+            owners = np.hstack(owners)
+            # regions in a cell are sorted by priority.
+            order = np.lexsort((owners, cells))
+            counts = np.bincount(cells, minlength=shape[0]*shape[1])
+            index['grid'] = (origin, cellSize, shape, counts,
+                             np.hstack((0, np.cumsum(counts)[:-1])), owners[order])
+
+        # ImageRegions sharing the same image are looked up together.
+        maps = {}
+        for i, r in enumerate(self.regions):
+            if isinstance(r, ImageRegion):
+                maps.setdefault(id(r.imageArray), []).append(i)
+        index['maps'] = [(self.regions[m[0]].imageArray, m) for m in maps.values()]
+
+        self._index = index
+
+    def _query(self, points, first):
+        # Return indices of points and regions which include them.  If first
+        # is True, only the region with the highest priority is returned for
+        # each point.
+        if self._index is None:
+            self.buildIndex()
+        index = self._index
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        x = points[:, 0]
+        y = points[:, 1]
+        hitPoints = []
+        hitRegions = []
+        if first:
+            label = np.full(len(points), len(self.regions), dtype=int)
+
+        if 'grid' in index:
+            origin, cellSize, shape, counts, starts, owners = index['grid']
+            with np.errstate(invalid='ignore'):
+                ix = np.floor((x - origin[0]) / cellSize)
+                iy = np.floor((y - origin[1]) / cellSize)
+                inGrid = np.flatnonzero((0 <= ix) & (ix < shape[0]) & (0 <= iy) & (iy < shape[1]))
+            cell = iy[inGrid].astype(int)*shape[0] + ix[inGrid].astype(int)
+            nCandidates = counts[cell]
+            # k-th candidates of all points are tested at once.
+            for k in range(nCandidates.max() if len(cell) > 0 else 0):
+                sel = np.flatnonzero(nCandidates > k)
+                if first:
+                    sel = sel[label[inGrid[sel]] == len(self.regions)]
+                if len(sel) == 0:
+                    break
+                p = inGrid[sel]
+                r = owners[starts[cell[sel]] + k]
+                P = index['params'][r]
+                circle = index['isCircle'][r]
+                hit = np.where(circle,
+                               np.sqrt((x[p]-P[:, 0])**2 + (y[p]-P[:, 1])**2) < P[:, 2],
+                               (P[:, 0] < x[p]) & (x[p] < P[:, 1]) & (P[:, 2] < y[p]) & (y[p] < P[:, 3]))
+                if first:
+                    label[p[hit]] = r[hit]
+                else:
+                    hitPoints.append(p[hit])
+                    hitRegions.append(r[hit])
+
+        for image, members in index['maps']:
+            h, w = image.shape
+            with np.errstate(invalid='ignore'):
+                p = np.flatnonzero((0 <= x) & (x < w) & (0 <= y) & (y < h))
+            values = image[y[p].astype(int), x[p].astype(int)]
+            # a value is mapped to the first region with the value.
+            labelled = [i for i in members if self.regions[i].value is not None]
+            if len(labelled) > 0:
+                keys = np.array([self.regions[i].value for i in labelled])
+                order = np.argsort(keys, kind='stable')
+                keys = keys[order]
+                ids = np.array(labelled)[order]
+                pos = np.minimum(np.searchsorted(keys, values), len(keys)-1)
+                hit = keys[pos] == values
+                if not first:
+                    # regions with the same value are all returned.
+                    for i in labelled:
+                        m = values == self.regions[i].value
+                        hitPoints.append(p[m])
+                        hitRegions.append(np.full(m.sum(), i))
+                else:
+                    label[p[hit]] = np.minimum(label[p[hit]], ids[pos[hit]])
+            for i in members:
+                if self.regions[i].value is None:
+                    m = values > 0
+                    if first:
+                        label[p[m]] = np.minimum(label[p[m]], i)
+                    else:
+                        hitPoints.append(p[m])
+                        hitRegions.append(np.full(m.sum(), i))
+
+        if first:
+            label[label == len(self.regions)] = -1
+            return label
+        if len(hitPoints) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        hitPoints = np.hstack(hitPoints)
+        hitRegions = np.hstack(hitRegions)
+        order = np.lexsort((hitRegions, hitPoints))
+        return hitPoints[order], hitRegions[order]
+
+    def findRegions(self, points):
+        """
+        Find all regions which include each point.
+
+        :param points:
+            An *N x 2* array of horizontal and vertical positions.
+        :return:
+            A tuple of two numpy.ndarray, indices of points and indices of
+            regions.  They are sorted by points and then by priority of
+            regions.
+        """
+        return self._query(points, False)
+
+    def contains(self, points):
+        """
+        Test whether points are included in each region.
+
+        :param points:
+            An *N x 2* array of horizontal and vertical positions.
+            Points including numpy.nan are not included in any region.
+        :return:
+            An *N x K* boolean numpy.ndarray, where K is the number of
+            regions.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        result = np.zeros((len(points), len(self.regions)), dtype=bool)
+        result[self._query(points, False)] = True
+        return result
+
+    def labelPoints(self, points):
+        """
+        Get index of the region which includes each point.  If regions
+        overlap, the region added first is used.  Points are looked up
+        by the spatial index (see :func:`buildIndex`), so that time does
+        not depend much on the number of regions.
+
+        :param points:
+            An *N x 2* array of horizontal and vertical positions.
+        :return:
+            A numpy.ndarray of indices of regions.  -1 is used for points
+            which are not included in any region.
+        """
+        return self._query(points, True)
+
+    def labelFixations(self, data):
+        """
+        Get index of the region which includes the center of each
+        fixation.
+
+        :param data:
+            An instance of :class:`~GazeParser.Core.GazeData`.
+        :return:
+            A numpy.ndarray of indices of regions (see :func:`labelPoints`).
+        """
+        return self.labelPoints(data.getFixCenter())
+
+    def labelSamples(self, data, eye=None):
+        """
+        Get index of the region which includes each gaze sample.
+
+        :param data:
+            An instance of :class:`~GazeParser.Core.GazeData`.
+        :param str eye:
+            'L', 'R' or 'B'.  If 'B', gaze position of the left and right
+            eye is averaged.  If None, recorded eye is used.
+            Default value is None.
+        :return:
+            A numpy.ndarray of indices of regions (see :func:`labelPoints`).
+        """
+        return self.labelPoints(_getGazePosition(data, eye))
+
+    def getStatistics(self, data, unit='fixation', period=(None, None), eye=None):
+        """
+        Get dwell time, latency of the first entry, number of fixations
+        (or samples) and number of revisits of each region.
+
+        A visit is a run of consecutive fixations (or samples) in the same
+        region.  Number of revisits is the number of visits minus one.
+
+        :param data:
+            An instance of :class:`~GazeParser.Core.GazeData`.
+        :param str unit:
+            'fixation' or 'sample'.  If 'fixation', fixation centers are
+            used and dwell time is the sum of fixation durations.  If
+            'sample', gaze samples are used and dwell time is the sum of
+            sampling intervals.  Default value is 'fixation'.
+        :param period:
+            A tuple of start and end time.  Only fixations which started
+            and finished within the period (or samples in the period) are
+            used.  Use None to specify the beginning and the end of the
+            data.  Default value is (None, None).
+        :param str eye:
+            Used when unit is 'sample'.  See :func:`labelSamples`.
+        :return:
+            A dict of 'label', 'count', 'dwellTime', 'firstEntry', 'entries'
+            and 'revisits'.  Values except 'label' are numpy.ndarray of
+            length K (number of regions).  Latency of the first entry is
+            measured from the beginning of the period, and it is numpy.nan
+            if the region is never visited.
+        """
+        labels, onset, duration, start = self._getLabels(data, unit, period, eye)
+        return _getLabelStatistics(labels, onset, duration, len(self.regions), start, self.labels)
+
+    def _getLabels(self, data, unit, period, eye):
+        # Labels, onset and duration of fixations (or samples) in the period.
+        start = data.T[0] if period[0] is None else period[0]
+        end = data.T[-1] if period[1] is None else period[1]
+
+        if unit == 'fixation':
+            times = data.getFixTime()
+            use = (start <= times[:, 0]) & (times[:, 1] <= end)
+            labels = self.labelFixations(data)[use]
+            onset = times[use, 0]
+            duration = times[use, 1] - times[use, 0]
+        elif unit == 'sample':
+            T = np.asarray(data.T, dtype=float)
+            if len(T) > 1:
+                duration = np.diff(T, append=T[-1] + np.median(np.diff(T)))
+            else:
+                duration = np.zeros(len(T))
+            use = (start <= T) & (T <= end)
+            labels = self.labelSamples(data, eye)[use]
+            onset = T[use]
+            duration = duration[use]
+        else:
+            raise ValueError('unit must be "fixation" or "sample".')
+
+        return labels, onset, duration, start
+
+    def getVisits(self, data, unit='sample', period=(None, None), eye=None, includeOutside=False):
+        """
+        Run-length encode labels of samples (or fixations) into visits.
+        A visit is a run of consecutive samples (or fixations) in the same
+        region.
+
+        :param data:
+            An instance of :class:`~GazeParser.Core.GazeData` or a list of
+            them.
+        :param str unit:
+            'sample' or 'fixation'.  Default value is 'sample'.
+        :param period:
+            See :func:`getStatistics`.
+        :param str eye:
+            Used when unit is 'sample'.  See :func:`labelSamples`.
+        :param bool includeOutside:
+            If True, runs outside all regions are also returned with
+            region -1.  Default value is False.
+        :return:
+            A dict of numpy.ndarray.  Keys are listed in
+            :data:`visitColumns`: index of trial in the list (0 if data
+            is a GazeData object), index of region, start and end time of
+            the visit.  End time is the end of the last fixation (or the
+            time of the sample after the last sample).
+        """
+        if isinstance(data, (list, tuple, np.ndarray)):
+            trials = data
+        else:
+            trials = [data]
+
+        columns = {key: [] for key in visitColumns}
+        for tr, gazeData in enumerate(trials):
+            labels, onset, duration, start = self._getLabels(gazeData, unit, period, eye)
+            starts, regions = _getRuns(labels)
+            ends = np.hstack((starts[1:], len(labels)))[:len(starts)] - 1
+            if not includeOutside:
+                inside = regions >= 0
+                starts, ends, regions = starts[inside], ends[inside], regions[inside]
+            columns['trial'].append(np.full(len(starts), tr, dtype=int))
+            columns['region'].append(regions.astype(int))
+            columns['start'].append(onset[starts])
+            columns['end'].append(onset[ends] + duration[ends])
+
+        if len(trials) == 0:
+            return {'trial': np.zeros(0, dtype=int), 'region': np.zeros(0, dtype=int),
+                    'start': np.zeros(0), 'end': np.zeros(0)}
+        return {key: np.hstack(values) for key, values in columns.items()}
+
+    def getTransitionMatrix(self, data, unit='sample', period=(None, None), eye=None, perTrial=False):
+        """
+        Count transitions between regions.  Periods outside all regions are
+        skipped, so that leaving a region and returning to it is counted
+        as a transition from the region to itself.
+
+        :param data:
+            An instance of :class:`~GazeParser.Core.GazeData` or a list of
+            them.
+        :param str unit:
+            'sample' or 'fixation'.  Default value is 'sample'.
+        :param period:
+            See :func:`getStatistics`.
+        :param str eye:
+            Used when unit is 'sample'.  See :func:`labelSamples`.
+        :param bool perTrial:
+            If True, a matrix is returned for each trial.  Default value
+            is False.
+        :return:
+            A *K x K* numpy.ndarray, where K is the number of regions.
+            Element [i, j] is the number of transitions from region i to
+            region j.  If perTrial is True, an *N x K x K* array is returned,
+            where N is the number of trials.
+        """
+        nTrials = len(data) if isinstance(data, (list, tuple, np.ndarray)) else 1
+        visits = self.getVisits(data, unit, period, eye)
+        return getTransitionMatrix(visits, len(self.regions), nTrials if perTrial else None)
+
+    def __repr__(self):
+        msg = '<{}.{}, '.format(self.__class__.__module__,
+                                self.__class__.__name__)
+
+        msg += '{} regions>'.format(len(self.regions))
+
+        return msg
+
+
+visitColumns = ('trial', 'region', 'start', 'end')
+
+
+def getTransitionMatrix(visits, nRegions, nTrials=None):
+    """
+    Count transitions between consecutive visits in the same trial.
+
+    :param visits:
+        A dict of visits returned by :func:`RegionSet.getVisits`.  Visits
+        with region -1 are ignored.
+    :param int nRegions:
+        Number of regions.
+    :param int nTrials:
+        If None, transitions of all trials are summed and a
+        *nRegions x nRegions* array is returned.  Otherwise, an
+        *nTrials x nRegions x nRegions* array is returned.
+        Default value is None.
+    """
+    inside = np.asarray(visits['region']) >= 0
+    trial = np.asarray(visits['trial'], dtype=int)[inside]
+    region = np.asarray(visits['region'], dtype=int)[inside]
+    pair = trial[1:] == trial[:-1]
+    src = region[:-1][pair]
+    dst = region[1:][pair]
+    if nTrials is None:
+        return np.bincount(src*nRegions + dst, minlength=nRegions**2).reshape(nRegions, nRegions)
+    index = (trial[1:][pair]*nRegions + src)*nRegions + dst
+    return np.bincount(index, minlength=nTrials*nRegions**2).reshape(nTrials, nRegions, nRegions)
+
+
+def getTransitionEntropy(matrix):
+    """
+    Calculate gaze transition entropy (bits), i.e. entropy of the next
+    region given the current region, weighted by the proportion of
+    transitions from each region.
+
+    :param matrix:
+        A *K x K* transition matrix, or an *N x K x K* array of matrices.
+    :return:
+        Entropy.  If an array of matrices is given, an array of entropy
+        of each matrix is returned.  numpy.nan is returned for matrices
+        without transitions.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    rowSum = matrix.sum(axis=-1, keepdims=True)
+    total = rowSum.sum(axis=-2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = matrix / rowSum
+        plogp = np.where(matrix > 0, p*np.log2(p), 0.0)
+        return -(rowSum[..., 0] * plogp.sum(axis=-1)).sum(axis=-1) / total[..., 0]
+
+
+def _getGazePosition(data, eye=None):
+    # N x 2 gaze position.  If eye is 'B', left and right eye are averaged.
+    if eye is None:
+        eye = data.recordedEye
+    gaze = data.getSampleMatrix(eye=eye)
+    if gaze.shape[1] == 4:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            gaze = np.nanmean(gaze.reshape(-1, 2, 2), axis=1)
+    return gaze
+
+
+def _getRuns(labels):
+    # Start indices and labels of runs of the same label.
+    labels = np.asarray(labels)
+    if len(labels) == 0:
+        return np.zeros(0, dtype=int), labels
+    starts = np.flatnonzero(np.hstack((True, labels[1:] != labels[:-1])))
+    return starts, labels[starts]
+
+
+def _getLabelStatistics(labels, onset, duration, nRegions, start, regionLabels):
+    inside = labels >= 0
+    count = np.bincount(labels[inside], minlength=nRegions)
+    dwellTime = np.bincount(labels[inside], weights=duration[inside], minlength=nRegions)
+
+    # labels are in temporal order, so that the first index is the first entry.
+    firstEntry = np.full(nRegions, np.nan)
+    visited, firstIndex = np.unique(labels[inside], return_index=True)
+    firstEntry[visited] = onset[inside][firstIndex] - start
+
+    starts, runLabels = _getRuns(labels)
+    entries = np.bincount(runLabels[runLabels >= 0], minlength=nRegions)
+    revisits = np.maximum(entries - 1, 0)
+
+    return {'label': list(regionLabels), 'count': count, 'dwellTime': dwellTime,
+            'firstEntry': firstEntry, 'entries': entries, 'revisits': revisits}
@@ -29,7 +29,12 @@ REFERENCE:
  ScanMatch: a novel method for comparing fixation sequences.
  Behav Res Methods, 42(3), 692-700.
 """
+import os
+import weakref
+import functools
+import concurrent.futures
 import numpy as np
+from GazeParser.Core import GazeData
 
 
 class ScanMatch(object):
@@ -76,74 +81,121 @@ class ScanMatch(object):
             else:
                 raise ValueError('Unknown parameter: %s.' % k)
 
-        self.intv = np.vectorize(int)
+        self._trialSequences = {}
+        self._customMask = None
+        self._mask = None
 
         self.createSubMatrix()
         self.gridMask()
 
     def createSubMatrix(self, Threshold=None):
+        """
+        Create substitution matrix from distances between bins.
+
+        :param float Threshold:
+            If given, Threshold is updated before the matrix is created.
+        """
         if Threshold is not None:
             self.Threshold = Threshold
-        mat = np.zeros((self.Xbin*self.Ybin, self.Xbin*self.Ybin))
-        indI = 0
-        indJ = 0
-        for i in range(self.Ybin):
-            for j in range(self.Xbin):
-                for ii in range(self.Ybin):
-                    for jj in range(self.Xbin):
-                        mat[indI, indJ] = np.sqrt((j-jj)**2 + (i-ii)**2)
-                        indI += 1
-                indI = 0
-                indJ += 1
+        mat = _binDistance(self.Xbin, self.Ybin)
         max_sub = np.max(mat)
         self.SubMatrix = np.abs(mat-max_sub) - (max_sub - self.Threshold)
 
     def gridMask(self):
-        a = np.reshape(np.arange(self.Xbin*self.Ybin), (self.Ybin, self.Xbin))
-        m = float(self.Xbin) / self.Xres
-        n = float(self.Ybin) / self.Yres
-        xi = np.int32(np.arange(0, self.Xbin, m))
-        yi = np.int32(np.arange(0, self.Ybin, n))
+        """
+        Divide the screen into Xbin x Ybin bins.  Fixations are mapped to
+        bins by lookup tables of columns and rows, so that the full
+        resolution mask is created only when :attr:`mask` is accessed.
+        A mask set by :func:`maskFromArray` is discarded.
+        """
+        self._xBins, self._yBins = _binLookup(self.Xres, self.Yres, self.Xbin, self.Ybin)
+        self._customMask = None
+        self._mask = None
+        self._trialSequences.clear()
+
+    @property
+    def mask(self):
+        """
+        Yres x Xres array of bin indices.
+        """
+        if self._customMask is not None:
+            return self._customMask
+        if self._mask is None:
+            self._mask = (self._yBins[:, np.newaxis] + self._xBins).astype(float)
+        return self._mask
 
-        self.mask = np.zeros((self.Yres, self.Xres))
-        for y in range(self.Yres):
-            self.mask[y, :] = a[yi[y], xi]
+    @mask.setter
+    def mask(self, array):
+        self.maskFromArray(array)
 
     def fixationToSequence(self, data):
+        """
+        Convert fixations to a sequence of symbols (indices of bins).
+
+        :param data:
+            An array of fixations.  The first and second columns are
+            horizontal and vertical positions.  If TempBin is not 0, the
+            third column must be duration of fixations and each fixation is
+            repeated round(duration/TempBin) times.
+        """
         d = data.copy()
         d[:, :2] -= self.Offset
         d[d < 0] = 0
         d[d[:, 0] >= self.Xres, 0] = self.Xres-1
         d[d[:, 1] >= self.Yres, 1] = self.Yres-1
-        d = self.intv(d)
+        x = d[:, 0].astype(int)
+        y = d[:, 1].astype(int)
 
-        seq_num = self.mask[d[:, 1], d[:, 0]]
+        if self._customMask is None:
+            seq_num = (self._yBins[y] + self._xBins[x]).astype(float)
+        else:
+            seq_num = self._customMask[y, x]
 
         if self.TempBin != 0:
-            fix_time = np.round(d[:, 2] / float(self.TempBin))
-            tmp = []
-            for f in range(d.shape[0]):
-                tmp.extend([seq_num[f] for x in range(int(fix_time[f]))])
-            seq_num = np.array(tmp)
+            fix_time = np.round(d[:, 2].astype(int) / float(self.TempBin))
+            seq_num = np.repeat(seq_num, fix_time.astype(int))
 
         return seq_num
 
     def match(self, A, B):
+        """
+        Compare two sequences by Needleman-Wunsch algorithm.
+
+        :param A: first sequence (indices of bins).
+        :param B: second sequence (indices of bins).
+        :return:
+            A tuple of three elements: normalized score, alignment of the
+            sequences and the score matrix.
+        """
         n = len(A)
         m = len(B)
+        S = self.SubMatrix[np.asarray(A, dtype=int)[:, np.newaxis], np.asarray(B, dtype=int)]
 
         F = np.zeros((n+1, m+1))
-        for i in range(n+1):
-            F[i, 0] = self.GapValue*(i+1)
-        for j in range(m+1):
-            F[0, j] = self.GapValue*(j+1)
-
-        for i in range(1, n+1):
-            for j in range(1, m+1):
-                match = F[i-1, j-1] + self.SubMatrix[A[i-1], B[j-1]]
-                delete = F[i-1, j] + self.GapValue
-                insert = F[i, j-1] + self.GapValue
-                F[i, j] = max([match, insert, delete])
+        F[:, 0] = self.GapValue*np.arange(1, n+2)
+        F[0, :] = self.GapValue*np.arange(1, m+2)
+
+        if self.GapValue == 0:
+            # Without gap penalty, F[i, j] = max(F[i-1, j-1]+S, F[i-1, j],
+            # F[i, j-1]), so that a row is calculated from the previous row
+            # and then the insert term is resolved by a cumulative maximum.
+            for i in range(1, n+1):
+                row = np.maximum(F[i-1, :-1] + S[i-1], F[i-1, 1:])
+                F[i, 1:] = np.maximum.accumulate(np.hstack((F[i, 0], row)))[1:]
+        else:
+            # F[i, j] depends on F[i-1, j-1], F[i-1, j] and F[i, j-1], so that
+            # all cells on an anti-diagonal (i+j=d) are filled at once.
+            Fflat = F.reshape(-1)
+            Sflat = S.reshape(-1)
+            for d in range(2, n+m+1):
+                i = np.arange(max(1, d-m), min(n, d-1)+1)
+                index = i*(m+1) + (d-i)
+                match = Fflat[index-m-2] + Sflat[(i-1)*m + (d-i-1)]
+                delete = Fflat[index-m-1] + self.GapValue
+                insert = Fflat[index-1] + self.GapValue
+                Fflat[index] = np.maximum(np.maximum(match, insert), delete)
+        # In both cases, cells are calculated in the same way as the
+        # cell-by-cell loop, so that the score matrix is exactly the same.
 
         AlignmentA = np.zeros(n+m)-1
         AlignmentB = np.zeros(n+m)-1
@@ -157,7 +209,7 @@ class ScanMatch(object):
             # scoreUp = F[i, j-1]
             scoreLeft = F[i-1, j]
 
-            if score == scoreDiag + self.SubMatrix[A[i-1], B[j-1]]:
+            if score == scoreDiag + S[i-1, j-1]:
                 AlignmentA[step] = A[i-1]
                 AlignmentB[step] = B[j-1]
                 i -= 1
@@ -192,24 +244,241 @@ class ScanMatch(object):
 
         return matchScore, align, F
 
+    def trialToSequence(self, gazeData):
+        """
+        Convert fixations in a trial to a sequence of symbols by
+        :func:`fixationToSequence`.  Sequences are cached for each trial
+        while the GazeData object exists, and the cache is cleared when
+        mask is changed.
+
+        :param gazeData: an instance of :class:`~GazeParser.Core.GazeData`
+        """
+        key = id(gazeData)
+        params = (self.TempBin, tuple(self.Offset))
+        cached = self._trialSequences.get(key)
+        if cached is not None and cached[0]() is gazeData and cached[1] == params:
+            return cached[2]
+
+        fixations = np.hstack((gazeData.getFixCenter(), gazeData.getFixDur()))
+        sequence = self.fixationToSequence(fixations)
+        # the entry is removed when the GazeData object is deleted.
+        ref = weakref.ref(gazeData, lambda r, key=key, cache=self._trialSequences: cache.pop(key, None))
+        self._trialSequences[key] = (ref, params, sequence)
+        return sequence
+
+    def matchAll(self, sequences, workers=None, scoreOnly=True):
+        """
+        Compare all pairs of sequences.  Because scores are symmetric,
+        each pair is compared only once.  Pairs are compared in parallel by
+        a process pool.
+
+        :param sequences:
+            A list of sequences.  :class:`~GazeParser.Core.GazeData`
+            objects are converted by :func:`trialToSequence`.
+        :param int workers:
+            Number of processes.  If None, number of CPUs is used.  If 1,
+            pairs are compared in the current process.  Default value is None.
+        :param bool scoreOnly:
+            If True, only scores are calculated without keeping the score
+            matrix and traceback, which is faster and uses less memory.
+            Default value is True.
+        :return:
+            If scoreOnly is True, a condensed matrix of scores, i.e. an
+            one-dimensional array of scores of pairs (0, 1), (0, 2), ...,
+            (0, n-1), (1, 2), ..., (n-2, n-1) as
+            scipy.spatial.distance.pdist.  Use scipy.spatial.distance.squareform
+            to get a square matrix.  1-score can be used as a distance.
+            If scoreOnly is False, a tuple of the condensed matrix and a
+            list of alignments in the same order is returned.
+        """
+        sequences = [np.asarray(self.trialToSequence(s) if isinstance(s, GazeData) else s, dtype=int)
+                     for s in sequences]
+        I, J = np.triu_indices(len(sequences), 1)
+        args = (self.SubMatrix, self.GapValue, sequences, scoreOnly)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers == 1 or len(I) == 0:
+            results = [_matchPairs(args, I, J)]
+        else:
+            # Several chunks per process to balance load.
+            chunks = np.array_split(np.arange(len(I)), min(len(I), 4*workers))
+            with concurrent.futures.ProcessPoolExecutor(workers, initializer=_initMatchAll,
+                                                        initargs=(args,)) as executor:
+                results = list(executor.map(_matchAllChunk, [I[c] for c in chunks], [J[c] for c in chunks]))
+
+        scores = np.hstack([r[0] for r in results])
+        if scoreOnly:
+            return scores
+        aligns = []
+        for r in results:
+            aligns.extend(r[1])
+        return scores, aligns
+
     def maskFromArray(self, array):
-        self.mask = array
+        """
+        Use a custom mask instead of grid.
+
+        :param array: Yres x Xres array of bin indices.
+        """
+        self._customMask = array
+        self._trialSequences.clear()
 
     def subMatrixFromArray(self, array):
-        self.SubMarix = array
+        """
+        Use a custom substitution matrix.
+
+        :param array: a square array of (number of bins) x (number of bins).
+        """
+        self.SubMatrix = array
+
+
+@functools.lru_cache(maxsize=64)
+def _binDistance(Xbin, Ybin):
+    # Distances between centers of bins.  Bins are numbered from left to
+    # right and then from top to bottom.
+    # Arrays are cached for parameter sweeps and must not be modified.
+    y, x = np.divmod(np.arange(Xbin*Ybin), Xbin)
+    mat = np.sqrt((x[:, np.newaxis]-x)**2 + (y[:, np.newaxis]-y)**2)
+    mat.flags.writeable = False
+    return mat
+
+
+@functools.lru_cache(maxsize=64)
+def _binLookup(Xres, Yres, Xbin, Ybin):
+    # Bin index of each column (xBins) and first bin index of each row
+    # (yBins).  Index of the bin at (x, y) is yBins[y]+xBins[x].  Values are
+    # the same as np.int32(np.arange(0, Xbin, float(Xbin)/Xres)) used in the
+    # previous implementation.
+    xBins = np.int32(np.arange(Xres) * (float(Xbin) / Xres)).astype(int)
+    yBins = np.int32(np.arange(Yres) * (float(Ybin) / Yres)).astype(int) * Xbin
+    xBins.flags.writeable = False
+    yBins.flags.writeable = False
+    return xBins, yBins
+
+
+def _matchScore(SubMatrix, GapValue, A, B):
+    """
+    Calculate score of ScanMatch.match without keeping the score matrix.
+    Only two rows (or diagonals) along the shorter sequence are kept.
+    Cells are calculated in the same way as ScanMatch.match, so that the
+    score is exactly the same.
+    """
+    n = len(A)
+    m = len(B)
+    scale = np.max(SubMatrix) * max((m, n))
+    if n < m:
+        # F of (B, A) is the transpose of F of (A, B) if SubMatrix is also
+        # transposed.
+        A, B, n, m = B, A, m, n
+        SubMatrix = SubMatrix.T
+
+    g = GapValue
+    if g == 0:
+        # Scores of all symbols against B (number of bins x m).
+        SB = SubMatrix[:, B]
+        prev = np.zeros(m+1)
+        cur = np.zeros(m+1)
+        maxF = np.zeros(m+1)
+        for i in range(n):
+            np.add(prev[:-1], SB[A[i]], out=cur[1:])
+            np.maximum(cur[1:], prev[1:], out=cur[1:])
+            np.maximum.accumulate(cur, out=cur)
+            np.maximum(maxF, cur, out=maxF)
+            prev, cur = cur, prev
+        return maxF.max() / scale
+
+    # Cells on anti-diagonals i+j=d-2, d-1 and d.  Index is j.
+    D2 = np.full(m+1, np.nan)
+    D1 = np.full(m+1, np.nan)
+    maxF = -np.inf
+    for d in range(n+m+1):
+        D = np.full(m+1, np.nan)
+        if d <= n:
+            D[0] = g*(d+1)
+        if d <= m:
+            D[d] = g*(d+1)
+        j = np.arange(max(1, d-n), min(m, d-1)+1)
+        if len(j) > 0:
+            match = D2[j-1] + SubMatrix[A[d-j-1], B[j-1]]
+            delete = D1[j] + g
+            insert = D1[j-1] + g
+            D[j] = np.maximum(np.maximum(match, insert), delete)
+        maxF = max(maxF, np.nanmax(D))
+        D2, D1 = D1, D
+    return maxF / scale
+
+
+def _matchPairs(args, I, J):
+    SubMatrix, GapValue, sequences, scoreOnly = args
+    if scoreOnly:
+        return np.array([_matchScore(SubMatrix, GapValue, sequences[i], sequences[j])
+                         for i, j in zip(I, J)]), None
+
+    matcher = ScanMatch.__new__(ScanMatch)
+    matcher.SubMatrix = SubMatrix
+    matcher.GapValue = GapValue
+    scores = np.zeros(len(I))
+    aligns = []
+    for k, (i, j) in enumerate(zip(I, J)):
+        scores[k], align, F = matcher.match(sequences[i], sequences[j])
+        aligns.append(align)
+    return scores, aligns
+
+
+_matchAllArgs = None
+
+
+def _initMatchAll(args):
+    # Sequences and parameters are sent to each worker process only once.
+    global _matchAllArgs
+    _matchAllArgs = args
+
+
+def _matchAllChunk(I, J):
+    return _matchPairs(_matchAllArgs, I, J)
 
 
 def generateMaskFromArray(data, threshold, margeColor):
-    dataArray = data.copy()
-    uniqueData = np.unique(dataArray)
-    for i in range(len(uniqueData)):
-        index = np.where(dataArray == uniqueData[i])
-        if len(index[0]) <= threshold:
-            dataArray[index] = margeColor
-
-    uniqueData2 = np.unique(dataArray)
-    for i in range(len(uniqueData2)):
-        index = np.where(dataArray == uniqueData2[i])
-        dataArray[index] = i
-
-    return dataArray, uniqueData2
+    """
+    Generate a mask for :func:`ScanMatch.maskFromArray` from an image.
+    Colors used by only a few pixels are merged to margeColor, and then
+    colors are numbered in ascending order.
+
+    :param data:
+        Height x width array of colors, or height x width x channels array
+        of an RGB(A) image.  In the latter case, channels are packed into
+        an integer, e.g. 0xRRGGBB for RGB images and 0xRRGGBBAA for RGBA
+        images.
+    :param int threshold:
+        Colors used by threshold pixels or less are merged.
+    :param int margeColor:
+        Color (packed as data) to which rare colors are merged.
+    :return:
+        A tuple of the mask and the list of colors.  Values of the mask
+        are indices of the list.
+    """
+    dataArray = np.asarray(data)
+    if dataArray.ndim == 3:
+        dataArray = _packColors(dataArray)
+
+    uniqueData, inverse, counts = np.unique(dataArray, return_inverse=True, return_counts=True)
+    rare = counts <= threshold
+    if np.any(rare):
+        uniqueData = uniqueData.copy()
+        uniqueData[rare] = margeColor
+        uniqueData, index = np.unique(uniqueData, return_inverse=True)
+        inverse = index[inverse]
+
+    return inverse.reshape(dataArray.shape), uniqueData
+
+
+def _packColors(data):
+    # Pack channels of height x width x channels array into integers.
+    if data.shape[2] > 4:
+        raise ValueError('Image must have 4 or less channels.')
+    packed = np.zeros(data.shape[:2], dtype=np.uint32)
+    for c in range(data.shape[2]):
+        packed <<= 8
+        packed |= data[:, :, c].astype(packed.dtype) & 0xFF
+    return packed
@@ -4,19 +4,30 @@
 .. Distributed under the terms of the GNU General Public License (GPL).
 """
 import os
+import io
 import sys
+import time
+import json
+import struct
+import fnmatch
+import contextlib
+import importlib.util
 import numpy as np
 import warnings
 import pickle
 import zlib
 import shutil
+import copy
+import threading
+import collections
+import concurrent.futures
 import platform
 import GazeParser
 import GazeParser.Core
-from packaging import version
+import GazeParser.Container
 
 
-def save(filename, data, additionalData=None):
+def save(filename, data, additionalData=None, storage=None, compressionLevel=6, threads=1):
     """
     Save GazeParser objects to a file.
     
@@ -27,15 +38,43 @@ def save(filename, data, additionalData=None):
         List of GazeParser.GazeData objects.
     :param additionalData:
         Additional data (if necessary).
+    :param str storage:
+        Storage mode of sample arrays in the file ('float64', 'float32' or
+        'fixed').  See :func:`GazeParser.Core.GazeData.setStorageMode`.
+        Storage mode of data in memory is not changed.  If None, data are
+        saved in their current storage mode.  Default value is None.
+    :param int compressionLevel:
+        Compression level of zlib (0-9).  Lower level is faster but makes
+        a larger file.  Default value is 6.
+    :param int threads:
+        Number of threads used to compress data.  If None, number of CPUs
+        is used.  Default value is 1.
     """
+    if storage is not None:
+        for d in data:
+            d._loadDeferredSamples()
+        states = [_getSampleState(d) for d in data]
+        for d in data:
+            d.setStorageMode(storage)
 
-    with open(filename, 'wb') as fp:
-        data_dict = {'GazeData':data, 'AdditionalData':additionalData}
-        s = pickle.dumps(data_dict, protocol=2)
-        fp.write(zlib.compress(s))
+    try:
+        GazeParser.Container.write(filename, data, additionalData, compressionLevel, threads)
+        _invalidateLoadCache(filename)
+    finally:
+        if storage is not None:
+            for d, state in zip(data, states):
+                d.__dict__.update(state)
 
 
-def load(filename, checkVersion=True):
+def _getSampleState(gazeData):
+    """
+    Get attributes which are modified by GazeData.setStorageMode.
+    """
+    return dict([(name, getattr(gazeData, name)) for name in
+                 ('_T', '_L', '_R', '_Pupil', '_storageMode', '_storageScale', '_decodedSamples')])
+
+
+def load(filename, checkVersion=True, lazy=False, trials=None, threads=1, images=True):
     """
     Load GazeParser data from a file.  A return value is a tuple of two elements.
     The first element is a list of GazeParser.GazeData objects.  The second
@@ -48,10 +87,61 @@ def load(filename, checkVersion=True):
         If True, version of data file is checked.  If the file is generated 
         in an old version of GazeParser, warning message is shown. To suppress
         warning, set False to this option.  Default value is True.
+    :param bool lazy:
+        If True, sample arrays (T, L, R, Pupil, camera-specific data and
+        USBIO data) of each trial are loaded when they are accessed for the
+        first time.  Events and other attributes are loaded immediately.
+        Data files made by old versions of GazeParser are always loaded
+        immediately.  Default value is False.
+    :param trials:
+        List of indices of trials to be loaded.  Only requested trials are
+        read from the file.  Additional data is always loaded.  If None, all
+        trials are loaded.  Default value is None.
+    :param int threads:
+        Number of threads used to decompress trials.  If None, number of
+        CPUs is used.  Data files made by old versions of GazeParser are
+        always loaded by a single thread.  Default value is 1.
+    :param bool images:
+        If False, embedded images (EMBEDDED_IMAGES) are not included in
+        additional data.  Use :func:`loadEmbeddedImages` to load them
+        later.  Default value is True.
+
+    If the load cache is enabled by :func:`enableLoadCache`, data loaded
+    without lazy option are cached and copies of them are returned while
+    the file is not modified.
+    """
+    D, A = _loadCached(filename, lazy, trials, threads, images)
+    _checkDataVersion(D, checkVersion)
+    return (D, A)
+
+
+def _loadCached(filename, lazy=False, trials=None, threads=1, images=True, quiet=False):
+    """
+    Load data through the load cache without version check.  If quiet is
+    True, the message about old data files is not printed.
     """
     if not os.path.isfile(filename):
         raise ValueError('%s is not exist.' % filename)
 
+    cache = _loadCache
+    if cache is None or lazy:
+        return _load(filename, lazy, trials, threads, images, quiet)
+
+    key = _getCacheKey(filename, trials, images)
+    data = cache.get(key)
+    if data is None:
+        data = _load(filename, lazy, trials, threads, images, quiet)
+        cache.put(key, data)
+    return data
+
+
+def _load(filename, lazy, trials, threads, images, quiet=False):
+    """
+    Load data without version check and cache.
+    """
+    if GazeParser.Container.isContainer(filename):
+        return GazeParser.Container.read(filename, lazy=lazy, trials=trials, threads=threads, images=images)
+
     fp = open(filename, 'rb')
     try:
         s = zlib.decompress(fp.read())
@@ -65,7 +155,8 @@ def load(filename, checkVersion=True):
     except:
         fp.close()
         # old data file
-        print('Warning: This data file is made by old GazeParser. It is recommended to re-save data in the new file format.')
+        if not quiet:
+            print('Warning: This data file is made by old GazeParser. It is recommended to re-save data in the new file format.')
         warnings.warn('loading old-format data file', DeprecationWarning)
         try:
             import bsddb3
@@ -80,43 +171,730 @@ def load(filename, checkVersion=True):
         else:
             A = None
         db.close()
-    
+
+    if trials is not None:
+        D = [D[trial] for trial in GazeParser.Container._checkTrials(trials, len(D))]
+    if not images and isinstance(A, dict) and 'EMBEDDED_IMAGES' in A:
+        A = dict(A)
+        del A['EMBEDDED_IMAGES']
+    return (D, A)
+
+
+class LoadCache(object):
+    """
+    LRU cache of data loaded by :func:`load`.  Usually, this class is not
+    used directly.  Use :func:`enableLoadCache` instead.
+    """
+    def __init__(self, maxBytes):
+        """
+        :param int maxBytes:
+            Maximum total size of cached data (in bytes).
+        """
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return a copy of cached data.  None is returned if data is not
+        cached.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            data = self._entries[key][0]
+        return copy.deepcopy(data)
+
+    def put(self, key, data):
+        """
+        Cache a copy of data.  Least recently used data are discarded if
+        total size exceeds maxBytes.
+        """
+        size = _estimateSize(data)
+        if size > self.maxBytes:
+            return
+        data = copy.deepcopy(data)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (data, size)
+            self.bytes += size
+            self._evict()
+
+    def resize(self, maxBytes):
+        """
+        Change maximum total size of cached data.
+        """
+        with self._lock:
+            self.maxBytes = maxBytes
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.maxBytes:
+            self.bytes -= self._entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def invalidate(self, filename):
+        """
+        Discard cached data of a file.
+        """
+        filename = os.path.abspath(filename)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == filename]:
+                self.bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """
+        Discard all cached data.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def getStats(self):
+        """
+        Return statistics of the cache as a dict object.
+        """
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'bytes': self.bytes,
+                    'maxBytes': self.maxBytes}
+
+
+_loadCache = None
+
+
+def _getCacheKey(filename, trials, images):
+    filename = os.path.abspath(filename)
+    st = os.stat(filename)
+    if trials is not None:
+        trials = tuple([int(trial) for trial in trials])
+    return (filename, st.st_mtime_ns, st.st_size, trials, images)
+
+
+def _estimateSize(data):
+    """
+    Estimate memory size of data.  Out-of-band buffers (i.e. NumPy arrays)
+    are not copied during estimation.
+    """
+    sizes = []
+    s = pickle.dumps(data, protocol=5, buffer_callback=lambda b: sizes.append(b.raw().nbytes))
+    return len(s) + sum(sizes)
+
+
+def enableLoadCache(maxBytes=1024**3):
+    """
+    Enable process-wide cache of data loaded by :func:`load`.
+    Cached data are identified by absolute path, modification time and
+    size of the file.  Data loaded with lazy=True are not cached.
+    Cached data of a file are discarded when the file is written by
+    :func:`save`, :func:`join`, :func:`appendAdditionalData`,
+    :func:`embedStimImages` or :func:`removeEmbeddedImages`.
+
+    :param int maxBytes:
+        Maximum total size of cached data (in bytes).  Least recently used
+        data are discarded when the total size exceeds this value.
+        If the cache is already enabled, its size is changed.
+        Default value is 1024**3 (1GB).
+    """
+    global _loadCache
+    if _loadCache is None:
+        _loadCache = LoadCache(maxBytes)
+    else:
+        _loadCache.resize(maxBytes)
+
+
+def disableLoadCache():
+    """
+    Disable the cache enabled by :func:`enableLoadCache` and discard all
+    cached data.
+    """
+    global _loadCache
+    _loadCache = None
+
+
+def clearLoadCache():
+    """
+    Discard all data cached by :func:`load`.
+    """
+    if _loadCache is not None:
+        _loadCache.clear()
+
+
+def getLoadCacheStats():
+    """
+    Get statistics of the load cache.  Return value is a dict object which
+    has hits, misses, evictions, entries, bytes and maxBytes.  None is
+    returned if the cache is not enabled.
+    """
+    if _loadCache is None:
+        return None
+    return _loadCache.getStats()
+
+
+def _invalidateLoadCache(filename):
+    if _loadCache is not None:
+        _loadCache.invalidate(filename)
+
+
+def _loadWithoutCheck(filename, kwargs):
+    # This function must be defined at module level to be called in
+    # worker processes.  The message about old data files is printed by
+    # iterLoadMany only once.
+    return _loadCached(filename, quiet=True, **kwargs)
+
+
+def _countOldFiles(files):
+    """
+    Count data files made by old GazeParser (Berkeley DB files).
+    """
+    n = 0
+    for filename in files:
+        try:
+            if getFileFormat(filename)[0] == 'bsddb':
+                n += 1
+        except Exception:
+            # errors are reported when the file is loaded.
+            pass
+    return n
+
+
+def iterLoadMany(files, workers=None, mode='thread', **kwargs):
+    """
+    Load GazeParser data files in parallel.  Results are yielded as soon as
+    each file is loaded, so that the order of results may be different from
+    the order of files.  Each result is a tuple of index of the file in
+    files, filename, loaded data (a tuple of GazeData list and additional
+    data) and error.  If loading fails, loaded data is None and error is
+    the exception raised while loading.  Otherwise, error is None.
+    Version of data is not checked.  If some files are made by old
+    GazeParser, a warning message is printed once.
+
+    :param sequence files:
+        A list of file names.
+    :param int workers:
+        Number of threads or processes.  If None, number of CPUs is used.
+        Default value is None.
+    :param str mode:
+        'thread' or 'process'.  In 'thread' mode, files are loaded by a
+        thread pool.  In 'process' mode, files are loaded by a process pool,
+        which is faster when unpickling dominates loading time but loaded
+        data must be transferred from worker processes.  lazy=True is not
+        available in 'process' mode.  Default value is 'thread'.
+    :param kwargs:
+        Other parameters are passed to :func:`load`.
+    """
+    if mode == 'thread':
+        executorClass = concurrent.futures.ThreadPoolExecutor
+    elif mode == 'process':
+        if kwargs.get('lazy', False):
+            raise ValueError('lazy=True is not available in \'process\' mode.')
+        executorClass = concurrent.futures.ProcessPoolExecutor
+    else:
+        raise ValueError('mode must be \'thread\' or \'process\'.')
+
+    files = list(files)
+    nOldFiles = _countOldFiles(files)
+    if nOldFiles > 0:
+        print('Warning: %d data file(s) are made by old GazeParser. It is recommended to re-save data in the new file format.' % nOldFiles)
+
+    with executorClass(workers) as executor:
+        futures = {}
+        for index, filename in enumerate(files):
+            futures[executor.submit(_loadWithoutCheck, filename, kwargs)] = (index, filename)
+        for future in concurrent.futures.as_completed(futures):
+            index, filename = futures[future]
+            try:
+                yield index, filename, future.result(), None
+            except Exception as e:
+                yield index, filename, None, e
+
+
+def loadMany(files, workers=None, mode='thread', checkVersion=True, **kwargs):
+    """
+    Load GazeParser data files in parallel.  Return value is a tuple of
+    two elements.  The first element is a list of loaded data in the same
+    order as files.  Each of loaded data is a tuple of GazeData list and
+    additional data (see :func:`load`), or None if loading failed.  The
+    second element is a list of tuples of filename and exception for files
+    which could not be loaded.  Loading continues even if some files fail.
+
+    :param sequence files:
+        A list of file names.
+    :param int workers:
+        Number of threads or processes.  If None, number of CPUs is used.
+        Default value is None.
+    :param str mode:
+        'thread' or 'process'.  See :func:`iterLoadMany`.
+        Default value is 'thread'.
+    :param bool checkVersion:
+        If True, version of data files is checked once for all files and
+        a warning message is shown if some files are generated in an old
+        version of GazeParser.  Default value is True.
+    :param kwargs:
+        Other parameters are passed to :func:`load`.
+    """
+    files = list(files)
+    results = [None] * len(files)
+    errors = []
+    for index, filename, data, error in iterLoadMany(files, workers, mode, **kwargs):
+        if error is None:
+            results[index] = data
+        else:
+            errors.append((index, filename, error))
+
+    errors.sort(key=lambda e: e[0])
+    for index, filename, error in errors:
+        print('Warning: could not load %s (%s)' % (filename, error))
+
+    if checkVersion:
+        _checkBatchVersion(files, results)
+
+    return results, [(filename, error) for index, filename, error in errors]
+
+
+def _checkBatchVersion(files, results):
+    """
+    Check version of loaded data files and print a single message.
+    """
+    oldFiles = []
+    lackingattributes = set()
+    checkedVersions = set()
+    for filename, data in zip(files, results):
+        if data is None or len(data[0]) == 0:
+            continue
+        dataVersion = data[0][0].__version__
+        if _isOldVersion(dataVersion):
+            oldFiles.append(filename)
+            if dataVersion not in checkedVersions:
+                checkedVersions.add(dataVersion)
+                lackingattributes.update(checkAttributes(data[0][0]))
+    if len(oldFiles) > 0 and len(lackingattributes) > 0:
+        print('Version of %d data file(s) is older than GazeParser version. Some features may not work. (lacking attributes:%s)' % (len(oldFiles), ','.join(sorted(lackingattributes))))
+
+
+def _isOldVersion(dataVersion):
+    """
+    Return True if dataVersion is older than GazeParser version.
+    """
+    # packaging is imported here to reduce import time of this module.
+    from packaging import version
+    return version.parse(dataVersion) < version.parse(GazeParser.__version__)
+
+
+def _checkDataVersion(D, checkVersion):
     # if libraryVersion > dataVersion:
     #if compareVersion(D[0].__version__, GazeParser.__version__) < 0 and checkVersion:
-    if checkVersion and version.parse(D[0].__version__) < version.parse(GazeParser.__version__):
+    if checkVersion and len(D) > 0 and _isOldVersion(D[0].__version__):
         lackingattributes = checkAttributes(D[0])
         if len(lackingattributes) > 0:
             print('Version of the data file is older than GazeParser version. Some features may not work. (lacking attributes:%s)' % ','.join(lackingattributes))
-    return (D, A)
 
 
-def join(newFileName, fileList):
+def getFileInfo(filename):
+    """
+    Get summary of a GazeParser data file.  Only the header of the file is
+    read unless the file is made by old versions of GazeParser.
+
+    :param str filename:
+        Filename.
+    :return:
+        A dict object.  See :func:`GazeParser.Container.readSummary` for
+        detail.  'filename' and 'format' ('chunked' or 'legacy') are also
+        included.
+    """
+    if not os.path.isfile(filename):
+        raise ValueError('%s is not exist.' % filename)
+
+    if GazeParser.Container.isContainer(filename):
+        info = GazeParser.Container.readSummary(filename)
+        info['format'] = 'chunked'
+    else:
+        D, A = load(filename, checkVersion=False)
+        info = GazeParser.Container.summarize(D, A)
+        info['format'] = 'legacy'
+        if len(D) > 0:
+            info['version'] = D[0].__version__
+    info['filename'] = filename
+    return info
+
+
+def join(newFileName, fileList, threads=1):
     """
     Combine GazeParser data files into a single file.
-    If some files have addional data and the others don't have, missing
-    additional data is filled with empty lists.
+    If additional data are lists (one element for each trial), they are
+    concatenated.  If some files have addional data and the others don't
+    have, missing additional data is filled with empty lists (one for each
+    trial).  If additional data are dict objects, they are merged into a
+    dict object.  Values of the same key must be the same in all files
+    except EMBEDDED_IMAGES, of which images are merged by their names.
+    ValueError is raised if additional data can not be combined.
+
+    Trials in data files are copied to the new file without decompression,
+    so that only one trial is held in memory at once.  Data files made by
+    old versions of GazeParser are loaded one by one.
 
     :param str newFileName:
         Name of combined data file.
     :param sequence fileList:
         A list of file names to be combined.
+    :param int threads:
+        Number of threads used to compress data loaded from files made by
+        old versions of GazeParser.  If None, number of CPUs is used.
+        Default value is 1.
     """
-    newD = []
-    newA = []
-    found = False
     for f in fileList:
-        print(f + '...')
-        (D, A) = load(f)
-        newD.extend(D)
-        if A is not None:
-            found = True
-            newA.extend(A)
+        if not os.path.isfile(f):
+            raise ValueError('%s is not exist.' % f)
+
+    writer = GazeParser.Container.Writer(newFileName, threads=threads)
+    try:
+        newA = []
+        dictA = None
+        found = False
+        for f in fileList:
+            print(f + '...')
+            if GazeParser.Container.isContainer(f):
+                A = GazeParser.Container.readAdditionalData(f)
+                nTrials = writer.copyTrials(f)
+            else:
+                (D, A) = load(f)
+                writer.appendTrials(D)
+                nTrials = len(D)
+            if isinstance(A, dict):
+                if found:
+                    raise ValueError('Additional data in %s is a dict object but those in the other files are lists.' % f)
+                if dictA is None:
+                    dictA = {}
+                _mergeAdditionalData(dictA, A, f)
+            elif A is not None:
+                if dictA is not None:
+                    raise ValueError('Additional data in %s is not a dict object but those in the other files are.' % f)
+                found = True
+                newA.extend(A)
+            else:
+                newA.extend([[] for i in range(nTrials)])
+    except:
+        writer.abort()
+        raise
+
+    if dictA is not None:
+        writer.close(additionalData=dictA)
+    elif not found:
+        writer.close()
+    else:
+        writer.close(additionalData=newA)
+    _invalidateLoadCache(newFileName)
+
+
+def _isSameValue(a, b):
+    """
+    Return True if a and b are the same value.  Values which can not be
+    compared (e.g. lists of numpy arrays) are treated as different.
+    """
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        return False
+
+
+def _mergeAdditionalData(dictA, A, filename):
+    """
+    Merge additional data (a dict object) of a file to dictA for join.
+    """
+    for key, value in A.items():
+        if key == 'EMBEDDED_IMAGES' and key in dictA:
+            images = dictA[key]
+            for name, image in zip(value['NAMES'], value['IMAGES']):
+                if name not in images['NAMES']:
+                    images['NAMES'].append(name)
+                    images['IMAGES'].append(image)
+                elif not _isSameValue(images['IMAGES'][images['NAMES'].index(name)], image):
+                    raise ValueError('Embedded image %s in %s is different from that in the other files.' % (name, filename))
+        elif key == 'EMBEDDED_IMAGES':
+            dictA[key] = {'NAMES': list(value['NAMES']), 'IMAGES': list(value['IMAGES'])}
+        elif key not in dictA:
+            dictA[key] = value
+        elif not _isSameValue(dictA[key], value):
+            raise ValueError('Additional data %s in %s is different from that in the other files.' % (key, filename))
+
+# Magic numbers of Berkeley DB hash and btree files (both byte orders).
+# Data files of GazeParser 0.6 or earlier are Berkeley DB files.
+_bsddbMagic = (b'\x61\x15\x06\x00', b'\x00\x06\x15\x61', b'\x62\x31\x05\x00', b'\x00\x05\x31\x62')
+
+# Size of the header read by getFileFormat.
+_peekSize = 65536
+
+
+def getFileFormat(filename):
+    """
+    Detect format and version of a GazeParser data file.  Only the
+    beginning of the file (and the index of a chunked data file) is read.
+
+    :param str filename:
+        Filename.
+    :return:
+        A tuple of format and version.  Format is 'chunked', 'legacy'
+        (zlib-compressed pickle), 'bsddb' (Berkeley DB file made by old
+        GazeParser) or 'unknown'.  Version is the oldest GazeParser version
+        of trials in the file, or None if it can not be detected from the
+        header.
+    """
+    if GazeParser.Container.isContainer(filename):
+        summary = GazeParser.Container.readSummary(filename)
+        versions = [t['version'] for t in summary['trials'] if t is not None and t['version'] is not None]
+        if len(versions) == 0:
+            return 'chunked', summary['version']
+        from packaging import version
+        return 'chunked', min(versions, key=version.parse)
+
+    with open(filename, 'rb') as fp:
+        header = fp.read(_peekSize)
+    if len(header) >= 16 and header[12:16] in _bsddbMagic:
+        return 'bsddb', None
+    try:
+        s = zlib.decompressobj().decompress(header, _peekSize)
+    except zlib.error:
+        return 'unknown', None
+    if not s.startswith(b'\x80'):
+        return 'unknown', None
+    return 'legacy', _peekPickledVersion(s)
+
+
+def _peekPickledVersion(s):
+    """
+    Find __version__ of the first GazeData object in the beginning of a
+    pickle stream.  None is returned if it is not found.
+    """
+    i = s.find(b'__version__')
+    if i < 0:
+        return None
+    i += len(b'__version__')
+    # skip memo opcodes between key and value
+    while i < len(s):
+        if s[i:i+1] == b'q':  # BINPUT
+            i += 2
+        elif s[i:i+1] == b'r':  # LONG_BINPUT
+            i += 5
+        elif s[i:i+1] == b'\x94':  # MEMOIZE
+            i += 1
         else:
-            newA.extend([]*len(D))
-    if not found:
-        save(newFileName, newD)
+            break
+    op = s[i:i+1]
+    if op in (b'X', b'T') and i + 5 <= len(s):  # BINUNICODE, BINSTRING
+        n = struct.unpack('<I', s[i+1:i+5])[0]
+        value = s[i+5:i+5+n]
+    elif op in (b'\x8c', b'U') and i + 2 <= len(s):  # SHORT_BINUNICODE, SHORT_BINSTRING
+        n = s[i+1]
+        value = s[i+2:i+2+n]
+    else:
+        return None
+    if len(value) != n:
+        return None
+    return value.decode('latin-1')
+
+
+def _isMigrated(fileFormat, dataVersion):
+    return fileFormat == 'chunked' and dataVersion is not None and not _isOldVersion(dataVersion)
+
+
+def migrateFile(filename, newFilename=None, dryRun=False, compressionLevel=6):
+    """
+    Convert a data file made by old versions of GazeParser to the current
+    file format.  GazeData objects are rebuilt by :func:`rebuildData`.
+    The new file is written to a temporary file which replaces the target
+    file when completed, so that the target file is never left half-written.
+
+    Return value is a dict object which has following keys.
+
+    ============ ===========================================================
+    key          value
+    ============ ===========================================================
+    filename     Filename.
+    newFilename  Name of the new file.
+    format       Format of the file (see :func:`getFileFormat`).
+    version      GazeParser version of the file (None if unknown).
+    status       'migrated', 'copied' (the file is already in the current
+                 format and copied to newFilename), 'skipped' (the file or
+                 newFilename is already in the current format) or 'failed'.
+    dryRun       True if dryRun is True.  In this case, status is what
+                 would be done.
+    trials       Number of trials (None if the file is not loaded).
+    messages     List of messages printed while converting.
+    error        Error message if status is 'failed'.  Otherwise None.
+    time         Elapsed time in seconds.
+    ============ ===========================================================
+
+    :param str filename:
+        Name of the data file.
+    :param str newFilename:
+        Name of the new file.  If None, the data file is replaced.
+        Default value is None.
+    :param bool dryRun:
+        If True, files are not written.  Default value is False.
+    :param int compressionLevel:
+        Compression level of zlib (0-9).  Default value is 6.
+    """
+    t0 = time.perf_counter()
+    if newFilename is None:
+        newFilename = filename
+    report = {'filename': filename, 'newFilename': newFilename, 'format': None, 'version': None,
+              'status': None, 'dryRun': dryRun, 'trials': None, 'messages': [], 'error': None}
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out), warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            report['status'] = _migrateFile(filename, newFilename, dryRun, compressionLevel, report)
+    except Exception as e:
+        report['status'] = 'failed'
+        report['error'] = '%s: %s' % (type(e).__name__, e)
+    # the same warning is usually printed for each trial.
+    for line in out.getvalue().splitlines():
+        if line.strip() != '' and line not in report['messages']:
+            report['messages'].append(line)
+    report['time'] = time.perf_counter() - t0
+    return report
+
+
+def _migrateFile(filename, newFilename, dryRun, compressionLevel, report):
+    report['format'], report['version'] = getFileFormat(filename)
+    sameFile = os.path.abspath(filename) == os.path.abspath(newFilename)
+    if sameFile:
+        if _isMigrated(report['format'], report['version']):
+            return 'skipped'
+    elif os.path.isfile(newFilename) and os.path.getmtime(newFilename) >= os.path.getmtime(filename) and \
+            _isMigrated(*getFileFormat(newFilename)):
+        # processed before interruption
+        return 'skipped'
+    if report['format'] == 'unknown':
+        raise ValueError('%s is not a GazeParser data file.' % filename)
+    if report['format'] == 'bsddb' and importlib.util.find_spec('bsddb3') is None:
+        raise RuntimeError('bsddb3 is necessary to read old GazePaser data file in Python3.')
+
+    if dryRun:
+        return 'copied' if _isMigrated(report['format'], report['version']) else 'migrated'
+
+    targetDir = os.path.dirname(os.path.abspath(newFilename))
+    if not os.path.isdir(targetDir):
+        os.makedirs(targetDir, exist_ok=True)
+    if _isMigrated(report['format'], report['version']):
+        shutil.copy2(filename, newFilename + '.tmp')
+        os.replace(newFilename + '.tmp', newFilename)
+        _invalidateLoadCache(newFilename)
+        return 'copied'
+
+    D, A = _load(filename, lazy=False, trials=None, threads=1, images=True)
+    if report['version'] is None and len(D) > 0:
+        report['version'] = D[0].__version__
+    D = rebuildData(D)
+    report['trials'] = len(D)
+    GazeParser.Container.write(newFilename, D, A, compressionLevel)
+    _invalidateLoadCache(newFilename)
+    return 'migrated'
+
+
+def findDataFiles(directory, pattern='*.db'):
+    """
+    Find data files in a directory tree.  Return value is a sorted list of
+    file names.
+
+    :param str directory:
+        Top of the directory tree.
+    :param str pattern:
+        Pattern of file names.  Default value is '*.db'.
+    """
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(fnmatch.filter(names, pattern)):
+            files.append(os.path.join(root, name))
+    return files
+
+
+def iterMigrateTree(directory, outputDir=None, pattern='*.db', workers=None, dryRun=False, compressionLevel=6):
+    """
+    Convert data files in a directory tree to the current file format in
+    parallel.  Reports of files (see :func:`migrateFile`) are yielded as
+    soon as each file is processed.
+
+    Files which are already in the current format are skipped, so that
+    migration can be resumed by running it again after an interruption.
+
+    :param str directory:
+        Top of the directory tree.
+    :param str outputDir:
+        If None, data files are replaced.  Otherwise, new files are written
+        to outputDir with the same directory structure.  Files which are
+        already in the current format are copied.  Default value is None.
+    :param str pattern:
+        Pattern of file names.  Default value is '*.db'.
+    :param int workers:
+        Number of processes.  If None, number of CPUs is used.  If 1, files
+        are converted in the current process.  Default value is None.
+    :param bool dryRun:
+        If True, files are not written.  Default value is False.
+    :param int compressionLevel:
+        Compression level of zlib (0-9).  Default value is 6.
+    """
+    files = findDataFiles(directory, pattern)
+    if outputDir is None:
+        newFiles = files
     else:
-        save(newFileName, newD, additionalData=newA)
+        newFiles = [os.path.join(outputDir, os.path.relpath(f, directory)) for f in files]
+
+    if workers == 1:
+        for filename, newFilename in zip(files, newFiles):
+            yield migrateFile(filename, newFilename, dryRun, compressionLevel)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(migrateFile, filename, newFilename, dryRun, compressionLevel)
+                   for filename, newFilename in zip(files, newFiles)]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def migrateTree(directory, outputDir=None, pattern='*.db', workers=None, dryRun=False, compressionLevel=6, reportFile=None):
+    """
+    Convert data files in a directory tree to the current file format in
+    parallel.  See :func:`iterMigrateTree` for detail.  Return value is a
+    list of reports (see :func:`migrateFile`) sorted by filename.
+
+    :param str reportFile:
+        If not None, reports are appended to this file in JSON Lines format
+        as soon as each file is processed.  Default value is None.
+
+    Other parameters are the same as :func:`iterMigrateTree`.
+    """
+    reports = []
+    fp = None if reportFile is None else open(reportFile, 'a')
+    try:
+        for report in iterMigrateTree(directory, outputDir, pattern, workers, dryRun, compressionLevel):
+            reports.append(report)
+            if fp is not None:
+                fp.write(json.dumps(report) + '\n')
+                fp.flush()
+    finally:
+        if fp is not None:
+            fp.close()
+    reports.sort(key=lambda r: r['filename'])
+    return reports
 
 
 def createConfigDir(overwrite=False):
@@ -274,6 +1052,7 @@ def rebuildData(gazeData):
             gazeData.recordedEye,
             config,
             recordingDate)
+        _copyRecordingData(gazeData, newdata)
         return newdata
 
     elif hasattr(gazeData, '__iter__'):
@@ -303,6 +1082,7 @@ def rebuildData(gazeData):
                 data.recordedEye,
                 config,
                 recordingDate)
+            _copyRecordingData(data, newdata)
             newdatalist.append(newdata)
         return newdatalist
 
@@ -311,7 +1091,27 @@ def rebuildData(gazeData):
 
     return None
 
-def appendAdditionalData(filename, data, newFilename=None, key=None, replace=False, asDict=True):
+def _copyRecordingData(gazeData, newdata):
+    """
+    Copy data which are not passed to the constructor of GazeData
+    (calibration results, camera specific data, USBIO data and storage
+    mode) from gazeData to newdata rebuilt by rebuildData.
+    """
+    calPointData = getattr(gazeData, '_CalPointData', None)
+    if calPointData is not None:
+        newdata.setCalPointData(calPointData)
+    cameraSpecificData = getattr(gazeData, '_CameraSpecificData', None)
+    if cameraSpecificData is not None:
+        newdata.setCameraSpecificData(gazeData.CameraSpecificData)
+    if getattr(gazeData, '_USBIOData', None) is not None or getattr(gazeData, '_USBIOChannels', None) is not None:
+        newdata.setUSBIOData(getattr(gazeData, '_USBIOChannels', None), gazeData.USBIOData)
+    if gazeData.storageMode != 'float64':
+        # stored arrays are shared as they are, so that values are not
+        # changed by encoding them again.
+        newdata.__dict__.update(_getSampleState(gazeData))
+
+
+def appendAdditionalData(filename, data, newFilename=None, key=None, replace=False, asDict=True, threads=1):
     """
     Append additional data to GazeParser data file.
     By default, the additional data is supposed as a Dictionary object 
@@ -335,10 +1135,16 @@ def appendAdditionalData(filename, data, newFilename=None, key=None, replace=Fal
     :param bool asDict:
         If True, the additional data is supposed as a Dictionary object 
         and the data is appended to it.  Default value is True.
+    :param int threads:
+        Number of threads used to load and save data.  This parameter
+        is used only if the file is made by old versions of GazeParser;
+        otherwise gaze data are not rewritten.  If None, number of CPUs
+        is used.  Default value is 1.
     :return:
         True if scceed.
     """
-    D, A = load(filename)
+    # embedded images are kept as they are.
+    D, A = _loadAdditionalData(filename, threads, images=False)
     if (A is not None) and (not replace):
         raise ValueError('{} already has additional data. Set replace=True to replace it with new data'.format(filename))
     
@@ -353,14 +1159,11 @@ def appendAdditionalData(filename, data, newFilename=None, key=None, replace=Fal
     else:
         A = data
     
-    if newFilename is None:
-        save(filename, D, A)
-    else:
-        save(newFilename, D, A)
+    _saveAdditionalData(filename, newFilename, D, A, threads, keepImages=asDict)
     
     return True
 
-def embedStimImages(filename, imageDict, newFilename=None, replace=False):
+def embedStimImages(filename, imageDict, newFilename=None, replace=False, threads=1):
     """
     Embed stimulus images to GazeParser data file.
     
@@ -379,14 +1182,24 @@ def embedStimImages(filename, imageDict, newFilename=None, replace=False):
     :param bool replace:
         If True, Existing embedded images will be replaced.
         Default value is False.
+    :param int threads:
+        Number of threads used to load and save data.  This parameter
+        is used only if the file is made by old versions of GazeParser;
+        otherwise gaze data are not rewritten.  If None, number of CPUs
+        is used.  Default value is 1.
     :return:
         True if scceed.
     """
-    D, A = load(filename)
+    # old images are not read because they are replaced.
+    D, A = _loadAdditionalData(filename, threads, images=False)
     if (A is not None) and (not isinstance(A, dict)) and (not replace):
         raise ValueError('Additonal data in {} is not a dict object. replace=True to replace it with new data'.format(filename))
 
-    if isinstance(A, dict) and 'EMBEDDED_IMAGES' in A and (not replace):
+    if D is None:
+        hasImages = GazeParser.Container.readSummary(filename).get('embeddedImages') is not None
+    else:
+        hasImages = isinstance(A, dict) and 'EMBEDDED_IMAGES' in A
+    if hasImages and (not replace):
         raise ValueError('{} already has embedded images. replace=True to replace it with new data'.format(filename))
 
     if not isinstance(imageDict, dict):
@@ -405,14 +1218,11 @@ def embedStimImages(filename, imageDict, newFilename=None, replace=False):
     
     A['EMBEDDED_IMAGES'] = imageDict
 
-    if newFilename is None:
-        save(filename, D, A)
-    else:
-        save(newFilename, D, A)
+    _saveAdditionalData(filename, newFilename, D, A, threads)
     
     return True
 
-def removeEmbeddedImages(filename, newFilename=None):
+def removeEmbeddedImages(filename, newFilename=None, threads=1):
     """
     Remove embedded stimulus images from GazeParser data file.
     
@@ -422,21 +1232,93 @@ def removeEmbeddedImages(filename, newFilename=None):
         Specify the name of output file.  If this parameter is None,
         the source data file will be overwritten.
         Default value is None.
+    :param int threads:
+        Number of threads used to load and save data.  This parameter
+        is used only if the file is made by old versions of GazeParser;
+        otherwise gaze data are not rewritten.  If None, number of CPUs
+        is used.  Default value is 1.
     :return:
         Removed image data.
     """
-    D, A = load(filename)
+    D, A = _loadAdditionalData(filename, threads)
     try:
         images = A.pop('EMBEDDED_IMAGES')
     except:
         raise KeyError('Stimulus images are not embedded in {}'.format(filename))
     
+    _saveAdditionalData(filename, newFilename, D, A, threads)
+
+    return images
+
+def loadEmbeddedImages(filename):
+    """
+    Load embedded stimulus images from GazeParser data file.
+    Gaze data are not read unless the file is made by old versions of
+    GazeParser.
+
+    :param str filename:
+        Name of GazeParser data file.
+    :return:
+        Embedded images (a dictionary object that has 'NAMES' and 'IMAGES').
+        None if no image is embedded.
+    """
+    if not os.path.isfile(filename):
+        raise ValueError('%s is not exist.' % filename)
+
+    if GazeParser.Container.isContainer(filename):
+        return GazeParser.Container.readImages(filename)
+
+    D, A = load(filename, checkVersion=False)
+    if isinstance(A, dict):
+        return A.get('EMBEDDED_IMAGES')
+    return None
+
+
+def _loadAdditionalData(filename, threads, images=True):
+    """
+    Load additional data for appendAdditionalData, embedStimImages and
+    removeEmbeddedImages.  Gaze data are loaded only if the file is made by
+    old versions of GazeParser, otherwise None is returned instead of them.
+    If images is False, embedded images are not read from a chunked data
+    file.  Files made by old versions are always read with images.
+    """
+    if not os.path.isfile(filename):
+        raise ValueError('%s is not exist.' % filename)
+
+    if GazeParser.Container.isContainer(filename):
+        return None, GazeParser.Container.readAdditionalData(filename, images=images)
+    return load(filename, threads=threads)
+
+
+def _saveAdditionalData(filename, newFilename, D, A, threads, keepImages=False):
+    """
+    Save additional data loaded by _loadAdditionalData.  If the file is a
+    chunked data file (i.e. D is None), only additional data and embedded
+    images are rewritten.  If keepImages is True, embedded images of the
+    chunked data file are not rewritten.
+    """
     if newFilename is None:
-        save(filename, D, A)
+        newFilename = filename
+
+    if D is not None:
+        save(newFilename, D, A, threads=threads)
+        return
+
+    if os.path.abspath(newFilename) != os.path.abspath(filename):
+        # copy to a temporary file so that newFilename is not left
+        # incomplete if updating fails.
+        tmpFilename = newFilename + '.tmp'
+        try:
+            shutil.copyfile(filename, tmpFilename)
+            GazeParser.Container.updateAdditionalData(tmpFilename, A, keepImages=keepImages)
+            os.replace(tmpFilename, newFilename)
+        finally:
+            if os.path.exists(tmpFilename):
+                os.remove(tmpFilename)
     else:
-        save(newFilename, D, A)
+        GazeParser.Container.updateAdditionalData(filename, A, keepImages=keepImages)
+    _invalidateLoadCache(newFilename)
 
-    return images
 
 def openLocation(path):
     """
@@ -6,9 +6,7 @@
 
 import os
 import sys
-from importlib.metadata import version
-
-__version__ = version(__package__)
+import importlib
 
 appDir = os.path.abspath(os.path.dirname(__file__))
 if sys.platform == 'win32': #Windows
@@ -19,15 +17,49 @@ else: #MacOS X and Linux
     homeDir = os.environ['HOME']
     configDir = os.path.join(homeDir,'.GazeParser')
 
-from GazeParser.Core import *
-from GazeParser.Utility import save, load
-import GazeParser.Configuration
+# Submodules, GazeParser.Core objects, save/load, __version__ and config
+# are imported or created when they are accessed for the first time
+# (PEP 562), so that "import GazeParser" does not import NumPy.
+_submodules = ('Configuration', 'Container', 'Converter', 'Core', 'Graphics',
+               'MicroSaccade', 'Region', 'ScanMatch', 'TrackingTools',
+               'TrajectoryCurvature', 'Utility', 'app')
+
+_coreNames = ('float_tolerance', 'storageModes', 'SaccadeData', 'FixationData',
+              'MessageData', 'BlinkData', 'CalPointData', 'GazeData',
+              'extractEpochs')
+
+_utilityNames = ('save', 'load')
+
+__all__ = list(_coreNames) + list(_utilityNames) + ['config']
+
+
+def _createConfig():
+    #create config directory if not exist.
+    if not os.path.exists(configDir):
+        from GazeParser.Utility import createConfigDir
+        createConfigDir()
+
+    from GazeParser.Configuration import Config
+    return Config()
 
-#create config directory if not exist.
-if not os.path.exists(GazeParser.configDir):
-    from GazeParser.Utility import createConfigDir
-    createConfigDir()
 
-config = GazeParser.Configuration.Config()
+def __getattr__(name):
+    if name == '__version__':
+        from importlib.metadata import version
+        value = version(__name__)
+    elif name == 'config':
+        value = _createConfig()
+    elif name in _coreNames:
+        value = getattr(importlib.import_module('GazeParser.Core'), name)
+    elif name in _utilityNames:
+        value = getattr(importlib.import_module('GazeParser.Utility'), name)
+    elif name in _submodules:
+        return importlib.import_module('GazeParser.' + name)
+    else:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_submodules) | {'__version__'})
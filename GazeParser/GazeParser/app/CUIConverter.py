@@ -15,6 +15,7 @@ if __name__ == "__main__":
     arg_parser.add_argument('--config', '-c', type=str, help='camera parameters file')
     arg_parser.add_argument('--overwrite', action='store_true', help='force overwrite ')
     arg_parser.add_argument('--usefileparam', action='store_true', help='[for SimpleGazeTracker CSV] use parameters embedded in the data file')
+    arg_parser.add_argument('--storage', type=str, choices=GazeParser.Core.storageModes, help='storage mode of gaze data (default: float64)')
     arg_parser.add_argument('--unitcnv', type=str, help='[for PsychoPy-Tobbi-Controller TSV] unit conversion (only \'height2pix\' is supported and )')
     args = arg_parser.parse_args()
 
@@ -53,7 +54,7 @@ if __name__ == "__main__":
             data_type = (args.type).lower()
         print('{}: '.format(input_file), end='')
         if data_type == 'sgt':
-            ret = Converter.TrackerToGazeParser(inputfile=input_file, config=config, overwrite=args.overwrite, useFileParameters= args.usefileparam, outputfile=args.output)
+            ret = Converter.TrackerToGazeParser(inputfile=input_file, config=config, overwrite=args.overwrite, useFileParameters= args.usefileparam, outputfile=args.output, storage=args.storage)
         elif data_type == 'ptc':
-            ret = Converter.PTCToGazeParser(inputfile=input_file, config=config, overwrite=args.overwrite, unitcnv=args.unitcnv, outputfile=args.output)
+            ret = Converter.PTCToGazeParser(inputfile=input_file, config=config, overwrite=args.overwrite, unitcnv=args.unitcnv, outputfile=args.output, storage=args.storage)
         print(ret)
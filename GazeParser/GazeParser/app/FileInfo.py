@@ -0,0 +1,83 @@
+import GazeParser
+import GazeParser.Utility
+import argparse
+import concurrent.futures
+import glob
+import sys
+
+
+def getInfo(filename):
+    try:
+        return GazeParser.Utility.getFileInfo(filename), None
+    except Exception as e:
+        return None, e
+
+
+def formatInfo(info, verbose=False):
+    trials = [t for t in info['trials'] if t is not None]
+    lines = ['{} ({} format, GazeParser {})'.format(info['filename'], info['format'], info['version'])]
+    rates = [t['samplingRate'] for t in trials if t['samplingRate'] is not None]
+    lines.append('  trials: {}, samples: {}, saccades: {}, fixations: {}, blinks: {}, messages: {}'.format(
+        len(info['trials']),
+        sum([t['samples'] for t in trials]),
+        sum([t['saccades'] for t in trials]),
+        sum([t['fixations'] for t in trials]),
+        sum([t['blinks'] for t in trials]),
+        sum([t['messages'] for t in trials])))
+    lines.append('  recorded eye: {}, sampling rate: {}'.format(
+        ','.join(sorted(set([str(t['recordedEye']) for t in trials]))),
+        '{:.1f} Hz'.format(sum(rates)/len(rates)) if len(rates) > 0 else 'unknown'))
+    dates = [t['recordingDate'] for t in trials if t['recordingDate'] is not None]
+    if len(dates) > 0:
+        lines.append('  recording date: {}'.format(dates[0]))
+    if info['additionalDataKeys'] is not None:
+        lines.append('  additional data: {}'.format(', '.join(info['additionalDataKeys'])))
+    elif info['additionalDataType'] != 'NoneType':
+        lines.append('  additional data: {}'.format(info['additionalDataType']))
+    if info['embeddedImages'] is not None:
+        lines.append('  embedded images: {}'.format(', '.join(info['embeddedImages'])))
+    if verbose:
+        for i, t in enumerate(info['trials']):
+            if t is None:
+                lines.append('  trial {}: no summary'.format(i))
+                continue
+            lines.append('  trial {}: {} samples, {} saccades, {} fixations, {} blinks, {} messages'.format(
+                i, t['samples'], t['saccades'], t['fixations'], t['blinks'], t['messages']))
+        configs = []
+        for t in trials:
+            if t['config'] is not None and t['config'] not in configs:
+                configs.append(t['config'])
+        for config in configs:
+            lines.append('  config:')
+            for key in GazeParser.Configuration.GazeParserOptions:
+                if key in config:
+                    lines.append('    {} = {}'.format(key, config[key]))
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Print summary of GazeParser data files')
+    arg_parser.add_argument('input', type=str, nargs='+', help='GazeParser data files (accepts wildcard)')
+    arg_parser.add_argument('--workers', '-w', type=int, default=None, help='number of files read in parallel (default: number of CPUs)')
+    arg_parser.add_argument('--verbose', '-v', action='store_true', help='print summary of each trial and configuration')
+    args = arg_parser.parse_args()
+
+    error = False
+    input_files = []
+    for pattern in args.input:
+        files = sorted(glob.glob(pattern))
+        if len(files) == 0:
+            print('ERROR: {} is not found.'.format(pattern))
+            error = True
+        input_files.extend(files)
+
+    with concurrent.futures.ThreadPoolExecutor(args.workers) as executor:
+        for input_file, (info, e) in zip(input_files, executor.map(getInfo, input_files)):
+            if info is None:
+                print('ERROR: {}: {}'.format(input_file, e))
+                error = True
+            else:
+                print(formatInfo(info, args.verbose))
+
+    if error:
+        sys.exit(1)
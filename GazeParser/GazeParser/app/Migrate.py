@@ -0,0 +1,59 @@
+import GazeParser
+import GazeParser.Utility
+import argparse
+import collections
+import json
+import os
+import sys
+
+
+def formatReport(report, verbose=False):
+    if report['version'] is None:
+        fileFormat = report['format']
+    else:
+        fileFormat = '{} {}'.format(report['format'], report['version'])
+    line = '{:8s} {} ({}, {:.1f} s)'.format(report['status'], report['filename'], fileFormat, report['time'])
+    if report['error'] is not None:
+        line += '\n  ERROR: {}'.format(report['error'])
+    if verbose:
+        for message in report['messages']:
+            line += '\n  {}'.format(message)
+    return line
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Convert GazeParser data files in a directory tree to the current file format. '
+                                                     'Files already in the current format are skipped, so that an interrupted migration '
+                                                     'is resumed by running this script again.')
+    arg_parser.add_argument('directory', type=str, help='top of the directory tree')
+    arg_parser.add_argument('--output', '-o', type=str, default=None, help='output directory (default: replace files)')
+    arg_parser.add_argument('--pattern', '-p', type=str, default='*.db', help='pattern of data file names (default: *.db)')
+    arg_parser.add_argument('--workers', '-w', type=int, default=None, help='number of processes (default: number of CPUs)')
+    arg_parser.add_argument('--level', type=int, default=6, help='compression level (default: 6)')
+    arg_parser.add_argument('--dry-run', '-n', action='store_true', help='report what would be done without writing files')
+    arg_parser.add_argument('--report', '-r', type=str, default=None, help='append reports to this file in JSON Lines format')
+    arg_parser.add_argument('--verbose', '-v', action='store_true', help='print messages from conversion')
+    args = arg_parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print('ERROR: {} is not a directory.'.format(args.directory))
+        sys.exit(1)
+
+    if args.dry_run:
+        print('Dry run: no file is written.')
+    # reports are printed as soon as each file is processed.
+    counts = collections.Counter()
+    fp = None if args.report is None else open(args.report, 'a')
+    for report in GazeParser.Utility.iterMigrateTree(args.directory, args.output, args.pattern, args.workers,
+                                                     args.dry_run, args.level):
+        print(formatReport(report, args.verbose), flush=True)
+        if fp is not None:
+            fp.write(json.dumps(report) + '\n')
+            fp.flush()
+        counts[report['status']] += 1
+    if fp is not None:
+        fp.close()
+    print(', '.join(['{}: {}'.format(status, counts[status]) for status in ('migrated', 'copied', 'skipped', 'failed')]))
+
+    if counts['failed'] > 0:
+        sys.exit(1)
@@ -0,0 +1,60 @@
+import GazeParser
+import GazeParser.ScanMatch
+import GazeParser.Utility
+import argparse
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+
+def generateMasks(filename, outputDir, threshold, margeColor):
+    img = Image.open(filename)
+    data = np.asarray(img.convert('RGB'))
+    mask, colorList = GazeParser.ScanMatch.generateMaskFromArray(data, threshold, margeColor)
+
+    name = os.path.splitext(os.path.basename(filename))[0]
+    np.savetxt(os.path.join(outputDir, name+'_mask.txt'), mask, fmt='%d')
+    np.savetxt(os.path.join(outputDir, name+'_colorlist.txt'), colorList, fmt='%06x', delimiter=',')
+    return len(colorList)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Create ScanMatch mask matrices and color lists from all images in a directory. '
+                                                     'For each image, NAME_mask.txt and NAME_colorlist.txt are written in the same '
+                                                     'format as ScanMatchMatricesFromImage.py.')
+    arg_parser.add_argument('directory', type=str, help='directory of images')
+    arg_parser.add_argument('--output', '-o', type=str, default=None, help='output directory (default: same as images)')
+    arg_parser.add_argument('--pattern', '-p', type=str, default='*.png', help='pattern of image file names (default: *.png)')
+    arg_parser.add_argument('--threshold', '-t', type=int, default=0,
+                            help='colors used by this number of pixels or less are merged (default: 0)')
+    arg_parser.add_argument('--marge-color', '-m', type=str, default='000000',
+                            help='color to which rare colors are merged in hexadecimal RRGGBB (default: 000000)')
+    args = arg_parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print('ERROR: {} is not a directory.'.format(args.directory))
+        sys.exit(1)
+    if args.output is not None and not os.path.isdir(args.output):
+        os.makedirs(args.output)
+
+    margeColor = int(args.marge_color, 16)
+    nFailed = 0
+    for filename in GazeParser.Utility.findDataFiles(args.directory, args.pattern):
+        if args.output is None:
+            outputDir = os.path.dirname(filename)
+        else:
+            outputDir = os.path.join(args.output, os.path.dirname(os.path.relpath(filename, args.directory)))
+            if not os.path.isdir(outputDir):
+                os.makedirs(outputDir)
+        try:
+            nColors = generateMasks(filename, outputDir, args.threshold, margeColor)
+        except Exception as e:
+            print('failed   {}\n  ERROR: {}'.format(filename, e), flush=True)
+            nFailed += 1
+        else:
+            print('done     {} ({} colors)'.format(filename, nColors), flush=True)
+
+    if nFailed > 0:
+        sys.exit(1)
@@ -73,7 +73,7 @@ class ScanMatchMatricesFromImage(Tkinter.Frame):
         d = np.uint32(np.asarray(pilImg))
         if len(d.shape)==3:
             d = (d[:,:,0]<<16) + (d[:,:,1]<<8) + d[:,:,2]
-        uniqueData = np.unique(d)
+        uniqueData, counts = np.unique(d, return_counts=True)
         
         if len(uniqueData)>128:
             res = tkMessageBox.askquestion('Warning','More than 128 colors are used in this image.\nBuilding color list may take very long time.\nAre you sure to continure processing?')
@@ -81,8 +81,7 @@ class ScanMatchMatricesFromImage(Tkinter.Frame):
                 return
         
         self.dataArray = d
-        self.regionlist = [(uniqueData[i],len(np.where(d==uniqueData[i])[0]))
-                           for i in range(len(uniqueData))]
+        self.regionlist = list(zip(uniqueData, counts))
         
         self.listbox.delete(0,self.listbox.size())
         for i in range(len(self.regionlist)):
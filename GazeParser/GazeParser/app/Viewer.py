@@ -2449,6 +2449,8 @@ class mainFrame(wx.Frame):
         self.datafiletype = 'GazeParser Datafile (*.db)|*.db'
         self.D = None
         self.C = None
+        self.embeddedImages = None
+        self.embeddedImagesLoaded = False
         self.tr = 0
         self.plotAreaXY = [0, 1024, 0, 768]
         self.plotAreaTXY = [0, 3000, 0, 1024]
@@ -2804,7 +2806,10 @@ class mainFrame(wx.Frame):
                 DlgShowinfo(self, 'Conversion error', 'Failed to convert %s to GazeParser .db file' % (self.dataFileName))
                 return
 
-        [self.D, self.C] = GazeParser.load(self.dataFileName)
+        # Embedded images are loaded by getEmbeddedImages() when necessary.
+        [self.D, self.C] = GazeParser.load(self.dataFileName, lazy=True, images=False)
+        self.embeddedImages = None
+        self.embeddedImagesLoaded = False
         if len(self.D) == 0:
             DlgShowerror(self, 'Error', 'File contains no data. (%s)' % (self.dataFileName))
             self.D = None
@@ -2896,6 +2901,12 @@ class mainFrame(wx.Frame):
         self.initialDataDir = self.conf.RecentDir[idx]
         self.openfile()
 
+    def getEmbeddedImages(self):
+        if not self.embeddedImagesLoaded:
+            self.embeddedImages = GazeParser.Utility.loadEmbeddedImages(self.dataFileName)
+            self.embeddedImagesLoaded = True
+        return self.embeddedImages
+
     def loadStimImage(self):
         msg = self.D[self.tr].findMessage('!STIMIMAGE', useRegexp=False)
         sep = ' '
@@ -2910,8 +2921,9 @@ class mainFrame(wx.Frame):
         found_embedded_image = False
         if self.conf.COMMAND_USE_EMBEDDED_IMAGE: # use embedded image
             try:
-                img_names = self.C['EMBEDDED_IMAGES']['NAMES']
-                img_list = self.C['EMBEDDED_IMAGES']['IMAGES']
+                images = self.getEmbeddedImages()
+                img_names = images['NAMES']
+                img_list = images['IMAGES']
                 found_keys = True
             except:
                 found_keys = False
@@ -3020,7 +3032,12 @@ class mainFrame(wx.Frame):
             return
 
         try:
-            GazeParser.save(filename, self.D, self.C)
+            C = self.C
+            images = self.getEmbeddedImages()
+            if images is not None:
+                C = dict(C)
+                C['EMBEDDED_IMAGES'] = images
+            GazeParser.save(filename, self.D, C)
         except:
             DlgShowinfo(self, 'Error', 'Cannot save data as %s' % (filename))
             return
@@ -1,7 +1,11 @@
 # coding:utf-8
 
 import GazeParser
+import GazeParser.Configuration
 import numpy as np
+import pickle
+import pytest
+import warnings
 
 import pathlib
 wd = pathlib.Path(__file__).resolve().parent
@@ -302,4 +306,96 @@ def test_fixation():
     for i in range(D[0].nFix):
           assert (center[i] == D[0].Fix[i].center).all()
 
-    # getFixTraj
\ No newline at end of file
+    # getFixTraj
+
+def test_epochs():
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+
+    timeBase, epochs = D[0].extractEpochs(u'刺激の場所', (100, 300), pupil=True)
+    msgs = D[0].findMessage(u'刺激の場所')
+    assert epochs.shape == (len(msgs), len(timeBase), 3)
+    zero = np.where(timeBase == 0)[0][0]
+    for i in range(len(msgs)):
+        idx = D[0].findIndexFromTime(msgs[i].time)
+        assert np.allclose(epochs[i, zero, :2], D[0].L[idx], equal_nan=True)
+        assert np.allclose(epochs[i, zero, 2], D[0].Pupil[idx], equal_nan=True)
+
+    # samples after the end of recording are NaN.
+    timeBase, epochs = D[0].extractEpochs(u'end trial', (0, 300), resample=True)
+    assert np.isnan(epochs[0, timeBase > D[0].T[-1] - D[0].Msg[-1].time]).all()
+
+    timeBase, epochs, trials = GazeParser.Core.extractEpochs([D[0], D[0]], u'刺激の場所', (100, 300))
+    assert epochs.shape[0] == 2 * len(msgs)
+    assert (trials == [0] * len(msgs) + [1] * len(msgs)).all()
+
+    # duplicated timestamps
+    T = np.array([0.0, 1.0, 1.0, 2.0, 2.0])
+    data = np.array([[0.0], [10.0], [20.0], [30.0], [40.0]])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        out = GazeParser.Core._sampleAtTimes(T, data, np.array([0.5, 1.0, 1.5, 2.0]), 1.0, True)
+    assert np.array_equal(out[:, 0], [5.0, 20.0, 25.0, 30.0])
+
+
+def test_storage_mode(tmp_path):
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    T, L, P = D[0].T.copy(), D[0].L.copy(), np.array(D[0].Pupil)
+    traj = D[0].Fix[3].getTraj().copy()
+
+    D[0].setStorageMode('fixed', decimals=2)
+    assert D[0]._L.dtype == np.int32
+    assert np.array_equal(D[0].T, T)
+    assert np.array_equal(D[0].L, L, equal_nan=True)
+    assert np.array_equal(D[0].Pupil, P, equal_nan=True)
+    assert np.array_equal(D[0].Fix[3].getTraj(), traj)
+    # decoded arrays are cached.
+    assert D[0].L is D[0].L
+    assert not D[0].L.flags.writeable
+
+    GazeParser.save(tmp_path/'fixed.db', D)
+    D2, A2 = GazeParser.load(tmp_path/'fixed.db')
+    assert D2[0].storageMode == 'fixed'
+    assert D2[0] == D[0]
+
+    # arrays which can not be stored at the precision are kept in float64.
+    L2 = L.copy()
+    L2[0, 0] = 1.234
+    D[0].setStorageMode('float64')
+    D[0]._L = L2
+    D[0].setStorageMode('fixed', decimals=2)
+    assert D[0]._L.dtype == np.float64
+    assert np.array_equal(D[0].L, L2, equal_nan=True)
+
+    D[0].setStorageMode('float32')
+    assert D[0]._L.dtype == np.float32
+    assert D[0]._T.dtype == np.float64
+
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    GazeParser.save(tmp_path/'saved_as_fixed.db', D, storage='fixed')
+    assert D[0].storageMode == 'float64'
+    D2, A2 = GazeParser.load(tmp_path/'saved_as_fixed.db')
+    assert D2[0]._L.dtype == np.int32
+    assert np.array_equal(D2[0].L, L, equal_nan=True)
+
+
+def test_frozen_config():
+    config = GazeParser.Configuration.Config()
+    frozen = config.freeze()
+    assert frozen is config.freeze()
+    assert frozen.freeze() is frozen
+    assert hash(frozen) == hash(GazeParser.Configuration.Config().freeze())
+    assert frozen.SCREEN_WIDTH == config.SCREEN_WIDTH
+    with pytest.raises(AttributeError):
+        frozen.SCREEN_WIDTH = 0
+
+    thawed = frozen.thaw()
+    thawed.SCREEN_WIDTH = frozen.SCREEN_WIDTH + 1
+    assert thawed.freeze() is not frozen
+    assert thawed.freeze() != frozen
+    assert pickle.loads(pickle.dumps(frozen)) is frozen
+
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    G = [GazeParser.Core.GazeData(d.T, d.L, d.R, [], [], [], [], d.Pupil, d.recordedEye, d.config)
+         for d in D]
+    assert all([g.config is G[0].config for g in G])
+    assert isinstance(G[0].config, GazeParser.Configuration.FrozenConfig)
@@ -0,0 +1,14 @@
+import subprocess
+import sys
+
+
+def test_lazy_import():
+    code = ('import sys, GazeParser\n'
+            'assert "numpy" not in sys.modules\n'
+            'assert "GazeParser.Core" not in sys.modules\n'
+            'GazeParser.GazeData\n'
+            'assert "GazeParser.Core" in sys.modules\n'
+            'assert "scipy" not in sys.modules\n'
+            'import GazeParser.Converter\n'
+            'assert "scipy" not in sys.modules\n')
+    subprocess.run([sys.executable, '-c', code], check=True)
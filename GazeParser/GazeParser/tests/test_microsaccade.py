@@ -22,3 +22,110 @@ def test_microsacc():
 
     assert (m.ms[:,0] == ms_index).all()
 
+
+
+def test_microsacc_columns():
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    L = D[0].L
+    msobj = MicroSacc(L, 400)
+    m = msobj.ms
+    assert m.shape == (len(ms_index), 7)
+    a = m[:, 0].astype(int)
+    b = m[:, 1].astype(int)
+    v = msobj._vecvel(L)
+    vabs = np.sqrt(v[:, 0]**2 + v[:, 1]**2)
+    assert np.array_equal(m[:, 2], [np.max(vabs[i:j+1]) for i, j in zip(a, b)])
+    assert np.allclose(m[:, 3], np.linalg.norm(L[b] - L[a], axis=1))
+    assert np.array_equal(m[:, 5:7], L[b] - L[a])
+
+    # minSamples
+    m5 = MicroSacc(L, 400, minSamples=5).ms
+    assert np.array_equal(m5, m[m[:, 1] - m[:, 0] + 1 >= 5])
+
+    # no microsaccade
+    rng = np.random.default_rng(0)
+    m = MicroSacc(np.cumsum(rng.normal(0, 1, (1000, 2)), axis=0), 1000).ms
+    assert m.shape == (0, 7)
+
+
+def test_binsacc():
+    from GazeParser.MicroSaccade import _binsacc
+    L = np.array([[10, 15, 100, 4, 0, 4, 0],
+                  [30, 35, 200, 3, 0, 3, 0],
+                  [37, 40, 300, 2, 90, 0, 2],
+                  [60, 65, 100, 1, 0, 1, 0]], dtype=float)
+    R = np.array([[12, 18, 300, 2, 0, 2, 0],
+                  [28, 31, 100, 1, 0, 1, 0],
+                  [39, 42, 100, 2, 90, 0, 2],
+                  [80, 85, 100, 1, 0, 1, 0]], dtype=float)
+    ms = _binsacc(L, R)
+    # the first pair is not merged.
+    assert np.array_equal(ms[0], [10, 18, 200, 3, 0, 3, 0])
+    # the second and third pairs are merged because they are separated
+    # by less than 3 samples.  The last left eye's microsaccade has no pair.
+    assert ms.shape == (2, 7)
+    assert np.array_equal(ms[1, :3], [28, 42, 200])
+    assert np.allclose(ms[1, 3:], [np.hypot(2, 2), 45, 2, 2])
+
+    assert _binsacc(L, R[:0]).shape == (0, 7)
+    assert _binsacc(L[3:], R[3:]).shape == (0, 7)
+
+
+def test_detectMicroSaccades():
+    from GazeParser.MicroSaccade import detectMicroSaccades, tableColumns
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+
+    table = detectMicroSaccades(D, workers=1)
+    assert tuple(table.keys()) == tableColumns
+    for trial in range(len(D)):
+        m = MicroSacc(D[trial].L, 1000.0/np.mean(np.diff(D[trial].T))).ms
+        idx = table['trial'] == trial
+        assert np.array_equal(table['onset'][idx], D[trial].T[m[:, 0].astype(int)])
+        assert np.array_equal(table['offset'][idx], D[trial].T[m[:, 1].astype(int)])
+        assert np.array_equal(table['amplitude'][idx], m[:, 3])
+    assert (table['fixation'] == -1).all()
+
+    table = detectMicroSaccades(D, unit='fixation', workers=1)
+    for trial, fixation, onset, offset in zip(table['trial'], table['fixation'], table['onset'], table['offset']):
+        f = D[trial].Fix[fixation]
+        assert f.startTime <= onset <= offset <= f.endTime
+
+    table = detectMicroSaccades(D, unit='message', message='end trial', period=(1000, 0), workers=2)
+    assert len(table['trial']) > 0
+    for trial, message, onset in zip(table['trial'], table['message'], table['onset']):
+        assert D[trial].Msg[message].time - 1000 <= onset <= D[trial].Msg[message].time
+    serial = detectMicroSaccades(D, unit='message', message='end trial', period=(1000, 0), workers=1)
+    for key in tableColumns:
+        assert np.array_equal(table[key], serial[key])
+
+
+def test_online_microsacc():
+    from GazeParser.MicroSaccade import OnlineMicroSacc
+    rng = np.random.default_rng(0)
+    N = 10000
+    xy = np.cumsum(rng.normal(0, 0.05, (N, 2)), axis=0)
+    steps = np.arange(500, N, 400)
+    for k in steps:
+        xy[k:k+8] += np.linspace(0.5, 4, 8)[:, np.newaxis]
+        xy[k+8:] += 4
+    data = np.column_stack((np.arange(N, dtype=float), xy))
+
+    results = []
+    for chunkSize in (1, 50):
+        detector = OnlineMicroSacc(1000, window=1000, warmup=200)
+        # getEyePositionList returns the latest sample first.
+        events = [detector.update(data[i:i+chunkSize][::-1]) for i in range(0, N, chunkSize)]
+        results.append(np.vstack(events))
+        assert detector._velocities.shape == (1000, 2)
+    # threshold is updated for each chunk.
+    assert (np.abs(results[0][:, :2] - results[1][:, :2]) <= 1).all()
+    assert len(results[0]) == len(steps)
+    assert (np.abs(results[0][:, 0] - steps) <= 2).all()
+    assert np.allclose(results[0][:, 4], 45, atol=5)
+
+    # binocular data and overlapping chunks.
+    detector = OnlineMicroSacc(1000, eye='R')
+    bino = np.column_stack((data[:, 0], xy*0, xy))
+    events = [detector.update(bino[max(0, i-10):i+20]) for i in range(0, N, 20)]
+    assert (np.abs(np.vstack(events)[:, :2] - results[0][:, :2]) <= 1).all()
+    assert len(detector.update(None)) == 0
@@ -1,5 +1,7 @@
 import GazeParser
-from GazeParser.Region import CircleRegion, RectRegion, getFixationsInRegion
+from GazeParser.Region import CircleRegion, RectRegion, ImageRegion, RegionSet, getFixationsInRegion, \
+    getTransitionEntropy
+import numpy as np
 
 import pathlib
 wd = pathlib.Path(__file__).resolve().parent
@@ -59,6 +61,127 @@ def test_region():
     f = getFixationsInRegion(D[0], circle_region, byIndices=True)
     assert in_circle_byIndices == f
 
+def test_regionSet():
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    image = np.zeros((1080, 1920))
+    image[300:700, 200:700] = 1
+    regions = [RectRegion(600, 1000, 420, 600), CircleRegion(x=800, y=500, r=200),
+               ImageRegion(image), CircleRegion(x=1200, y=300, r=150)]
+    regionSet = RegionSet(regions, labels=['rect', 'circle', 'image', 'circle2'])
+    assert len(regionSet) == 4
+
+    # the first region which contains the point is used.
+    labels = regionSet.labelFixations(D[0])
+    for i in range(D[0].nFix):
+        expected = -1
+        for j, region in enumerate(regions):
+            center = D[0].Fix[i].center
+            if isinstance(region, ImageRegion):
+                # ImageRegion.contains requires integer coordinates.
+                center = np.int_(center)
+            if region.contains(center):
+                expected = j
+                break
+        assert labels[i] == expected
+    assert np.array_equal(regionSet.labelPoints([[np.nan, np.nan], [800, 500], [-10, 5000]]), [-1, 0, -1])
+
+    stats = regionSet.getStatistics(D[0], period=(1000, None))
+    times = D[0].getFixTime()
+    use = times[:, 0] >= 1000
+    for j in range(len(regions)):
+        index = np.where(use & (labels == j))[0]
+        assert stats['count'][j] == len(index)
+        assert stats['dwellTime'][j] == np.sum(times[index, 1] - times[index, 0])
+        if len(index) == 0:
+            assert np.isnan(stats['firstEntry'][j])
+            assert stats['entries'][j] == 0
+        else:
+            assert stats['firstEntry'][j] == times[index[0], 0] - 1000
+            visits = [i for i in index if i-1 not in index]
+            assert stats['entries'][j] == len(visits)
+            assert stats['revisits'][j] == len(visits) - 1
+
+    stats = regionSet.getStatistics(D[0], unit='sample')
+    labels = regionSet.labelSamples(D[0])
+    assert np.array_equal(stats['count'], np.bincount(labels[labels >= 0], minlength=4))
+
+
+def test_regionSet_index():
+    rng = np.random.default_rng(0)
+    regions = []
+    for k in range(200):
+        x, y = rng.uniform(0, 1000, 2)
+        if k % 2 == 0:
+            regions.append(RectRegion(x, x+rng.uniform(5, 80), y, y+rng.uniform(5, 30)))
+        else:
+            regions.append(CircleRegion(x, y, rng.uniform(5, 50)))
+    labelMap = rng.integers(0, 4, (100, 200))
+    regionSet = RegionSet(regions)
+    regionSet.addLabelMap(labelMap, values=[2, 1, 2])
+    regionSet.add(ImageRegion(labelMap == 3))
+
+    points = np.vstack((rng.uniform(-100, 1100, (2000, 2)), np.floor(rng.uniform(0, 100, (300, 2))),
+                        [[np.nan, np.nan]]))
+    expected = np.zeros((len(points), len(regionSet)), dtype=bool)
+    for j, region in enumerate(regionSet.regions):
+        for i, p in enumerate(points):
+            if isinstance(region, ImageRegion):
+                if 0 <= p[0] < 200 and 0 <= p[1] < 100:
+                    expected[i, j] = region.contains(np.int_(p))
+            elif not np.isnan(p[0]):
+                expected[i, j] = region.contains(p)
+
+    assert np.array_equal(regionSet.contains(points), expected)
+    labels = regionSet.labelPoints(points)
+    assert np.array_equal(labels, np.where(expected.any(axis=1), expected.argmax(axis=1), -1))
+    pointIndex, regionIndex = regionSet.findRegions(points)
+    assert np.array_equal(np.column_stack((pointIndex, regionIndex)), np.argwhere(expected))
+
+    # index is rebuilt when a region is added.
+    regionSet.add(RectRegion(-100, 1100, -100, 1100))
+    assert np.all(regionSet.labelPoints(points[:-1]) >= 0)
+
+
+def test_transitions():
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    regionSet = RegionSet([CircleRegion(x=800, y=500, r=200), RectRegion(1000, 1900, 0, 1000),
+                           RectRegion(0, 600, 0, 1000)])
+    K = len(regionSet)
+
+    visits = regionSet.getVisits(list(D), includeOutside=True)
+    expected = np.zeros((len(D), K, K), dtype=int)
+    for tr in range(len(D)):
+        # run-length encoding by loop
+        labels = regionSet.labelSamples(D[tr])
+        runs = []
+        for i in range(len(labels)):
+            if i == 0 or labels[i] != labels[i-1]:
+                runs.append([labels[i], D[tr].T[i], i])
+        v = np.where(visits['trial'] == tr)[0]
+        assert np.array_equal(visits['region'][v], [r[0] for r in runs])
+        assert np.array_equal(visits['start'][v], [r[1] for r in runs])
+        assert np.array_equal(visits['end'][v[:-1]], [r[1] for r in runs[1:]])
+
+        regions = [r[0] for r in runs if r[0] >= 0]
+        for i in range(1, len(regions)):
+            expected[tr, regions[i-1], regions[i]] += 1
+
+    matrix = regionSet.getTransitionMatrix(list(D), perTrial=True)
+    assert np.array_equal(matrix, expected)
+    assert np.array_equal(regionSet.getTransitionMatrix(list(D)), expected.sum(axis=0))
+    assert np.array_equal(regionSet.getTransitionMatrix(D[1]), expected[1])
+
+    m = expected.sum(axis=0).astype(float)
+    H = 0.0
+    for i in range(K):
+        for j in range(K):
+            if m[i, j] > 0:
+                H -= m[i].sum() / m.sum() * m[i, j] / m[i].sum() * np.log2(m[i, j] / m[i].sum())
+    assert np.isclose(getTransitionEntropy(m), H)
+    assert np.allclose(getTransitionEntropy(np.array([m, m])), [H, H])
+    assert np.isnan(getTransitionEntropy(np.zeros((K, K))))
+
+
 """
 getFixationsInRegion()
 
@@ -0,0 +1,159 @@
+import GazeParser
+from GazeParser.ScanMatch import ScanMatch, generateMaskFromArray
+import numpy as np
+import pytest
+
+
+def match_loop(obj, A, B):
+    # Cell-by-cell implementation of ScanMatch.match used as a reference.
+    n = len(A)
+    m = len(B)
+    F = np.zeros((n+1, m+1))
+    for i in range(n+1):
+        F[i, 0] = obj.GapValue*(i+1)
+    for j in range(m+1):
+        F[0, j] = obj.GapValue*(j+1)
+    for i in range(1, n+1):
+        for j in range(1, m+1):
+            match = F[i-1, j-1] + obj.SubMatrix[A[i-1], B[j-1]]
+            delete = F[i-1, j] + obj.GapValue
+            insert = F[i, j-1] + obj.GapValue
+            F[i, j] = max([match, insert, delete])
+    return F.transpose()
+
+
+@pytest.mark.parametrize('GapValue', [0.0, -0.3, -1.0])
+def test_match(GapValue):
+    obj = ScanMatch(Xres=720, Yres=720, Xbin=4, Ybin=4, Threshold=1.5, GapValue=GapValue)
+    rng = np.random.default_rng(0)
+    for n, m in ((1, 1), (5, 9), (40, 23), (60, 60)):
+        A = rng.integers(0, 16, n)
+        B = rng.integers(0, 16, m)
+        score, align, F = obj.match(A, B)
+        assert np.array_equal(F, match_loop(obj, A, B))
+        assert score == np.max(F) / (np.max(obj.SubMatrix) * max(n, m))
+
+        # alignment contains all elements of the sequences in order.
+        assert np.array_equal(align[align[:, 0] >= 0, 0], A)
+        assert np.array_equal(align[align[:, 1] >= 0, 1], B)
+
+    score, align, F = obj.match(A, A)
+    assert np.array_equal(align[:, 0], align[:, 1])
+    if GapValue == 0:
+        assert score == 1.0
+
+
+@pytest.mark.parametrize('GapValue', [0.0, -0.3])
+def test_matchAll(GapValue):
+    obj = ScanMatch(Xres=720, Yres=720, Xbin=4, Ybin=4, Threshold=1.5, GapValue=GapValue)
+    rng = np.random.default_rng(1)
+    sequences = [rng.integers(0, 16, n) for n in (5, 30, 12, 1, 44)]
+    scores = obj.matchAll(sequences, workers=1)
+    assert scores.shape == (10,)
+    k = 0
+    for i in range(len(sequences)):
+        for j in range(i+1, len(sequences)):
+            assert scores[k] == obj.match(sequences[i], sequences[j])[0]
+            assert scores[k] == obj.match(sequences[j], sequences[i])[0]
+            k += 1
+
+    scores2, aligns = obj.matchAll(sequences, workers=2, scoreOnly=False)
+    assert np.array_equal(scores, scores2)
+    assert np.array_equal(aligns[0], obj.match(sequences[0], sequences[1])[1])
+
+
+def test_trialToSequence():
+    import pathlib
+    wd = pathlib.Path(__file__).resolve().parent
+    D, A = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    obj = ScanMatch(Xres=1920, Yres=1080, TempBin=50)
+    sequence = obj.trialToSequence(D[0])
+    assert obj.trialToSequence(D[0]) is sequence
+    fixations = np.hstack((D[0].getFixCenter(), D[0].getFixDur()))
+    assert np.array_equal(sequence, obj.fixationToSequence(fixations))
+    scores = obj.matchAll(D, workers=1)
+    assert scores[0] == obj.match(obj.trialToSequence(D[0]), obj.trialToSequence(D[1]))[0]
+
+    obj.TempBin = 0
+    assert len(obj.trialToSequence(D[0])) == D[0].nFix
+
+
+def test_setup():
+    # Compare with the loop implementation of the previous version.
+    for Xres, Yres, Xbin, Ybin in ((1024, 768, 8, 6), (720, 720, 4, 4), (1000, 700, 7, 3)):
+        obj = ScanMatch(Xres=Xres, Yres=Yres, Xbin=Xbin, Ybin=Ybin, Threshold=2.5, TempBin=50, Offset=(10, 5))
+
+        mat = np.zeros((Xbin*Ybin, Xbin*Ybin))
+        indI = 0
+        indJ = 0
+        for i in range(Ybin):
+            for j in range(Xbin):
+                for ii in range(Ybin):
+                    for jj in range(Xbin):
+                        mat[indI, indJ] = np.sqrt((j-jj)**2 + (i-ii)**2)
+                        indI += 1
+                indI = 0
+                indJ += 1
+        max_sub = np.max(mat)
+        assert np.array_equal(obj.SubMatrix, np.abs(mat-max_sub) - (max_sub - 2.5))
+
+        a = np.reshape(np.arange(Xbin*Ybin), (Ybin, Xbin))
+        xi = np.int32(np.arange(0, Xbin, float(Xbin) / Xres))
+        yi = np.int32(np.arange(0, Ybin, float(Ybin) / Yres))
+        mask = np.zeros((Yres, Xres))
+        for y in range(Yres):
+            mask[y, :] = a[yi[y], xi]
+        assert np.array_equal(obj.mask, mask)
+
+        rng = np.random.default_rng(2)
+        fix = np.column_stack((rng.uniform(-50, Xres+50, 30), rng.uniform(-50, Yres+50, 30),
+                               rng.uniform(0, 400, 30)))
+        d = fix.copy()
+        d[:, :2] -= obj.Offset
+        d[d < 0] = 0
+        d[d[:, 0] >= Xres, 0] = Xres-1
+        d[d[:, 1] >= Yres, 1] = Yres-1
+        d = d.astype(int)
+        expected = []
+        for f in range(d.shape[0]):
+            expected.extend([mask[d[f, 1], d[f, 0]]] * int(np.round(d[f, 2] / 50.0)))
+        assert np.array_equal(obj.fixationToSequence(fix), expected)
+
+    # custom mask
+    custom = np.zeros((Yres, Xres))
+    custom[:, Xres//2:] = 1
+    obj.maskFromArray(custom)
+    assert obj.mask is custom
+    assert np.array_equal(obj.fixationToSequence(np.array([[10.0, 10.0, 50.0], [900.0, 10.0, 100.0]])), [0, 1, 1])
+    obj.gridMask()
+    assert np.array_equal(obj.mask, mask)
+
+    obj.subMatrixFromArray(np.eye(Xbin*Ybin))
+    assert np.array_equal(obj.SubMatrix, np.eye(Xbin*Ybin))
+
+
+def test_generateMaskFromArray():
+    rng = np.random.default_rng(3)
+    img = (rng.integers(0, 6, (40, 50, 3)) * 50).astype(np.uint8)
+    d = np.uint32(img)
+    d = (d[:, :, 0] << 16) + (d[:, :, 1] << 8) + d[:, :, 2]
+    for threshold, margeColor in ((0, 0), (8, 0xffffff), (10, 0x323232)):
+        # loop implementation of the previous version
+        dataArray = d.copy()
+        for value in np.unique(dataArray):
+            index = np.where(dataArray == value)
+            if len(index[0]) <= threshold:
+                dataArray[index] = margeColor
+        colorList = np.unique(dataArray)
+        for i in range(len(colorList)):
+            dataArray[dataArray == colorList[i]] = i
+
+        for data in (d, img):
+            mask, colors = generateMaskFromArray(data, threshold, margeColor)
+            assert np.array_equal(mask, dataArray)
+            assert np.array_equal(colors, colorList)
+
+    # RGBA
+    rgba = np.dstack((img, np.full(img.shape[:2], 255, dtype=np.uint8)))
+    mask, colors = generateMaskFromArray(rgba, 0, 0)
+    assert np.array_equal(colors, (np.unique(d).astype(np.uint64) << 8) | 0xff)
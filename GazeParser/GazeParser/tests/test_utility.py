@@ -1,6 +1,11 @@
 import GazeParser
 import GazeParser.Utility
+import GazeParser.Container
 import numpy as np
+import pytest
+import shutil
+import pickle
+import zlib
 
 import pathlib
 wd = pathlib.Path(__file__).resolve().parent
@@ -24,4 +29,296 @@ def test_sortrows():
     assert (GazeParser.Utility.sortrows(a, [0,1], [True,False]) == np.array([1,0,3,2])).all()
     assert (GazeParser.Utility.sortrows(a, [0,2], [False,True]) == np.array([3,2,1,0])).all()
     assert (GazeParser.Utility.sortrows(a, [2,0], [True,False]) == np.array([3,1,2,0])).all()
-    
\ No newline at end of file
+    
+
+def test_lazy_load(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    GazeParser.save(tmp_path/'lazy.db', D, additionalData=['additional'])
+
+    (D2, A2) = GazeParser.load(tmp_path/'lazy.db', lazy=True)
+    assert A2 == ['additional']
+    assert len(D2) == len(D)
+    for i in range(len(D)):
+        assert isinstance(D2[i].__dict__['_T'], GazeParser.Core._DeferredSamples)
+        assert D2[i].nFix == D[i].nFix
+        assert D2[i].Msg[0] == D[i].Msg[0]
+
+    # samples are loaded only for the accessed trial.
+    assert np.array_equal(D2[1].Fix[2].getTraj(), D[1].Fix[2].getTraj(), equal_nan=True)
+    assert isinstance(D2[0].__dict__['_T'], GazeParser.Core._DeferredSamples)
+    assert not isinstance(D2[1].__dict__['_T'], GazeParser.Core._DeferredSamples)
+
+    # saving lazily loaded data to the same file.
+    GazeParser.save(tmp_path/'lazy.db', D2)
+    (D3, A3) = GazeParser.load(tmp_path/'lazy.db')
+    assert D3 == D
+
+
+def test_load_trials(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    image = np.arange(48, dtype=np.uint8).reshape((4, 4, 3))
+    A = {'key': 'value',
+         'EMBEDDED_IMAGES': {'NAMES': ['a.png', 'b.png'], 'IMAGES': [image, 'not an array']}}
+    GazeParser.save(tmp_path/'trials.db', D*3, additionalData=A)
+
+    (D2, A2) = GazeParser.load(tmp_path/'trials.db', trials=[5, 0])
+    assert D2 == [D[1], D[0]]
+    assert A2['key'] == 'value'
+    assert A2['EMBEDDED_IMAGES']['NAMES'] == ['a.png', 'b.png']
+    assert (A2['EMBEDDED_IMAGES']['IMAGES'][0] == image).all()
+    assert A2['EMBEDDED_IMAGES']['IMAGES'][1] == 'not an array'
+
+    # old format
+    (D3, A3) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db', trials=[1])
+    assert D3 == [D[1]]
+
+    with pytest.raises(ValueError):
+        GazeParser.load(tmp_path/'trials.db', trials=[6])
+
+
+def test_threads(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    GazeParser.save(tmp_path/'threads.db', D*5, additionalData={'key': 'value'}, threads=4)
+    GazeParser.save(tmp_path/'single.db', D*5, additionalData={'key': 'value'})
+    assert (tmp_path/'threads.db').read_bytes() == (tmp_path/'single.db').read_bytes()
+
+    (D2, A2) = GazeParser.load(tmp_path/'threads.db', threads=4)
+    assert D2 == D*5
+    assert A2 == {'key': 'value'}
+
+
+def test_format_version(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    GazeParser.save(tmp_path/'version.db', D)
+    data = bytearray((tmp_path/'version.db').read_bytes())
+    assert data[8:10] == GazeParser.Container.FORMAT_VERSION.to_bytes(2, 'little')
+    for formatVersion in (1, GazeParser.Container.FORMAT_VERSION+1):
+        data[8:10] = formatVersion.to_bytes(2, 'little')
+        (tmp_path/'version.db').write_bytes(data)
+        with pytest.raises(ValueError):
+            GazeParser.load(tmp_path/'version.db')
+
+
+def test_update_additional_data(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    filename = str(tmp_path/'update.db')
+    GazeParser.save(filename, D)
+    trialChunks = GazeParser.Container._Reader(filename).index['chunks']['trial/1/samples/_T']
+
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    GazeParser.Utility.embedStimImages(filename, {'NAMES': ['a.png'], 'IMAGES': [image]})
+    imageChunks = [GazeParser.Container._Reader(filename).index['chunks'][name] for name in ('images', 'images/0')]
+    GazeParser.Utility.appendAdditionalData(filename, 'value', key='key', replace=True)
+    index = GazeParser.Container._Reader(filename).index
+    assert index['chunks']['trial/1/samples/_T'] == trialChunks
+    # images are not rewritten when additional data are updated.
+    assert [index['chunks'][name] for name in ('images', 'images/0')] == imageChunks
+    assert index['summary']['embeddedImages'] == ['a.png']
+    with pytest.raises(ValueError):
+        GazeParser.Utility.embedStimImages(filename, {'NAMES': ['b.png'], 'IMAGES': [image]})
+
+    images = GazeParser.Utility.loadEmbeddedImages(filename)
+    assert images['NAMES'] == ['a.png']
+    assert np.array_equal(images['IMAGES'][0], image)
+    (D2, A2) = GazeParser.load(filename, images=False)
+    assert D2 == D
+    assert A2 == {'key': 'value'}
+
+    GazeParser.Utility.removeEmbeddedImages(filename, newFilename=str(tmp_path/'removed.db'))
+    assert GazeParser.Utility.loadEmbeddedImages(str(tmp_path/'removed.db')) is None
+    assert GazeParser.Utility.loadEmbeddedImages(filename)['NAMES'] == ['a.png']
+    (D3, A3) = GazeParser.load(str(tmp_path/'removed.db'))
+    assert D3 == D
+    assert A3 == {'key': 'value'}
+
+
+def test_join(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    GazeParser.save(tmp_path/'a.db', D, additionalData=['a0', 'a1'])
+    GazeParser.save(tmp_path/'b.db', D)
+    fileList = [str(tmp_path/'a.db'), str(tmp_path/'b.db'), str(wd/'data/test01_noconf_usefp_ref.db')]
+    GazeParser.Utility.join(str(tmp_path/'joined.db'), fileList)
+
+    (D2, A2) = GazeParser.load(tmp_path/'joined.db')
+    assert D2 == D*3
+    assert A2 == ['a0', 'a1', [], [], [], []]
+
+    # dict objects are merged.
+    imageA = np.zeros((4, 4, 3), dtype=np.uint8)
+    imageB = np.ones((4, 4, 3), dtype=np.uint8)
+    GazeParser.save(tmp_path/'c.db', D, additionalData={'key': 'value', 'c': [1, 2],
+                                                        'EMBEDDED_IMAGES': {'NAMES': ['a.png'], 'IMAGES': [imageA]}})
+    GazeParser.save(tmp_path/'d.db', D, additionalData={'key': 'value', 'd': 3,
+                                                        'EMBEDDED_IMAGES': {'NAMES': ['b.png', 'a.png'], 'IMAGES': [imageB, imageA]}})
+    fileList = [str(tmp_path/'c.db'), str(tmp_path/'b.db'), str(tmp_path/'d.db')]
+    GazeParser.Utility.join(str(tmp_path/'joined.db'), fileList)
+    (D2, A2) = GazeParser.load(tmp_path/'joined.db')
+    assert D2 == D*3
+    assert set(A2.keys()) == {'key', 'c', 'd', 'EMBEDDED_IMAGES'}
+    assert (A2['key'], A2['c'], A2['d']) == ('value', [1, 2], 3)
+    assert A2['EMBEDDED_IMAGES']['NAMES'] == ['a.png', 'b.png']
+    assert np.array_equal(A2['EMBEDDED_IMAGES']['IMAGES'][0], imageA)
+    assert np.array_equal(A2['EMBEDDED_IMAGES']['IMAGES'][1], imageB)
+
+    # additional data which can not be combined.
+    GazeParser.save(tmp_path/'e.db', D, additionalData={'key': 'other'})
+    GazeParser.save(tmp_path/'f.db', D, additionalData={'EMBEDDED_IMAGES': {'NAMES': ['a.png'], 'IMAGES': [imageB]}})
+    for f in ('e.db', 'f.db', 'a.db'):
+        with pytest.raises(ValueError):
+            GazeParser.Utility.join(str(tmp_path/'failed.db'), [str(tmp_path/'c.db'), str(tmp_path/f)])
+        assert not (tmp_path/'failed.db').exists()
+
+
+def test_getFileInfo(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    GazeParser.save(tmp_path/'info.db', D, additionalData={'key': 'value'})
+    info = GazeParser.Utility.getFileInfo(str(tmp_path/'info.db'))
+    legacyInfo = GazeParser.Utility.getFileInfo(str(wd/'data/test01_noconf_usefp_ref.db'))
+    assert info['format'] == 'chunked'
+    assert legacyInfo['format'] == 'legacy'
+    assert info['trials'] == legacyInfo['trials']
+    assert info['version'] == GazeParser.__version__
+    assert info['additionalDataKeys'] == ['key']
+    assert info['embeddedImages'] is None
+    assert [t['samples'] for t in info['trials']] == [len(d.T) for d in D]
+    assert [t['fixations'] for t in info['trials']] == [d.nFix for d in D]
+    assert info['trials'][0]['recordedEye'] == D[0].recordedEye
+    assert info['trials'][0]['config']['SCREEN_WIDTH'] == D[0].config.SCREEN_WIDTH
+
+    GazeParser.Utility.embedStimImages(str(tmp_path/'info.db'), {'NAMES': ['a.png'], 'IMAGES': [None]}, replace=True)
+    GazeParser.Utility.join(str(tmp_path/'joined.db'), [str(tmp_path/'info.db')]*2)
+    info = GazeParser.Utility.getFileInfo(str(tmp_path/'joined.db'))
+    assert info['trials'] == legacyInfo['trials']*2
+    assert info['additionalDataType'] == 'dict'
+    assert info['additionalDataKeys'] == ['key']
+    assert info['embeddedImages'] == ['a.png']
+    info = GazeParser.Utility.getFileInfo(str(tmp_path/'info.db'))
+    assert info['embeddedImages'] == ['a.png']
+
+
+def test_load_cache(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    filename = str(tmp_path/'cache.db')
+    GazeParser.save(filename, D)
+
+    GazeParser.Utility.enableLoadCache()
+    try:
+        (D1, A1) = GazeParser.load(filename)
+        D1[0].Msg[0]._text = 'modified'
+        (D2, A2) = GazeParser.load(filename)
+        assert D2 == D
+        assert GazeParser.Utility.getLoadCacheStats()['hits'] == 1
+        assert GazeParser.Utility.getLoadCacheStats()['misses'] == 1
+
+        GazeParser.Utility.appendAdditionalData(filename, 'value', key='key')
+        (D3, A3) = GazeParser.load(filename)
+        assert A3 == {'key': 'value'}
+        assert GazeParser.Utility.getLoadCacheStats()['misses'] == 2
+
+        GazeParser.Utility.enableLoadCache(maxBytes=1000)
+        assert GazeParser.Utility.getLoadCacheStats()['entries'] == 0
+        GazeParser.load(filename)
+        assert GazeParser.Utility.getLoadCacheStats()['entries'] == 0
+    finally:
+        GazeParser.Utility.disableLoadCache()
+
+
+def test_loadMany(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    files = []
+    for i in range(4):
+        files.append(str(tmp_path/('%d.db' % i)))
+        GazeParser.save(files[-1], D[:1]*(i+1), additionalData=i)
+    files.insert(2, str(tmp_path/'nonexistent.db'))
+
+    for mode in ('thread', 'process'):
+        results, errors = GazeParser.Utility.loadMany(files, workers=2, mode=mode)
+        assert results[2] is None
+        assert [len(r[0]) for r in results if r is not None] == [1, 2, 3, 4]
+        assert [r[1] for r in results if r is not None] == [0, 1, 2, 3]
+        assert results[3][0] == D[:1]*3
+        assert len(errors) == 1 and errors[0][0] == files[2]
+
+
+def test_loadMany_old_files(capsys):
+    # The message about old data files is printed only once.  Loading
+    # fails if bsddb3 is not installed, but the message is printed before.
+    files = [str(wd/'data/test_0.6.5.db')] * 3 + [str(wd/'data/test01_noconf_usefp_ref.db')]
+    with pytest.warns(DeprecationWarning):
+        results, errors = GazeParser.Utility.loadMany(files, workers=2)
+    assert capsys.readouterr().out.count('made by old GazeParser') == 1
+    assert results[3] is not None
+
+
+def test_shared_config(tmp_path):
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    GazeParser.save(tmp_path/'config.db', D*3)
+    index = GazeParser.Container._Reader(tmp_path/'config.db').index
+    assert len(index['configs']) == 1
+
+    (D2, A2) = GazeParser.load(tmp_path/'config.db')
+    assert all([d.config is D2[0].config for d in D2])
+    assert D2[0].config.SCREEN_WIDTH == D[0].config.SCREEN_WIDTH
+    summary = GazeParser.Container.readSummary(tmp_path/'config.db')
+    assert summary['trials'][0]['config']['SCREEN_WIDTH'] == D[0].config.SCREEN_WIDTH
+
+    GazeParser.Utility.join(str(tmp_path/'joined.db'), [str(tmp_path/'config.db')] * 2)
+    (D3, A3) = GazeParser.load(tmp_path/'joined.db')
+    assert all([d.config is D2[0].config for d in D3])
+
+
+def test_migrateTree(tmp_path):
+    src = tmp_path/'src'
+    (src/'sub').mkdir(parents=True)
+    shutil.copy(wd/'data/test01_noconf_usefp_ref.db', src/'old.db')
+    shutil.copy(wd/'data/test01_testconf01_nofp_ref.db', src/'sub'/'old2.db')
+    (src/'sub'/'broken.db').write_bytes(b'not a data file')
+    assert GazeParser.Utility.getFileFormat(src/'old.db') == ('legacy', '0.12.0')
+    assert GazeParser.Utility.getFileFormat(wd/'data/test_0.6.5.db') == ('bsddb', None)
+
+    reports = GazeParser.Utility.migrateTree(src, dryRun=True, workers=1)
+    assert [r['status'] for r in reports] == ['migrated', 'failed', 'migrated']
+    assert not GazeParser.Container.isContainer(src/'old.db')
+
+    reports = GazeParser.Utility.migrateTree(src, tmp_path/'dst', workers=2, reportFile=tmp_path/'report.jsonl')
+    assert [r['status'] for r in reports] == ['migrated', 'failed', 'migrated']
+    assert len((tmp_path/'report.jsonl').read_text().splitlines()) == 3
+    assert GazeParser.Utility.getFileFormat(tmp_path/'dst'/'sub'/'old2.db') == ('chunked', GazeParser.__version__)
+    (D, A) = GazeParser.load(src/'old.db')
+    (D2, A2) = GazeParser.load(tmp_path/'dst'/'old.db')
+    assert D2 == D
+
+    # migrated files are skipped when migration is resumed.
+    reports = GazeParser.Utility.migrateTree(src, tmp_path/'dst', workers=1)
+    assert [r['status'] for r in reports] == ['skipped', 'failed', 'skipped']
+    reports = GazeParser.Utility.migrateTree(src, workers=1)
+    assert [r['status'] for r in reports] == ['migrated', 'failed', 'migrated']
+    reports = GazeParser.Utility.migrateTree(src, workers=1)
+    assert [r['status'] for r in reports] == ['skipped', 'failed', 'skipped']
+
+
+def test_migrate_recording_data(tmp_path):
+    # calibration, camera specific and USBIO data must survive migration.
+    (D, A) = GazeParser.load(wd/'data/test01_noconf_usefp_ref.db')
+    for d in D:
+        d.setCameraSpecificData(np.arange(len(d.T), dtype=float).reshape(-1, 1))
+        d.setUSBIOData(['AD0', 'DI1'], np.ones((len(d.T), 2)))
+    with open(tmp_path/'old.db', 'wb') as fp:
+        fp.write(zlib.compress(pickle.dumps({'GazeData': D, 'AdditionalData': A})))
+    assert GazeParser.Utility.getFileFormat(tmp_path/'old.db')[0] == 'legacy'
+
+    reports = GazeParser.Utility.migrateTree(tmp_path, workers=1)
+    assert [r['status'] for r in reports] == ['migrated']
+    (D2, A2) = GazeParser.load(tmp_path/'old.db')
+    for d, d2 in zip(D, D2):
+        assert len(d2.CalPointData) == len(d.CalPointData) == 9
+        assert np.array_equal(d2.getCalPointDataByList(), d.getCalPointDataByList(), equal_nan=True)
+        assert np.array_equal(d2.CameraSpecificData, d.CameraSpecificData)
+        assert d2.USBIOChannels == ['AD0', 'DI1']
+        assert np.array_equal(d2.USBIOData, d.USBIOData)
+
+    # storage mode
+    D[0].setStorageMode('fixed')
+    D3 = GazeParser.Utility.rebuildData(D)
+    assert D3[0].storageMode == 'fixed'
+    assert D3[0]._L is D[0]._L
@@ -0,0 +1,80 @@
+"""
+.. Part of GazeParser package.
+.. Copyright (C) 2012-2025 Hiroyuki Sogo.
+.. Distributed under the terms of the GNU General Public License (GPL).
+
+Benchmark of import time of GazeParser modules.
+
+Each module is imported in a new interpreter with ``python -X importtime``
+several times and the shortest cumulative import time is compared with
+its budget.  Modules which must not be imported by ``import GazeParser``
+are also checked.  Exit status is 1 if any budget is exceeded, so that
+this script can be used to detect regressions.
+
+Usage::
+
+    python bench_import.py [--repeat 5] [--scale 1.0]
+"""
+import sys
+import re
+import argparse
+import subprocess
+
+# module: budget of cumulative import time (ms)
+budgets = {
+    'GazeParser': 20,
+    'GazeParser.Core': 250,
+    'GazeParser.Utility': 300,
+    'GazeParser.Converter': 300,
+}
+
+# modules which must not be imported by "import GazeParser"
+forbidden = ('numpy', 'scipy', 'packaging', 'importlib.metadata', 'GazeParser.Core',
+             'GazeParser.Utility', 'GazeParser.Configuration')
+
+
+def importTime(module):
+    """
+    Return cumulative import time of module (ms) and names of all imported
+    modules.
+    """
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                         check=True, stderr=subprocess.PIPE, universal_newlines=True).stderr
+    cumulative = None
+    imported = []
+    for line in out.splitlines():
+        m = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)', line)
+        if m is None:
+            continue
+        imported.append(m.group(4))
+        if m.group(4) == module and len(m.group(3)) == 1:
+            cumulative = int(m.group(2)) / 1000.0
+    return cumulative, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of import time of GazeParser modules')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measurements of each module')
+    parser.add_argument('--scale', type=float, default=1.0, help='scale factor of budgets (for slow machines)')
+    args = parser.parse_args()
+
+    failed = False
+    print('%-24s %10s %10s' % ('module', 'time (ms)', 'budget'))
+    for module, budget in budgets.items():
+        results = [importTime(module) for i in range(args.repeat)]
+        t = min([r[0] for r in results])
+        budget *= args.scale
+        status = 'ok' if t <= budget else 'OVER BUDGET'
+        failed = failed or t > budget
+        print('%-24s %10.1f %10.1f %s' % (module, t, budget, status))
+        if module == 'GazeParser':
+            found = [name for name in forbidden if name in results[0][1]]
+            if found:
+                print('  "import GazeParser" imports %s' % ', '.join(found))
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+.. Part of GazeParser package.
+.. Copyright (C) 2012-2025 Hiroyuki Sogo.
+.. Distributed under the terms of the GNU General Public License (GPL).
+
+Benchmark of GazeParser.save and GazeParser.load.
+
+A synthetic binocular recording (1 hour at 1000 Hz by default) is saved
+and loaded in the current file format and in the old single-blob format
+(pickle protocol 2 compressed by zlib.compress).  Each measurement runs
+in a separate process so that peak RSS of each operation is reported.
+
+Usage::
+
+    python bench_save_load.py [--duration 3600] [--rate 1000] [--trials 60] [--level 6] [--threads 1]
+"""
+import os
+import sys
+import time
+import json
+import pickle
+import zlib
+import argparse
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+
+def makeData(duration, rate, nTrials):
+    import GazeParser
+    import GazeParser.Core
+    config = GazeParser.Configuration.Config()
+    rng = np.random.default_rng(0)
+    nSamples = int(duration * rate / nTrials)
+    D = []
+    for trial in range(nTrials):
+        T = np.arange(nSamples) * 1000.0 / rate
+        L = np.cumsum(rng.normal(0, 0.5, (nSamples, 2)), axis=0) + (512, 384)
+        R = L + rng.normal(0, 0.5, (nSamples, 2))
+        P = np.column_stack((rng.normal(800, 20, nSamples), rng.normal(800, 20, nSamples)))
+        msg = [GazeParser.Core.MessageData((T[0], 'trial %d' % trial))]
+        D.append(GazeParser.Core.GazeData(T, L, R, [], [], msg, [], P, 'B', config))
+    return D
+
+
+def peakRSS():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss /= 1024
+    return rss / 1024.0
+
+
+def worker(args):
+    import GazeParser
+    if args.op == 'save':
+        D = makeData(args.duration, args.rate, args.trials)
+        baseRSS = peakRSS()
+        t0 = time.perf_counter()
+        if args.format == 'current':
+            GazeParser.save(args.filename, D, compressionLevel=args.level, threads=args.threads)
+        else:
+            with open(args.filename, 'wb') as fp:
+                fp.write(zlib.compress(pickle.dumps({'GazeData': D, 'AdditionalData': None}, protocol=2), args.level))
+    else:
+        baseRSS = peakRSS()
+        t0 = time.perf_counter()
+        GazeParser.load(args.filename, checkVersion=False, threads=args.threads)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({'time': elapsed, 'peak': peakRSS(), 'base': baseRSS}))
+
+
+def run(op, fmt, filename, args):
+    cmd = [sys.executable, __file__, '--worker', op, '--format', fmt, '--filename', filename,
+           '--duration', str(args.duration), '--rate', str(args.rate),
+           '--trials', str(args.trials), '--level', str(args.level),
+           '--threads', str(args.threads)]
+    out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of GazeParser.save and GazeParser.load')
+    parser.add_argument('--duration', type=float, default=3600, help='duration of recording in seconds')
+    parser.add_argument('--rate', type=float, default=1000, help='sampling rate in Hz')
+    parser.add_argument('--trials', type=int, default=60, help='number of trials')
+    parser.add_argument('--level', type=int, default=6, help='compression level')
+    parser.add_argument('--threads', type=int, default=1, help='number of threads (current format only)')
+    parser.add_argument('--worker', choices=('save', 'load'), help=argparse.SUPPRESS)
+    parser.add_argument('--format', default='current', help=argparse.SUPPRESS)
+    parser.add_argument('--filename', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        args.op = args.worker
+        worker(args)
+        return
+
+    print('%.0f s, %.0f Hz, %d trials, compression level %d, %d threads' % (
+        args.duration, args.rate, args.trials, args.level, args.threads))
+    print('%-8s %-5s %10s %14s %12s' % ('format', 'op', 'time (s)', 'peak RSS (MB)', 'increase'))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for fmt in ('legacy', 'current'):
+            filename = os.path.join(tmpdir, fmt + '.db')
+            for op in ('save', 'load'):
+                r = run(op, fmt, filename, args)
+                print('%-8s %-5s %10.2f %14.1f %12.1f' % (fmt, op, r['time'], r['peak'], r['peak'] - r['base']))
+            print('%-8s size %.1f MB' % (fmt, os.path.getsize(filename) / 1024.0 / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+.. Part of GazeParser package.
+.. Copyright (C) 2012-2025 Hiroyuki Sogo.
+.. Distributed under the terms of the GNU General Public License (GPL).
+
+Benchmark of ScanMatch.match.
+
+Synthetic fixation sequences are converted by
+ScanMatch.fixationToSequence with TempBin, so that each fixation is
+expanded to several elements as in a typical analysis.  ScanMatch.match
+is compared with the cell-by-cell loop of the previous implementation,
+and the score matrices are checked to be identical.  Rows are calculated
+at once if GapValue is 0, otherwise anti-diagonals are calculated at once.
+
+Usage::
+
+    python bench_scanmatch.py [--fixations 20 50 100] [--tempbin 50] [--gap 0] [--repeat 3]
+"""
+import time
+import argparse
+import numpy as np
+from GazeParser.ScanMatch import ScanMatch
+# cell-by-cell reference implementation of the previous version
+from GazeParser.tests.test_scanmatch import match_loop
+
+
+def makeFixations(rng, n, obj):
+    # x, y, duration (ms)
+    return np.column_stack((rng.uniform(0, obj.Xres, n), rng.uniform(0, obj.Yres, n),
+                            rng.gamma(4, 60, n)))
+
+
+def best(func, repeat):
+    t = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        t.append(time.perf_counter() - t0)
+    return min(t), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of ScanMatch.match')
+    parser.add_argument('--fixations', type=int, nargs='+', default=[20, 50, 100], help='number of fixations')
+    parser.add_argument('--tempbin', type=float, default=50, help='TempBin (ms)')
+    parser.add_argument('--gap', type=float, default=0.0, help='GapValue')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    obj = ScanMatch(Xres=1024, Yres=768, Xbin=8, Ybin=6, Threshold=3.5, GapValue=args.gap, TempBin=args.tempbin)
+    print('TempBin %.0f ms, GapValue %g' % (args.tempbin, args.gap))
+    print('%10s %10s %12s %12s %9s' % ('fixations', 'length', 'loop (s)', 'match (s)', 'speedup'))
+    for n in args.fixations:
+        A = obj.fixationToSequence(makeFixations(rng, n, obj)).astype(int)
+        B = obj.fixationToSequence(makeFixations(rng, n, obj)).astype(int)
+        tLoop, F1 = best(lambda: match_loop(obj, A, B), args.repeat)
+        tMatch, (score, align, F2) = best(lambda: obj.match(A, B), args.repeat)
+        if not np.array_equal(F1, F2):
+            raise RuntimeError('Score matrices are different.')
+        print('%10d %10s %12.4f %12.4f %8.1fx' % (n, '%dx%d' % (len(A), len(B)), tLoop, tMatch, tLoop/tMatch))
+
+
+if __name__ == '__main__':
+    main()